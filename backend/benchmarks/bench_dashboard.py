@@ -0,0 +1,201 @@
+"""Compare GET /api/dashboard with the four calls the dashboard used to make.
+
+Seeds a throwaway SQLite database with --vas VAs and --days days of time
+logs and EOD reports, then times a dashboard load through Flask's test
+client three ways: the old fan-out (time-log summary, recent announcements,
+pending leave requests and today's EOD reports), /api/dashboard with its
+cache cleared before every call, and /api/dashboard served from the cache:
+
+    python benchmarks/bench_dashboard.py [--vas 300] [--days 90] [--loads 200]
+
+Exits non-zero if a call fails, the dashboard's counters disagree with the
+separate endpoints or miss the VAs clocked in since yesterday, or an
+uncached dashboard load runs as many statements as the fan-out.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import g
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from src.main import create_app
+from src.models.user import db, User, TimeLog, TimeInterval, EODReport, LeaveRequest, Announcement
+from src.utils.cache import dashboard_cache
+from src.utils.work_time import work_date
+
+def fan_out_paths(today):
+    return (
+        '/api/time-logs/summary',
+        '/api/announcements/recent',
+        '/api/leave-requests?status=pending',
+        f'/api/eod-reports?start_date={today}&end_date={today}',
+    )
+
+def still_working(user_id, offset):
+    # A third of the VAs are still working today, a few since yesterday's night shift
+    return (offset == 0 and user_id % 3 == 0) or (offset == 1 and user_id % 15 == 10)
+
+def seed(app, vas, days):
+    """`vas` VAs with a time log and EOD report per day, some still clocked in.
+
+    Returns how many are clocked in.
+    """
+    now = datetime.utcnow()
+    today = work_date()
+    password_hash = generate_password_hash('unused', 'pbkdf2:sha256:1000')
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {
+                'username': f'va{number}', 'email': f'va{number}@example.com', 'password_hash': password_hash,
+                'first_name': 'VA', 'last_name': str(number), 'role': 'va', 'is_active': True,
+                'created_at': now,
+            }
+            for number in range(vas)
+        ])
+        ids = [user.id for user in User.query.filter_by(role='va').order_by(User.id)]
+        for offset in range(days):
+            day = today - timedelta(days=offset)
+            clock_in = now - timedelta(days=offset, hours=8)
+            db.session.execute(insert(TimeLog), [
+                {
+                    'user_id': user_id, 'date': day, 'clock_in': clock_in,
+                    'clock_out': None if still_working(user_id, offset) else clock_in + timedelta(hours=8),
+                    'total_hours': None if still_working(user_id, offset) else 8.0,
+                }
+                for user_id in ids
+            ])
+            db.session.execute(insert(EODReport), [
+                {'user_id': user_id, 'date': day, 'tasks_completed': 'Inbox zero', 'created_at': clock_in}
+                for user_id in ids
+                if offset or user_id % 2
+            ])
+        db.session.execute(insert(LeaveRequest), [
+            {
+                'user_id': user_id, 'start_date': today + timedelta(days=7), 'end_date': today + timedelta(days=8),
+                'reason': 'Rest', 'status': 'pending' if user_id % 10 == 0 else 'approved', 'created_at': now,
+            }
+            for user_id in ids
+        ])
+        db.session.execute(insert(Announcement), [
+            {
+                'title': f'Notice {number}', 'content': '...', 'is_pinned': number % 25 == 0,
+                'created_by': ids[number % len(ids)], 'created_at': now - timedelta(hours=number),
+            }
+            for number in range(100)
+        ])
+        open_logs = TimeLog.query.filter(TimeLog.clock_out.is_(None)).all()
+        db.session.execute(insert(TimeInterval), [
+            {'user_id': log.user_id, 'time_log_id': log.id, 'date': log.date, 'started_at': log.clock_in}
+            for log in open_logs
+        ])
+        db.session.commit()
+        return len(open_logs)
+
+def percentile_ms(values, q):
+    return (statistics.quantiles(values, n=100, method='inclusive')[q - 1] if len(values) > 1 else values[0]) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--vas', type=int, default=300)
+    parser.add_argument('--days', type=int, default=90, help='days of time logs and EOD reports per VA')
+    parser.add_argument('--loads', type=int, default=200, help='dashboard loads timed per variant')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'dashboard.db')}",
+            'INIT_DB_ON_STARTUP': True,
+            'PASSWORD_HASH_WORKERS': 0,
+        })
+        clocked_in = seed(app, args.vas, args.days)
+
+        statements = []
+
+        @app.after_request
+        def record_sql_count(response):
+            statements.append(g.get('sql_count') or 0)
+            return response
+
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+        assert response.status_code == 200, response.get_json()
+
+        failures = []
+
+        def load(paths, clear_cache=False):
+            """Seconds and SQL statements for one dashboard load, plus the JSON bodies"""
+            if clear_cache:
+                dashboard_cache.clear()
+            del statements[:]
+            bodies = []
+            started = time.perf_counter()
+            for path in paths:
+                response = client.get(path)
+                if response.status_code != 200:
+                    failures.append(f'{path} returned {response.status_code}: {response.get_json()}')
+                bodies.append(response.get_json())
+            return time.perf_counter() - started, sum(statements), bodies
+
+        today = work_date().isoformat()
+        variants = (
+            ('fan-out (4 calls)', fan_out_paths(today), False),
+            ('dashboard, uncached', ('/api/dashboard',), True),
+            ('dashboard, cached', ('/api/dashboard',), False),
+        )
+        results = {}
+        for name, paths, clear_cache in variants:
+            # Warm up the session registry and statement caches
+            load(paths, clear_cache)
+            runs = [load(paths, clear_cache) for _ in range(args.loads)]
+            results[name] = ([seconds for seconds, _, _ in runs], runs[-1][1])
+
+        # Whole lists for the cross-check, not the first page
+        _, _, (summary, _, pending, eods) = load(
+            [path + ('&limit=500' if '?' in path else '') for path in fan_out_paths(today)]
+        )
+        _, _, (dashboard,) = load(('/api/dashboard',), clear_cache=True)
+        with app.app_context():
+            db.engine.dispose()
+
+    print(f'{args.vas} VAs, {args.days} days of time logs and EOD reports, {args.loads} loads each')
+    print(f"{'variant':<22}{'p50 ms':>9}{'p99 ms':>9}{'statements':>12}")
+    for name, (latencies, sql) in results.items():
+        print(f'{name:<22}{percentile_ms(latencies, 50):>9.2f}{percentile_ms(latencies, 99):>9.2f}{sql:>12}')
+
+    expected = {
+        'total_hours_today': summary['total_hours_today'],
+        'active_users_today': summary['active_users_today'],
+        'clocked_in_now': summary['clocked_in_now'],
+        'pending': len(pending['leave_requests']),
+        'submitted_today': len(eods['eod_reports']),
+    }
+    actual = {
+        **dashboard['time_logs'],
+        'pending': dashboard['leave_requests']['pending'],
+        'submitted_today': dashboard['eod_reports']['submitted_today'],
+    }
+    for key, value in expected.items():
+        if actual[key] != value:
+            failures.append(f'dashboard {key} is {actual[key]}, the separate endpoints say {value}')
+    if actual['clocked_in_now'] != clocked_in:
+        failures.append(f"dashboard clocked_in_now is {actual['clocked_in_now']}, {clocked_in} are clocked in")
+    fan_out_sql = results['fan-out (4 calls)'][1]
+    dashboard_sql = results['dashboard, uncached'][1]
+    if dashboard_sql >= fan_out_sql:
+        failures.append(f'an uncached dashboard load runs {dashboard_sql} statements, the fan-out {fan_out_sql}')
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+if __name__ == '__main__':
+    main()
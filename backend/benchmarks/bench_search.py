@@ -0,0 +1,206 @@
+"""Time /api/search over a large EOD report corpus.
+
+Seeds a throwaway SQLite database with --rows EOD reports (--vas VAs times
+enough days) whose text is drawn from a Zipf-distributed vocabulary, builds
+the FTS5 index with reindex(), then times a set of queries, from words in
+most reports to words in a handful: through search() as an admin and as a
+VA limited to their own reports, and through the endpoint. One LIKE scan per
+query is timed for comparison:
+
+    python benchmarks/bench_search.py [--rows 1000000] [--vas 1000] [--runs 50]
+
+Seeding and indexing a million rows takes a few minutes. Exits non-zero if
+a query's p99 through search() exceeds its budget in QUERIES, or a VA is
+shown another VA's report.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from src.main import create_app
+from src.models.user import db, User, EODReport
+from src.utils.search import search, reindex, _like_search
+
+SEED_BATCH = 20000
+
+# Ranked by frequency, so the first words appear in most reports
+VOCABULARY = (
+    'email inbox client calendar meeting follow call update report invoice spreadsheet schedule '
+    'booking travel research draft proposal review customer order shipping refund ticket support '
+    'social media post caption newsletter campaign analytics dashboard crm lead prospect outreach '
+    'linkedin podcast transcript editing blog seo keyword website wordpress shopify listing product '
+    'inventory supplier quote contract onboarding payroll timesheet expense receipt bookkeeping '
+    'quickbooks reconciliation vendor portal password access training sop checklist template '
+    'presentation slide deck graphic canva video youtube upload thumbnail webinar registration '
+    'survey feedback testimonial review zoom slack asana trello notion clickup airtable zapier '
+    'automation integration migration backup archive cleanup filing scanning translation '
+    'transcription compliance audit renewal insurance license permit tax deadline reminder '
+    'escalation outage latency timezone handover'
+).split()
+
+# word -> the VA (by position) whose reports mention it every 50th day
+RARE_WORDS = {'kubernetes': 7, 'notarization': 42, 'zeppelin': 99}
+
+# (name, q, p99 budget in ms). Every word is searched as a prefix, and FTS5
+# reads the whole doclist of a prefix and of each word bm25() scores, so a
+# word found in most reports costs hundreds of milliseconds however few
+# candidates are ranked; everything else should take a few milliseconds.
+QUERIES = (
+    ('common word', 'email', 500),
+    ('two common words', 'client meeting', 750),
+    ('mid-frequency word', 'quickbooks', 50),
+    ('prefix', 'recon', 50),
+    ('rare word', 'zeppelin', 10),
+    ('rare + common', 'notarization email', 500),
+)
+
+def report_text(rng, cum_weights, words):
+    return ' '.join(rng.choices(VOCABULARY, cum_weights=cum_weights, k=words))
+
+def seed(app, rows, vas):
+    """`rows` EOD reports spread over `vas` VAs, one per VA per day"""
+    rng = random.Random(11)
+    cum_weights = list(accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+    password_hash = generate_password_hash('unused', 'pbkdf2:sha256:1000')
+    now = datetime.utcnow()
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {
+                'username': f'va{number}', 'email': f'va{number}@example.com', 'password_hash': password_hash,
+                'first_name': 'VA', 'last_name': str(number), 'role': 'va', 'is_active': True,
+                'created_at': now,
+            }
+            for number in range(vas)
+        ])
+        ids = [user.id for user in User.query.filter_by(role='va').order_by(User.id)]
+        first_day = date(2020, 1, 1)
+
+        rare_by_va = {va: word for word, va in RARE_WORDS.items()}
+        batch = []
+        for number in range(rows):
+            day, va = divmod(number, vas)
+            tasks = report_text(rng, cum_weights, 24)
+            if va in rare_by_va and day % 50 == 0:
+                tasks += f' {rare_by_va[va]}'
+            batch.append({
+                'user_id': ids[va],
+                'date': first_day + timedelta(days=day),
+                'tasks_completed': tasks,
+                'blockers': report_text(rng, cum_weights, 6) if number % 3 == 0 else None,
+                'issues': report_text(rng, cum_weights, 6) if number % 5 == 0 else None,
+                'created_at': now,
+            })
+            if len(batch) >= SEED_BATCH:
+                db.session.execute(insert(EODReport), batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(EODReport), batch)
+        db.session.commit()
+
+def percentile_ms(values, q):
+    return (statistics.quantiles(values, n=100, method='inclusive')[q - 1] if len(values) > 1 else values[0]) * 1000
+
+def timed(function, runs):
+    """(seconds per run, last result)"""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - started)
+    return durations, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--vas', type=int, default=1000)
+    parser.add_argument('--runs', type=int, default=50, help='timed runs per query')
+    parser.add_argument('--limit', type=int, default=20, help='results per query, as in /api/search')
+    args = parser.parse_args()
+    if args.rows < args.vas:
+        parser.error('--rows must be at least --vas')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = os.path.join(workdir, 'search.db')
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}',
+            'INIT_DB_ON_STARTUP': True,
+            'PASSWORD_HASH_WORKERS': 0,
+            # The LIKE scans and common words are slow on purpose
+            'SLOW_QUERY_MS': 60000,
+        })
+
+        started = time.perf_counter()
+        seed(app, args.rows, args.vas)
+        seeded = time.perf_counter() - started
+        started = time.perf_counter()
+        with app.app_context():
+            indexed_rows = reindex('eod_report')
+        indexed = time.perf_counter() - started
+        size_mb = os.path.getsize(database) / 1e6
+
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+        assert response.status_code == 200, response.get_json()
+
+        kinds = ['eod_report']
+        with app.app_context():
+            # VAs only search their own reports, through the owner filter
+            owner_id = User.query.filter_by(username=f"va{RARE_WORDS['notarization']}").one().id
+        results = []
+        failures = []
+        for name, q, budget_ms in QUERIES:
+            with app.app_context():
+                search(q, kinds, args.limit)
+                admin, matches = timed(lambda: search(q, kinds, args.limit), args.runs)
+                own, own_matches = timed(lambda: search(q, kinds, args.limit, owner_id=owner_id), args.runs)
+                like, _ = timed(lambda: _like_search(q, kinds, args.limit, None), 1)
+                owners = {
+                    user_id for (user_id,) in db.session.query(EODReport.user_id)
+                    .filter(EODReport.id.in_([match['id'] for match in own_matches]))
+                }
+            endpoint, response = timed(
+                lambda: client.get('/api/search', query_string={'q': q, 'types': 'eod_report', 'limit': args.limit}),
+                args.runs
+            )
+            if response.status_code != 200:
+                failures.append(f'/api/search?q={q} returned {response.status_code}: {response.get_json()}')
+            if not matches:
+                failures.append(f'{q!r} matched nothing')
+            if owners - {owner_id}:
+                failures.append(f"{q!r} returned other VAs' reports to VA {owner_id}")
+            results.append((name, q, budget_ms, admin, own, endpoint, like[0], len(matches), len(own_matches)))
+        with app.app_context():
+            db.engine.dispose()
+
+    print(f'{args.rows} EOD reports: seeded in {seeded:.0f}s, indexed {indexed_rows} in {indexed:.0f}s, '
+          f'{size_mb:.0f} MB on disk')
+    print('milliseconds per query; admin searches every report, the VA only their own')
+    print(f"{'query':<36}{'budget':>7}{'admin p50':>10}{'p99':>7}{'VA p50':>8}{'p99':>7}{'endpoint p50':>13}{'p99':>7}"
+          f"{'LIKE':>7}{'hits':>6}{'VA hits':>8}")
+    for name, q, budget_ms, admin, own, endpoint, like, hits, own_hits in results:
+        print(f"{f'{name} ({q})':<36}{budget_ms:>7}{percentile_ms(admin, 50):>10.1f}{percentile_ms(admin, 99):>7.1f}"
+              f"{percentile_ms(own, 50):>8.1f}{percentile_ms(own, 99):>7.1f}"
+              f"{percentile_ms(endpoint, 50):>13.1f}{percentile_ms(endpoint, 99):>7.1f}"
+              f"{like * 1000:>7.0f}{hits:>6}{own_hits:>8}")
+        for who, durations in (('admin', admin), ('VA', own)):
+            if percentile_ms(durations, 99) > budget_ms:
+                failures.append(f'{q!r} {who} p99 is {percentile_ms(durations, 99):.1f} ms, budget is {budget_ms} ms')
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+if __name__ == '__main__':
+    main()
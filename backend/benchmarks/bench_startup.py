@@ -0,0 +1,56 @@
+"""Measure how long a fresh process takes to get a ready application.
+
+Each run is a new interpreter against a throwaway SQLite file, so module
+imports and engine setup are paid every time, as in a new worker:
+
+    python benchmarks/bench_startup.py [--runs 5]
+
+'init on startup' is what every worker used to do at import: create and
+upgrade the schema and hash the default admin password.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = (
+    ('import src.main', 'import src.main'),
+    ('create_app()', 'from src.main import create_app; create_app()'),
+    ('create_app(), init on startup', "from src.main import create_app; create_app({'INIT_DB_ON_STARTUP': True})"),
+)
+
+TIMER = '''
+import time
+started = time.perf_counter()
+{code}
+print(time.perf_counter() - started)
+'''
+
+def run(code, database_url):
+    env = {**os.environ, 'DATABASE_URL': database_url, 'PYTHONPATH': BACKEND_DIR}
+    output = subprocess.run(
+        [sys.executable, '-c', TIMER.format(code=code)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'scenario':<34}{'median ms':>10}{'min ms':>10}")
+        for label, code in SCENARIOS:
+            # One database per scenario, so after the first run 'init on
+            # startup' finds existing tables, like a worker restart does
+            database_url = f"sqlite:///{os.path.join(workdir, f'{SCENARIOS.index((label, code))}.db')}"
+            timings = [run(code, database_url) * 1000 for _ in range(args.runs)]
+            print(f'{label:<34}{statistics.median(timings):>10.0f}{min(timings):>10.0f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Compare the old catch-all static route with the indexed one.
+
+Runs both against a temporary copy of src/static (precompressed for the new
+route) through Flask's test client and prints requests per second and bytes
+sent for a few typical requests:
+
+    python benchmarks/bench_static.py [--requests 2000]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, send_from_directory
+from src.utils.static_files import StaticIndex, send_static, compress_static
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src', 'static')
+
+def legacy_app(static_folder):
+    """The serve() route as it was: two os.path.exists calls, no compression or caching"""
+    app = Flask(__name__, static_folder=static_folder)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        static_folder_path = app.static_folder
+        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
+            return send_from_directory(static_folder_path, path)
+        index_path = os.path.join(static_folder_path, 'index.html')
+        if os.path.exists(index_path):
+            return send_from_directory(static_folder_path, 'index.html')
+        return "index.html not found", 404
+
+    return app
+
+def indexed_app(static_folder):
+    app = Flask(__name__, static_folder=static_folder)
+    index = StaticIndex(static_folder)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        return send_static(index, path)
+
+    return app
+
+def scenarios(static_folder):
+    bundle = sorted(name for name in os.listdir(os.path.join(static_folder, 'assets')) if name.endswith('.js'))[0]
+    client = indexed_app(static_folder).test_client()
+    etag = client.get('/').headers['ETag']
+    return [
+        ('index.html', '/', {}),
+        ('index.html revalidation', '/', {'If-None-Match': etag}),
+        ('client-side route', '/dashboard/time-logs', {}),
+        ('hashed JS bundle', f'/assets/{bundle}', {}),
+        ('hashed JS bundle, gzip', f'/assets/{bundle}', {'Accept-Encoding': 'gzip, br'}),
+    ]
+
+def measure(app, path, headers, requests):
+    client = app.test_client()
+    sent = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers=headers)
+        sent += len(response.get_data())
+        response.close()
+    elapsed = time.perf_counter() - started
+    return requests / elapsed, sent // requests, response.status_code
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        static_folder = os.path.join(workdir, 'static')
+        shutil.copytree(STATIC_DIR, static_folder)
+        compress_static(static_folder)
+
+        apps = [('current', legacy_app(static_folder)), ('indexed', indexed_app(static_folder))]
+        print(f"{'scenario':<28}{'route':<10}{'req/s':>10}{'bytes':>10}{'status':>8}")
+        for label, path, headers in scenarios(static_folder):
+            for name, app in apps:
+                rate, size, status = measure(app, path, headers, args.requests)
+                print(f'{label:<28}{name:<10}{rate:>10.0f}{size:>10}{status:>8}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Check that list endpoints run a fixed number of SQL statements.
+
+Seeds a throwaway SQLite database at several sizes, each row owned (and
+reviewed) by a different user so a lazy relationship load would show up as
+one extra statement per row, then counts the statements each admin list
+request runs, as recorded in g.sql_count by the request metrics:
+
+    python benchmarks/check_sql_counts.py [--sizes 5,50,200]
+
+Exits non-zero if an endpoint's count changes with the number of rows or
+exceeds its budget.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import g
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from src.main import create_app
+from src.models.user import db, User, TimeLog, EODReport, LeaveRequest, Training, SOP, Announcement
+
+# Statements per request, including the session and ETag lookups
+BUDGET = 6
+
+ENDPOINTS = (
+    '/api/time-logs',
+    '/api/eod-reports',
+    '/api/leave-requests',
+    '/api/trainings',
+    '/api/sops',
+    '/api/announcements',
+    '/api/users',
+)
+
+def seed(app, size):
+    """`size` VAs, each owning one row of every listed kind"""
+    now = datetime.utcnow()
+    password_hash = generate_password_hash('unused', 'pbkdf2:sha256:1000')
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {
+                'username': f'va{number}', 'email': f'va{number}@example.com', 'password_hash': password_hash,
+                'first_name': 'VA', 'last_name': str(number), 'role': 'va', 'is_active': True,
+                'created_at': now,
+            }
+            for number in range(size)
+        ])
+        ids = [user.id for user in User.query.filter_by(role='va').order_by(User.id)]
+        reviewers = ids[1:] + ids[:1]
+        day = date.today()
+        db.session.execute(insert(TimeLog), [
+            {'user_id': user_id, 'date': day, 'clock_in': now - timedelta(hours=8), 'clock_out': now, 'total_hours': 8.0}
+            for user_id in ids
+        ])
+        db.session.execute(insert(EODReport), [
+            {'user_id': user_id, 'date': day, 'tasks_completed': 'Inbox zero', 'created_at': now}
+            for user_id in ids
+        ])
+        db.session.execute(insert(LeaveRequest), [
+            {
+                'user_id': user_id, 'start_date': day, 'end_date': day, 'reason': 'Rest', 'status': 'approved',
+                'reviewed_by': reviewer, 'reviewed_at': now, 'created_at': now,
+            }
+            for user_id, reviewer in zip(ids, reviewers)
+        ])
+        db.session.execute(insert(Training), [
+            {'title': f'Training {user_id}', 'created_by': user_id, 'created_at': now} for user_id in ids
+        ])
+        db.session.execute(insert(SOP), [
+            {'title': f'SOP {user_id}', 'file_url': '/sop.pdf', 'created_by': user_id, 'created_at': now}
+            for user_id in ids
+        ])
+        db.session.execute(insert(Announcement), [
+            {'title': f'Notice {user_id}', 'content': '...', 'is_pinned': False, 'created_by': user_id, 'created_at': now}
+            for user_id in ids
+        ])
+        db.session.commit()
+
+def count_statements(size):
+    """{endpoint: (statements, rows returned)} for a database with `size` VAs"""
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'counts.db')}",
+            'INIT_DB_ON_STARTUP': True,
+            'PASSWORD_HASH_WORKERS': 0,
+        })
+        seed(app, size)
+
+        counts = []
+
+        @app.after_request
+        def record_sql_count(response):
+            counts.append(g.get('sql_count'))
+            return response
+
+        client = app.test_client()
+        response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+        assert response.status_code == 200, response.get_json()
+
+        results = {}
+        for path in ENDPOINTS:
+            # The first request to a fresh process also loads the session registry
+            client.get(path, query_string={'limit': 500})
+            response = client.get(path, query_string={'limit': 500})
+            assert response.status_code == 200, (path, response.get_json())
+            rows = next(value for value in response.get_json().values() if isinstance(value, list))
+            results[path] = (counts[-1], len(rows))
+        with app.app_context():
+            db.engine.dispose()
+        return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='5,50,200', help='comma-separated numbers of VAs to seed')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    # A fresh process per size: the session registry and caches are module
+    # globals bound to the first app that uses them
+    by_size = {}
+    for size in sizes:
+        with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            by_size[size] = pool.submit(count_statements, size).result()
+
+    failures = []
+    print(f"{'endpoint':<24}" + ''.join(f'{f"{size} VAs":>16}' for size in sizes))
+    for path in ENDPOINTS:
+        cells = [by_size[size][path] for size in sizes]
+        print(f'{path:<24}' + ''.join(f'{f"{sql} sql/{rows} rows":>16}' for sql, rows in cells))
+        statements = {sql for sql, _ in cells}
+        if len(statements) > 1:
+            failures.append(f'{path} runs {sorted(statements)} statements depending on the row count')
+        if max(statements) > BUDGET:
+            failures.append(f'{path} runs {max(statements)} statements, budget is {BUDGET}')
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,392 @@
+"""Run the backend-specific code paths against SQLite and PostgreSQL.
+
+SQLite gets a throwaway file. PostgreSQL gets a throwaway cluster made with
+initdb and pg_ctl from PG_BIN (or PATH), or the server in PG_URL if set;
+each run creates and drops its own database on it:
+
+    python benchmarks/db_matrix.py [--backend sqlite] [--backend postgresql]
+
+PostgreSQL refuses to run as root, so as root the cluster runs as PG_USER
+(default postgres). Each check names the request whose code it covers:
+ON CONFLICT upserts, the open-interval partial unique index, the LIKE
+search fallback and so on. Exits non-zero if any check fails.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from src.config import database_config
+from src.main import create_app
+from src.models.user import (
+    db, User, Tag, TimeLog, TimeInterval, TimeLogRollup, ContentVersion, Training, TrainingProgress, training_tags
+)
+from src.utils.conditional import bump_version
+from src.utils.events import DatabaseEventBus
+from src.utils.jobs import get_job_queue
+from src.utils.migrations import upgrade_schema
+
+BACKENDS = ('sqlite', 'postgresql')
+
+def _pg_tool(name):
+    bin_dir = os.environ.get('PG_BIN')
+    path = os.path.join(bin_dir, name) if bin_dir else shutil.which(name)
+    if not path or not os.path.exists(path):
+        raise RuntimeError(f'{name} not found; set PG_BIN to the PostgreSQL bin directory or PG_URL to a server')
+    return path
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def postgres_server():
+    """Yield the URL of a PostgreSQL server: PG_URL, or a throwaway local cluster"""
+    if os.environ.get('PG_URL'):
+        yield os.environ['PG_URL']
+        return
+
+    as_user = []
+    data_root = tempfile.mkdtemp(prefix='pg-matrix-')
+    if os.geteuid() == 0:
+        pg_user = os.environ.get('PG_USER', 'postgres')
+        shutil.chown(data_root, pg_user)
+        as_user = ['runuser', '-u', pg_user, '--']
+    data_dir = os.path.join(data_root, 'data')
+    port = _free_port()
+
+    def run(*command):
+        subprocess.run(as_user + list(command), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    try:
+        run(_pg_tool('initdb'), '-D', data_dir, '-U', 'postgres', '--auth=trust', '--no-sync')
+        run(
+            _pg_tool('pg_ctl'), '-D', data_dir, '-l', os.path.join(data_root, 'server.log'), '-w',
+            '-o', f'-p {port} -k {data_root} -c listen_addresses=127.0.0.1 -c fsync=off',
+            'start'
+        )
+        try:
+            yield f'postgresql://postgres@127.0.0.1:{port}/postgres'
+        finally:
+            run(_pg_tool('pg_ctl'), '-D', data_dir, '-m', 'fast', 'stop')
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f'{e.cmd[len(as_user)]} failed: {e.stderr.decode().strip()}')
+    finally:
+        shutil.rmtree(data_root, ignore_errors=True)
+
+@contextmanager
+def postgres_database(server_url):
+    """Create a uniquely named database on the server and drop it afterwards"""
+    name = f'matrix_{uuid.uuid4().hex[:12]}'
+    admin = create_engine(database_config({'DATABASE_URL': server_url})['SQLALCHEMY_DATABASE_URI'],
+                          isolation_level='AUTOCOMMIT')
+    with admin.connect() as connection:
+        connection.execute(text(f'CREATE DATABASE {name}'))
+    try:
+        yield make_url(server_url).set(database=name).render_as_string(hide_password=False)
+    finally:
+        with admin.connect() as connection:
+            connection.execute(text(f'DROP DATABASE {name} WITH (FORCE)'))
+        admin.dispose()
+
+@contextmanager
+def database_url(backend, pg_server):
+    if backend == 'sqlite':
+        with tempfile.TemporaryDirectory() as workdir:
+            yield f"sqlite:///{os.path.join(workdir, 'matrix.db')}"
+    else:
+        with postgres_database(pg_server) as url:
+            yield url
+
+def make_app(url, workdir):
+    config = database_config({'DATABASE_URL': url})
+    config.update({
+        'INIT_DB_ON_STARTUP': True,
+        'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+        'PASSWORD_HASH_WORKERS': 0,
+        # Jobs run inline when the check ticks the queue
+        'JOB_DISPATCHER': False,
+        'JOB_WORKERS': 0,
+        'JOB_DIR': os.path.join(workdir, 'jobs'),
+    })
+    return create_app(config)
+
+def admin_client(app):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 200, response.get_json()
+    return client
+
+def expect(response, status):
+    assert response.status_code == status, f'{response.request.method} {response.request.path}: ' \
+        f'expected {status}, got {response.status_code} {response.get_json(silent=True)}'
+    return response.get_json(silent=True)
+
+# Checks: (request, description, function(app, client))
+
+def check_clock_upserts(app, client):
+    expect(client.post('/api/time-logs/clock-in'), 200)
+    expect(client.post('/api/time-logs/clock-out'), 200)
+    # A second interval the same day goes through ON CONFLICT DO UPDATE on the time log
+    expect(client.post('/api/time-logs/clock-in'), 200)
+    expect(client.post('/api/time-logs/clock-out'), 200)
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').one()
+        logs = TimeLog.query.filter_by(user_id=admin.id).all()
+        assert len(logs) == 1, f'{len(logs)} time logs for one day'
+        intervals = TimeInterval.query.filter_by(user_id=admin.id).all()
+        assert len(intervals) == 2, f'{len(intervals)} intervals, expected 2'
+        hours = sum(interval.hours for interval in intervals)
+        assert abs(logs[0].total_hours - hours) < 0.01, 'time log total does not match its intervals'
+        rollup = TimeLogRollup.query.filter_by(user_id=admin.id, date=logs[0].date).one()
+        assert abs(rollup.total_hours - hours) < 0.01, 'rollup does not match the intervals'
+
+def check_open_interval_index(app, client):
+    expect(client.post('/api/time-logs/clock-in'), 200)
+    body = expect(client.post('/api/time-logs/clock-in'), 400)
+    assert body['error'] == 'Already clocked in', body
+    expect(client.post('/api/time-logs/clock-out'), 200)
+    with app.app_context():
+        admin = User.query.filter_by(username='admin').one()
+        log = TimeLog(user_id=admin.id, date=date(2000, 1, 1))
+        db.session.add(log)
+        db.session.flush()
+        now = datetime.utcnow()
+        db.session.add_all([
+            TimeInterval(user_id=admin.id, time_log_id=log.id, date=log.date, started_at=now)
+            for _ in range(2)
+        ])
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+        else:
+            raise AssertionError('two open intervals for one user were accepted')
+
+def check_idempotent_replay(app, client):
+    headers = {'Idempotency-Key': str(uuid.uuid4())}
+    first = client.post('/api/time-logs/clock-in', headers=headers)
+    second = client.post('/api/time-logs/clock-in', headers=headers)
+    expect(first, 200)
+    expect(second, 200)
+    assert 'Idempotent-Replayed' in second.headers, 'second request was not replayed'
+    assert first.get_json() == second.get_json(), 'replayed response differs'
+    expect(client.post('/api/time-logs/clock-out'), 200)
+
+def check_content_versions(app, client):
+    with app.app_context():
+        for _ in range(3):
+            bump_version('matrix')
+            db.session.commit()
+        version = db.session.get(ContentVersion, 'matrix').version
+        assert version == 3, f'version {version} after three bumps'
+
+def check_tags(app, client):
+    for title in ('Tagged one', 'Tagged two'):
+        expect(client.post('/api/trainings', json={'title': title, 'tags': ['Matrix', 'Shared']}), 201)
+    with app.app_context():
+        count = Tag.query.filter(Tag.name.in_(['Matrix', 'matrix'])).count()
+        assert count == 1, f'{count} rows for one tag name'
+    cloud = {tag['name'].lower(): tag['trainings'] for tag in expect(client.get('/api/tags'), 200)['tags']}
+    assert cloud.get('matrix') == 2, f'tag cloud: {cloud}'
+
+def check_search(app, client):
+    created = expect(client.post('/api/trainings', json={
+        'title': 'Quarterly onboarding checklist',
+        'description': 'Everything a new VA needs in week one',
+    }), 201)['training']
+    results = expect(client.get('/api/search', query_string={'q': 'Onboarding'}), 200)['results']
+    assert any(r['kind'] == 'training' and r['id'] == created['id'] for r in results), results
+    results = expect(client.get('/api/search', query_string={'q': 'nothing-like-this'}), 200)['results']
+    assert not results, results
+
+def check_training_import(app, client):
+    items = [{'title': f'Imported {i}', 'url': f'https://example.com/matrix/{i}'} for i in range(3)]
+    counts = expect(client.post('/api/trainings/bulk-import', json={'trainings': items}), 201)
+    assert (counts['created'], counts['updated']) == (3, 0), counts
+    items[0]['title'] = 'Imported again'
+    counts = expect(client.post('/api/trainings/bulk-import', json={'trainings': items}), 201)
+    assert (counts['created'], counts['updated'], counts['skipped']) == (0, 1, 2), counts
+    body = expect(client.post('/api/trainings', json={'title': 'Copy', 'url': items[1]['url']}), 400)
+    assert 'URL' in body['error'], body
+
+def check_training_url_merge(app, client):
+    url = 'https://example.com/matrix/duplicate'
+    ids = [
+        expect(client.post('/api/trainings', json={'title': title, 'tags': [title]}), 201)['training']['id']
+        for title in ('Original', 'Copy')
+    ]
+    for training_id in ids:
+        expect(client.post(f'/api/trainings/{training_id}/complete'), 200)
+    with app.app_context():
+        # A database from before the unique URL index
+        db.session.execute(text('DROP INDEX ix_training_url'))
+        Training.query.filter(Training.id.in_(ids)).update({Training.url: url}, synchronize_session=False)
+        db.session.commit()
+        upgrade_schema()
+        remaining = [training.id for training in Training.query.filter_by(url=url)]
+        assert remaining == ids[:1], f'trainings with the URL: {remaining}'
+        progress = [row.training_id for row in TrainingProgress.query.filter(TrainingProgress.training_id.in_(ids))]
+        assert progress == ids[:1], f'progress rows on {progress}'
+        links = db.session.query(training_tags.c.training_id).filter(training_tags.c.training_id.in_(ids)).count()
+        assert links == 2, f'{links} tag links on the kept training'
+        indexes = {index['name'] for index in db.inspect(db.engine).get_indexes('training')}
+        assert 'ix_training_url' in indexes, indexes
+
+def check_long_usernames(app, client):
+    local = 'a' * 100
+    usernames = []
+    # The second and third imports clash with names cut short for a suffix
+    for domains in (['one'], ['two', 'three'], ['four']):
+        body = expect(client.post('/api/users/bulk', json={'users': [
+            {'first_name': 'Long', 'last_name': 'Email', 'email': f'{local}@{domain}.example', 'role': 'va'}
+            for domain in domains
+        ]}), 201)
+        usernames += [result['username'] for result in body['results']]
+    assert usernames == [local[:80], local[:79] + '1', local[:79] + '2', local[:79] + '3'], usernames
+
+def check_pagination(app, client):
+    for number in range(4):
+        expect(client.post('/api/announcements', json={
+            'title': f'Notice {number}', 'content': 'Matrix', 'is_pinned': number == 1
+        }), 201)
+    # Without limit or cursor the whole list comes back, as older clients expect
+    listed = expect(client.get('/api/announcements'), 200)
+    assert (listed['limit'], listed['next_cursor']) == (None, None), listed
+    everything = [a['id'] for a in listed['announcements']]
+    seen, cursor = [], None
+    while True:
+        page = expect(client.get('/api/announcements', query_string={'limit': 1, 'cursor': cursor or ''}), 200)
+        seen += [a['id'] for a in page['announcements']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert seen == everything, f'paged {seen}, listed {everything}'
+
+class SlowExitEventBus(DatabaseEventBus):
+    """Holds the poller between deciding to exit and returning"""
+
+    def __init__(self, app):
+        super().__init__(app, poll_interval=0.05)
+        self.exiting = threading.Event()
+        self.resume = threading.Event()
+
+    def _keep_polling(self):
+        keep = super()._keep_polling()
+        if not keep:
+            self.exiting.set()
+            self.resume.wait(5)
+        return keep
+
+def check_event_bus_restart(app, client):
+    bus = SlowExitEventBus(app)
+    bus.unsubscribe(bus.subscribe())
+    assert bus.exiting.wait(5), 'the poller did not stop after the last unsubscribe'
+    # The old poller thread is still alive while this subscribes
+    subscriber = bus.subscribe()
+    bus.resume.set()
+    try:
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            # The new poller starts from the newest row, so keep publishing
+            with app.app_context():
+                bus.publish('matrix_event', {'check': 'restart'})
+            try:
+                event = subscriber.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            assert event['type'] == 'matrix_event', event
+            return
+        raise AssertionError('no events reached a subscriber that arrived while the poller was exiting')
+    finally:
+        bus.unsubscribe(subscriber)
+
+def check_export_job(app, client):
+    body = expect(client.get('/api/time-logs/export', headers={'Prefer': 'respond-async'}), 202)
+    with app.app_context():
+        get_job_queue().tick()
+    job = expect(client.get(f"/api/jobs/{body['job']['id']}"), 200)['job']
+    assert job['status'] == 'succeeded', job
+    download = client.get(job['artifact_url'])
+    assert download.status_code == 200 and download.data.startswith(b'Date,Employee'), download.status_code
+
+CHECKS = (
+    ('user-024', 'clock in/out upserts the time log and rollup', check_clock_upserts),
+    ('user-023', 'partial unique index allows one open interval', check_open_interval_index),
+    ('user-024', 'Idempotency-Key replays a clock-in', check_idempotent_replay),
+    ('user-013', 'content versions bump with ON CONFLICT', check_content_versions),
+    ('user-012', 'shared tags are created once', check_tags),
+    ('user-011', 'search: FTS5 on SQLite, LIKE fallback elsewhere', check_search),
+    ('user-010', 'catalogue import upserts on the URL index', check_training_import),
+    ('user-010', 'duplicate training URLs merge before the index', check_training_url_merge),
+    ('user-017', 'generated usernames fit the column', check_long_usernames),
+    ('user-002', 'keyset pagination over pinned announcements', check_pagination),
+    ('user-014', 'a subscriber arriving as the event poller exits gets events', check_event_bus_restart),
+    ('user-025', 'async export job runs and serves its file', check_export_job),
+)
+
+def run_backend(backend, pg_server):
+    """Run every check on a fresh database; returns [(request, description, error or None, seconds)]"""
+    results = []
+    with database_url(backend, pg_server) as url, tempfile.TemporaryDirectory() as workdir:
+        app = make_app(url, workdir)
+        try:
+            client = admin_client(app)
+            for request_id, description, check in CHECKS:
+                started = time.perf_counter()
+                try:
+                    check(app, client)
+                    error = None
+                except Exception as e:
+                    error = str(e) if isinstance(e, AssertionError) else traceback.format_exc(limit=-3).strip()
+                results.append((request_id, description, error, time.perf_counter() - started))
+        finally:
+            with app.app_context():
+                db.session.remove()
+                db.engine.dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', action='append', choices=BACKENDS, help='repeatable; default: both')
+    args = parser.parse_args()
+    backends = args.backend or list(BACKENDS)
+
+    failures = 0
+    with (postgres_server() if 'postgresql' in backends else nullcontext()) as pg_server:
+        for backend in backends:
+            # A fresh process per backend: the session registry, event bus and
+            # caches are module globals bound to the first app that uses them
+            with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                results = pool.submit(run_backend, backend, pg_server).result()
+            print(backend)
+            for request_id, description, error, seconds in results:
+                print(f"  {'FAIL' if error else 'ok  '} [{request_id}] {description} ({seconds * 1000:.0f} ms)")
+                if error:
+                    failures += 1
+                    print('       ' + error.replace('\n', '\n       '))
+    if failures:
+        print(f'{failures} failed')
+        sys.exit(1)
+    print('OK')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Simulate the 9am rush: every VA clocks in at the same moment.
+
+Each user gets its own thread and logged-in client; all of them are released
+by one barrier and POST /api/time-logs/clock-in together against a
+throwaway SQLite file with the configured pragmas and pool:
+
+    python benchmarks/load_clock_in.py [--users 300] [--journal-mode WAL]
+        [--busy-timeout-ms 5000] [--pool-size 10] [--max-overflow 20]
+
+Compare with `--journal-mode DELETE --busy-timeout-ms 0` to see the
+rollback-journal behaviour the WAL setup replaced. Exits non-zero if any
+clock-in fails or the database does not end up with exactly one open
+interval and one time log per user.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text
+from werkzeug.security import generate_password_hash
+from src.config import database_config
+from src.main import create_app
+from src.models.user import db, User, TimeLog, TimeInterval
+
+PASSWORD = 'nine-am'
+
+def create_users(app, count):
+    password_hash = generate_password_hash(PASSWORD, 'pbkdf2:sha256:1000')
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {
+                'username': f'va{number}', 'email': f'va{number}@example.com', 'password_hash': password_hash,
+                'first_name': 'VA', 'last_name': str(number), 'role': 'va', 'is_active': True,
+            }
+            for number in range(count)
+        ])
+        db.session.commit()
+        return [f'va{number}' for number in range(count)]
+
+def logged_in_client(app, username):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'username': username, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return client
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1] if len(values) > 1 else values[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--journal-mode', default='WAL')
+    parser.add_argument('--busy-timeout-ms', type=int, default=5000)
+    parser.add_argument('--pool-size', type=int, default=10)
+    parser.add_argument('--max-overflow', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config = database_config({
+            'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'rush.db')}",
+            'SQLITE_JOURNAL_MODE': args.journal_mode,
+            'SQLITE_BUSY_TIMEOUT_MS': str(args.busy_timeout_ms),
+            'DB_POOL_SIZE': str(args.pool_size),
+            'DB_MAX_OVERFLOW': str(args.max_overflow),
+        })
+        config.update({
+            'INIT_DB_ON_STARTUP': True,
+            'PASSWORD_HASH_WORKERS': 0,
+            # Waiting for the write lock is the point here, not a slow query
+            'SLOW_QUERY_MS': 60000,
+        })
+        app = create_app(config)
+        with app.app_context():
+            journal_mode = db.session.execute(text('PRAGMA journal_mode')).scalar()
+        usernames = create_users(app, args.users)
+        clients = [logged_in_client(app, username) for username in usernames]
+
+        barrier = threading.Barrier(len(clients))
+
+        def clock_in(client):
+            barrier.wait()
+            started = time.perf_counter()
+            response = client.post('/api/time-logs/clock-in')
+            return response.status_code, time.perf_counter() - started, response.get_json()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+            results = list(pool.map(clock_in, clients))
+        elapsed = time.perf_counter() - started
+
+        with app.app_context():
+            open_intervals = TimeInterval.query.filter(TimeInterval.ended_at.is_(None)).count()
+            time_logs = TimeLog.query.count()
+            db.engine.dispose()
+
+    statuses = Counter(status for status, _, _ in results)
+    latencies = sorted(duration for _, duration, _ in results)
+    errors = Counter(body.get('error') for status, _, body in results if status != 200 and body)
+
+    print(f'journal_mode={journal_mode} busy_timeout={args.busy_timeout_ms}ms '
+          f'pool={args.pool_size}+{args.max_overflow}')
+    print(f'{len(results)} simultaneous clock-ins in {elapsed:.2f}s ({len(results) / elapsed:.0f} req/s)')
+    print('responses: ' + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+    print(f'latency p50 {percentile(latencies, 50) * 1000:.0f} ms, p99 {percentile(latencies, 99) * 1000:.0f} ms, '
+          f'max {latencies[-1] * 1000:.0f} ms')
+    for error, count in errors.most_common():
+        print(f'  {count} x {error}')
+
+    failures = []
+    if statuses.get(200, 0) != args.users:
+        failures.append(f'{args.users - statuses.get(200, 0)} clock-ins failed')
+    if open_intervals != args.users:
+        failures.append(f'{open_intervals} open intervals, expected {args.users}')
+    if time_logs != args.users:
+        failures.append(f'{time_logs} time logs, expected {args.users}')
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+if __name__ == '__main__':
+    main()
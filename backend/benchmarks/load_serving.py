@@ -0,0 +1,238 @@
+"""Compare the dev server with the ASGI entry point under open event streams.
+
+For each server, starts it on a throwaway SQLite file, opens --streams
+idle GET /api/events/stream connections, then runs --workers clients
+calling GET /api/announcements back to back for --seconds. Reports the
+p50/p99 latency and throughput of those short calls, and how long an
+announcement takes to reach every open stream:
+
+    python benchmarks/load_serving.py [--server dev] [--server asgi]
+        [--streams 200] [--workers 16] [--seconds 10]
+
+'dev' is app.run(threaded=True), as in main.py but without the debugger
+and reloader; 'asgi' is uvicorn src.asgi:application with one worker.
+Exits non-zero if a stream fails to open, an API call fails, or the
+announcement does not reach every stream.
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'dev': [sys.executable, '-c', (
+        'import os; from src.main import create_app; '
+        "create_app().run(host='127.0.0.1', port=int(os.environ['PORT']), threaded=True)"
+    )],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'src.asgi:application', '--host', '127.0.0.1',
+             '--log-level', 'warning'],
+}
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start listening')
+
+def request(port, method, path, cookie=None, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Cookie': cookie} if cookie else {}
+    if body is not None:
+        headers['Content-Type'] = 'application/json'
+        body = json.dumps(body)
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read(), response.getheader('Set-Cookie')
+    finally:
+        connection.close()
+
+def login(port):
+    status, body, set_cookie = request(port, 'POST', '/api/auth/login',
+                                       body={'username': 'admin', 'password': 'admin123'})
+    assert status == 200, body
+    return set_cookie.split(';', 1)[0]
+
+class Stream(threading.Thread):
+    """One open event stream, noting when the first announcement arrives"""
+
+    def __init__(self, port, cookie):
+        super().__init__(daemon=True)
+        self.port = port
+        self.cookie = cookie
+        self.connected = threading.Event()
+        self.status = None
+        self.received_at = None
+        self.connection = None
+
+    def run(self):
+        try:
+            self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+            self.connection.request('GET', '/api/events/stream', headers={'Cookie': self.cookie})
+            response = self.connection.getresponse()
+            self.status = response.status
+            self.connected.set()
+            while True:
+                line = response.readline()
+                if not line:
+                    return
+                if line.startswith(b'event: announcement_created'):
+                    self.received_at = time.perf_counter()
+                    return
+        except OSError:
+            pass
+        finally:
+            self.connected.set()
+
+    def close(self):
+        try:
+            self.connection.sock.shutdown(socket.SHUT_RDWR)
+        except (AttributeError, OSError):
+            pass
+
+def run_api_load(port, cookie, workers, seconds):
+    """[(status, seconds)] for back-to-back list calls from `workers` threads"""
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def work():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = request(port, 'GET', '/api/announcements?limit=20', cookie)[0]
+            except OSError:
+                status = 'error'
+            with lock:
+                results.append((status, time.perf_counter() - started))
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def percentile_ms(values, q):
+    if not values:
+        return float('nan')
+    if len(values) == 1:
+        return values[0] * 1000
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1] * 1000
+
+def measure(server, args):
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(
+            os.environ,
+            PORT=str(port),
+            DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'serving.db')}",
+            INIT_DB_ON_STARTUP='1',
+            PASSWORD_HASH_WORKERS='0',
+            JOB_DISPATCHER='0',
+        )
+        command = SERVERS[server] + (['--port', str(port)] if server == 'asgi' else [])
+        process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        streams = []
+        try:
+            _wait_for_port(port, process)
+            cookie = login(port)
+            for number in range(5):
+                request(port, 'POST', '/api/announcements', cookie, {'title': f'Seed {number}', 'content': '...'})
+
+            streams = [Stream(port, cookie) for _ in range(args.streams)]
+            for stream in streams:
+                stream.start()
+            for stream in streams:
+                stream.connected.wait(30)
+            open_streams = sum(1 for stream in streams if stream.status == 200)
+
+            started = time.perf_counter()
+            results = run_api_load(port, cookie, args.workers, args.seconds)
+            elapsed = time.perf_counter() - started
+
+            published_at = time.perf_counter()
+            request(port, 'POST', '/api/announcements', cookie, {'title': 'Stand-up moved', 'content': '10:15'})
+            for stream in streams:
+                stream.join(10)
+            delivered = [stream.received_at - published_at for stream in streams if stream.received_at]
+        finally:
+            for stream in streams:
+                stream.close()
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                # uvicorn waits for open streams on a graceful shutdown
+                process.kill()
+                process.wait()
+
+    latencies = [duration for status, duration in results if status == 200]
+    return {
+        'open_streams': open_streams,
+        'requests': len(results),
+        'statuses': Counter(status for status, _ in results),
+        'throughput': len(latencies) / elapsed,
+        'p50': percentile_ms(latencies, 50),
+        'p99': percentile_ms(latencies, 99),
+        'delivered': len(delivered),
+        'delivery_p50': percentile_ms(delivered, 50),
+        'delivery_p99': percentile_ms(delivered, 99),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', action='append', choices=SERVERS, help='repeatable; default: both')
+    parser.add_argument('--streams', type=int, default=200, help='idle event streams held open')
+    parser.add_argument('--workers', type=int, default=16, help='concurrent API clients')
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    print(f'{args.streams} open streams, {args.workers} API clients for {args.seconds:g}s')
+    print(f"{'server':<8}{'streams':>9}{'req/s':>8}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'delivered':>11}{'event p50':>11}{'event p99':>11}  responses")
+    failures = []
+    for server in args.server or list(SERVERS):
+        result = measure(server, args)
+        statuses = ', '.join(f'{status}: {count}' for status, count in sorted(result['statuses'].items(), key=str))
+        print(f"{server:<8}{result['open_streams']:>9}{result['throughput']:>8.0f}{result['p50']:>9.1f}"
+              f"{result['p99']:>9.1f}{result['delivered']:>11}{result['delivery_p50']:>11.1f}"
+              f"{result['delivery_p99']:>11.1f}  {statuses}")
+        if result['open_streams'] != args.streams:
+            failures.append(f"{server}: {args.streams - result['open_streams']} streams did not open")
+        if result['statuses'].get(200, 0) != result['requests']:
+            failures.append(f"{server}: {result['requests'] - result['statuses'].get(200, 0)} API calls failed")
+        if result['delivered'] != result['open_streams']:
+            failures.append(f"{server}: the announcement reached {result['delivered']} of "
+                            f"{result['open_streams']} streams")
+
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Hammer clock-in/clock-out from many threads and check the time log invariants.
+
+Every round, all threads of every user clock in at once (some retrying with
+a shared Idempotency-Key, some double-clicking without one), then all clock
+out at once. Runs against a throwaway SQLite database:
+
+    python benchmarks/stress_clock.py [--users 10] [--threads 8] [--rounds 5]
+
+Exits non-zero if a user ends up with more than one time log per day, more
+or fewer intervals than rounds, a second successful clock action in a
+round, differing replayed responses or totals that do not add up.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from src.main import create_app
+from src.models.user import db, User, TimeLog, TimeInterval, TimeLogRollup
+
+PASSWORD = 'stress-test'
+
+def create_users(app, count):
+    with app.app_context():
+        users = []
+        for number in range(count):
+            user = User(
+                username=f'stress{number}',
+                email=f'stress{number}@example.com',
+                first_name='Stress',
+                last_name=str(number),
+                role='va'
+            )
+            user.set_password(PASSWORD)
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        return [user.username for user in users]
+
+def logged_in_client(app, username):
+    client = app.test_client()
+    response = client.post('/api/auth/login', json={'username': username, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return client
+
+def run_round(pool, clients, path, barrier):
+    """Send `path` from every client at once; returns {username: [(keyed, status, replayed, body)]}"""
+    keys = {username: str(uuid.uuid4()) for username in clients}
+
+    def send(username, client, keyed):
+        headers = {'Idempotency-Key': keys[username]} if keyed else {}
+        barrier.wait()
+        response = client.post(path, headers=headers)
+        return username, keyed, response.status_code, 'Idempotent-Replayed' in response.headers, response.get_json()
+
+    futures = [
+        pool.submit(send, username, client, index % 2 == 0)
+        for username, user_clients in clients.items()
+        for index, client in enumerate(user_clients)
+    ]
+    results = defaultdict(list)
+    for future in futures:
+        username, *result = future.result()
+        results[username].append(tuple(result))
+    return results
+
+def check_round(label, results, failures):
+    statuses = Counter()
+    for username, responses in results.items():
+        statuses.update(status for _, status, _, _ in responses)
+        fresh = [body for _, status, replayed, body in responses if status == 200 and not replayed]
+        if len(fresh) != 1:
+            failures.append(f'{label}: {username} got {len(fresh)} successful responses')
+        keyed = [(status, body) for is_keyed, status, _, body in responses if is_keyed]
+        if any(entry != keyed[0] for entry in keyed):
+            failures.append(f'{label}: {username} got different responses for one Idempotency-Key')
+    return statuses
+
+def check_tables(app, usernames, rounds, failures):
+    with app.app_context():
+        ids = dict(db.session.query(User.username, User.id).filter(User.username.in_(usernames)))
+        duplicate_days = db.session.query(TimeLog.user_id, TimeLog.date).group_by(
+            TimeLog.user_id, TimeLog.date
+        ).having(func.count() > 1).all()
+        if duplicate_days:
+            failures.append(f'{len(duplicate_days)} user/day pairs have more than one time log')
+
+        intervals = dict(db.session.query(TimeInterval.user_id, func.count()).group_by(TimeInterval.user_id))
+        open_intervals = TimeInterval.query.filter(TimeInterval.ended_at.is_(None)).count()
+        if open_intervals:
+            failures.append(f'{open_intervals} intervals left open')
+        for username, user_id in ids.items():
+            if intervals.get(user_id, 0) != rounds:
+                failures.append(f'{username} has {intervals.get(user_id, 0)} intervals, expected {rounds}')
+
+        logs = {(log.user_id, log.date): log.total_hours for log in TimeLog.query}
+        interval_totals = db.session.query(
+            TimeInterval.user_id, TimeInterval.date, func.sum(TimeInterval.hours)
+        ).group_by(TimeInterval.user_id, TimeInterval.date)
+        rollups = {(row.user_id, row.date): row.total_hours for row in TimeLogRollup.query}
+        for user_id, day, hours in interval_totals:
+            if abs((logs.get((user_id, day)) or 0) - hours) > 0.01:
+                failures.append(f'time log total for user {user_id} on {day} does not match its intervals')
+            if abs(rollups.get((user_id, day), 0) - hours) > 0.01:
+                failures.append(f'rollup for user {user_id} on {day} does not match its intervals')
+        return len(logs)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--threads', type=int, default=8, help='concurrent requests per user')
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'stress.db')}",
+            'INIT_DB_ON_STARTUP': True,
+            # Logging every client in should not dominate the run
+            'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+            'PASSWORD_HASH_WORKERS': 0,
+            # Waiting for SQLite's write lock is expected here, not a slow query
+            'SLOW_QUERY_MS': 60000,
+        })
+        usernames = create_users(app, args.users)
+        clients = {username: [logged_in_client(app, username) for _ in range(args.threads)] for username in usernames}
+
+        workers = args.users * args.threads
+        failures = []
+        statuses = Counter()
+        requests = 0
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for round_number in range(args.rounds):
+                for path in ('/api/time-logs/clock-in', '/api/time-logs/clock-out'):
+                    results = run_round(pool, clients, path, threading.Barrier(workers))
+                    statuses += check_round(f'round {round_number + 1} {path}', results, failures)
+                    requests += workers
+        elapsed = time.perf_counter() - started
+
+        time_logs = check_tables(app, usernames, args.rounds, failures)
+
+    print(f'{requests} requests from {workers} threads in {elapsed:.2f}s ({requests / elapsed:.0f} req/s)')
+    print('responses: ' + ', '.join(f'{status}: {count}' for status, count in sorted(statuses.items())))
+    print(f'{time_logs} time logs for {args.users} users')
+    for failure in failures:
+        print(f'FAIL {failure}')
+    if failures:
+        sys.exit(1)
+    print('OK')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Production ASGI entry point.
+
+    uvicorn src.asgi:application --host 0.0.0.0 --port 5000 --workers 4
+
+The Flask blueprints run unchanged behind a WSGI adapter whose thread pool
+(ASGI_THREADS, default 32) bounds concurrent synchronous database work. The
+event stream is served natively on the event loop, so idle dashboard
+connections hold no threads.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from a2wsgi import WSGIMiddleware
+from flask import g, session
+from flask_cors.core import get_cors_options, get_cors_headers
+from werkzeug.datastructures import Headers
+from werkzeug.test import EnvironBuilder
+from src.main import app, CORS_OPTIONS
+from src.models.user import db
+from src.routes.auth import current_user_role
+from src.utils.events import get_event_bus, visible_events, format_sse, HEARTBEAT_INTERVAL
+from src.utils.metrics import request_metrics
+
+wsgi_application = WSGIMiddleware(app, workers=int(os.environ.get('ASGI_THREADS', 32)))
+
+def _authorize(cookie):
+    """(role or None, SQL statements, SQL seconds) for the session cookie"""
+    environ = EnvironBuilder(path='/api/events/stream', headers={'Cookie': cookie}).get_environ()
+    with app.request_context(environ):
+        g.sql_count = 0
+        g.sql_time = 0.0
+        try:
+            role = current_user_role() if 'user_id' in session else None
+            return role or None, g.sql_count, g.sql_time
+        finally:
+            db.session.remove()
+
+def _cors_headers(scope):
+    """The headers flask_cors would add to this request on a Flask route"""
+    request_headers = Headers([
+        (name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']
+    ])
+    options = get_cors_options(app, CORS_OPTIONS)
+    return [
+        (name.lower().encode('latin-1'), str(value).encode('latin-1'))
+        for name, value in get_cors_headers(options, request_headers, scope['method']).items(multi=True)
+    ]
+
+async def _send_json(send, status, body, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers]
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(body).encode()})
+
+async def _wait_for_disconnect(receive, disconnected):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            disconnected.set()
+            return
+
+async def stream_events(scope, receive, send):
+    """Native async version of GET /api/events/stream.
+
+    Recorded in the request metrics like the Flask route: the duration is the
+    time until the response starts, not the life of the stream.
+    """
+    started = time.perf_counter()
+    cookie = dict(scope['headers']).get(b'cookie', b'').decode('latin-1')
+    role, sql_count, sql_time = await asyncio.get_running_loop().run_in_executor(
+        wsgi_application.executor, _authorize, cookie
+    )
+    cors_headers = _cors_headers(scope)
+
+    def record(status):
+        request_metrics.record_request(
+            'events', 'events.stream_events', 'GET', status,
+            time.perf_counter() - started, sql_count, sql_time
+        )
+
+    if role is None:
+        await _send_json(send, 401, {'error': 'Authentication required'}, cors_headers)
+        record(401)
+        return
+    allowed = visible_events(role)
+
+    bus = get_event_bus()
+    subscriber = bus.subscribe_async()
+    disconnected = asyncio.Event()
+    watcher = asyncio.create_task(_wait_for_disconnect(receive, disconnected))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                *cors_headers
+            ]
+        })
+        record(200)
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while not disconnected.is_set():
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                chunk = ': keep-alive\n\n'
+            else:
+                if allowed is not None and event['type'] not in allowed:
+                    continue
+                chunk = format_sse(event)
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    finally:
+        bus.unsubscribe(subscriber)
+        watcher.cancel()
+
+# Routes served on the event loop instead of the WSGI thread pool
+ASYNC_ROUTES = {
+    ('GET', '/api/events/stream'): stream_events,
+}
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        handler = ASYNC_ROUTES.get((scope['method'], scope['path']))
+        if handler is not None:
+            await handler(scope, receive, send)
+            return
+    await wsgi_application(scope, receive, send)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(
+        'src.asgi:application',
+        host='0.0.0.0',
+        port=int(os.environ.get('PORT', 5000)),
+        workers=int(os.environ.get('WEB_CONCURRENCY', 1))
+    )
@@ -3,37 +3,41 @@ import sys
 # DON\'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import importlib
+import time
+import click
+from flask import Flask
 from flask_cors import CORS
+from src.config import database_config
 from src.models.user import db, User
-from src.routes.auth import auth_bp
-from src.routes.time_logs import time_logs_bp
-from src.routes.eod_reports import eod_reports_bp
-from src.routes.announcements import announcements_bp
-from src.routes.trainings import trainings_bp
-from src.routes.sops import sops_bp
-from src.routes.leave_requests import leave_requests_bp
-from src.routes.users import users_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'turma-labs-secret-key-2024'
-
-# Enable CORS for all routes
-CORS(app, supports_credentials=True)
-
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(time_logs_bp, url_prefix='/api/time-logs')
-app.register_blueprint(eod_reports_bp, url_prefix='/api/eod-reports')
-app.register_blueprint(announcements_bp, url_prefix='/api/announcements')
-app.register_blueprint(trainings_bp, url_prefix='/api/trainings')
-app.register_blueprint(sops_bp, url_prefix='/api/sops')
-app.register_blueprint(leave_requests_bp, url_prefix='/api/leave-requests')
-app.register_blueprint(users_bp, url_prefix='/api')
-
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+
+# (module, blueprint attribute, url prefix); modules are imported by create_app,
+# so importing this file alone stays cheap
+BLUEPRINTS = (
+    ('src.routes.auth', 'auth_bp', '/api/auth'),
+    ('src.routes.time_logs', 'time_logs_bp', '/api/time-logs'),
+    ('src.routes.eod_reports', 'eod_reports_bp', '/api/eod-reports'),
+    ('src.routes.announcements', 'announcements_bp', '/api/announcements'),
+    ('src.routes.trainings', 'trainings_bp', '/api/trainings'),
+    ('src.routes.sops', 'sops_bp', '/api/sops'),
+    ('src.routes.leave_requests', 'leave_requests_bp', '/api/leave-requests'),
+    ('src.routes.users', 'users_bp', '/api'),
+    ('src.routes.dashboard', 'dashboard_bp', '/api/dashboard'),
+    ('src.routes.search', 'search_bp', '/api/search'),
+    ('src.routes.tags', 'tags_bp', '/api/tags'),
+    ('src.routes.events', 'events_bp', '/api/events'),
+    ('src.routes.jobs', 'jobs_bp', '/api/jobs'),
+    ('src.routes.metrics', 'metrics_bp', None),
+    ('src.routes.metrics', 'profiling_bp', '/api/profiling'),
+)
+
+# flask_cors options; the natively served routes in src.asgi apply the same ones
+CORS_OPTIONS = {'supports_credentials': True}
+
+def register_blueprints(app):
+    for module_name, attribute, url_prefix in BLUEPRINTS:
+        blueprint = getattr(importlib.import_module(module_name), attribute)
+        app.register_blueprint(blueprint, url_prefix=url_prefix)
 
 def create_admin_user():
     """Create default admin user if it doesn't exist"""
@@ -51,28 +55,159 @@ def create_admin_user():
         db.session.commit()
         print("Default admin user created: username=admin, password=admin123")
 
-with app.app_context():
+def init_db():
+    """Create tables, bring existing ones up to date and seed the admin user"""
+    from src.utils.migrations import upgrade_schema
+    from src.utils.search import ensure_search_index
+
     db.create_all()
+    upgrade_schema()
+    ensure_search_index()
     create_admin_user()
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
+def register_commands(app):
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create or upgrade the schema and the default admin user; safe to rerun"""
+        init_db()
+        print("Database initialized")
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Recompute daily time log totals from their intervals, then the rollup table"""
+        from src.utils.rollups import rebuild_rollups
+        from src.utils.work_time import rebuild_daily_totals
 
+        print(f"Recomputed {rebuild_daily_totals()} time log totals")
+        written = rebuild_rollups()
+        print(f"Rebuilt {written} time log rollup rows")
 
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild the full-text search tables from their source rows"""
+        from src.utils.search import reindex, SEARCH_KINDS
+
+        for kind in SEARCH_KINDS:
+            written = reindex(kind)
+            print(f"Indexed {written} {kind} rows")
+
+    @app.cli.command('compress-static')
+    @click.option('--prune-stale', is_flag=True, help='Delete bundles index.html no longer references')
+    def compress_static_command(prune_stale):
+        """Write precompressed .gz/.br copies of the static files"""
+        from src.utils.static_files import compress_static
+
+        compressed, pruned = compress_static(app.static_folder, prune_stale=prune_stale)
+        if prune_stale:
+            print(f"Removed {pruned} stale bundles")
+        print(f"Compressed {compressed} static files")
+
+    @app.cli.command('run-jobs')
+    def run_jobs_command():
+        """Run a job dispatcher in the foreground (for JOB_DISPATCHER=0 web workers)"""
+        from src.utils.jobs import get_job_queue
+
+        print("Running background jobs; press Ctrl+C to stop")
+        get_job_queue().run_forever()
+
+def register_static_route(app):
+    from src.utils.static_files import StaticIndex, send_static
+
+    # Static files are looked up in an index built once at startup; see src/utils/static_files.py
+    static_index = StaticIndex(app.static_folder)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if app.static_folder is None:
+                return "Static folder not configured", 404
+        return send_static(static_index, path, reload_on_miss=app.debug)
+
+def create_app(config=None):
+    """Build the application.
+
+    The schema is not touched here; run `flask --app src.main init-db` once
+    per deploy (or set INIT_DB_ON_STARTUP=1) so workers, tests and other CLI
+    commands start without DDL or the admin password hash.
+    """
+    started = time.perf_counter()
+
+    from src.utils.sqlite import configure_sqlite_engine
+    from src.utils.events import init_event_bus
+    from src.utils.metrics import init_request_metrics, instrument_engine
+    from src.utils.profiler import init_request_profiler
+    from src.utils.jobs import init_job_queue
 
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'turma-labs-secret-key-2024')
 
+    # Password hashing runs in a process pool; see src/utils/passwords.py
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    if os.environ.get('PASSWORD_HASH_WORKERS'):
+        app.config['PASSWORD_HASH_WORKERS'] = int(os.environ['PASSWORD_HASH_WORKERS'])
+
+    # Database configuration (DATABASE_URL and DB_* environment variables, see src/config.py)
+    app.config.update(database_config())
+
+    # Live events: 'database' fans out across workers through the event_log table
+    app.config['EVENT_BUS_BACKEND'] = os.environ.get('EVENT_BUS_BACKEND', 'memory')
+
+    # Request timing and SQL profiling, exposed at /metrics and /api/profiling
+    app.config['SLOW_QUERY_MS'] = int(os.environ.get('SLOW_QUERY_MS', '200'))
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+    # Sampled cProfile/pyinstrument profiles, switched on via PUT /api/profiling/sampling
+    if os.environ.get('PROFILE_DIR'):
+        app.config['PROFILE_DIR'] = os.environ['PROFILE_DIR']
+    app.config['PROFILE_MAX_FILES'] = int(os.environ.get('PROFILE_MAX_FILES', '50'))
+
+    # Zone that decides which work date a clock-in falls on (default: the server's)
+    app.config['WORK_TIMEZONE'] = os.environ.get('WORK_TIMEZONE')
+
+    # Background exports and imports (Prefer: respond-async), polled at /api/jobs
+    if os.environ.get('JOB_DIR'):
+        app.config['JOB_DIR'] = os.environ['JOB_DIR']
+    if os.environ.get('JOB_WORKERS'):
+        app.config['JOB_WORKERS'] = int(os.environ['JOB_WORKERS'])
+    app.config['JOB_DISPATCHER'] = os.environ.get('JOB_DISPATCHER', '1') != '0'
+
+    app.config['INIT_DB_ON_STARTUP'] = os.environ.get('INIT_DB_ON_STARTUP') == '1'
+
+    if config:
+        app.config.update(config)
+
+    # Enable CORS for all routes
+    CORS(app, **CORS_OPTIONS)
+
+    register_blueprints(app)
+    db.init_app(app)
+    init_event_bus(app)
+    init_request_metrics(app)
+    init_request_profiler(app)
+    init_job_queue(app)
+    register_commands(app)
+    register_static_route(app)
+
+    with app.app_context():
+        # Creating the engine does not open a connection
+        configure_sqlite_engine(app, db.engine)
+        instrument_engine(app, db.engine)
+        if app.config['INIT_DB_ON_STARTUP']:
+            init_db()
+
+    app.config['STARTUP_SECONDS'] = time.perf_counter() - started
+    app.logger.info('Application created in %.0f ms', app.config['STARTUP_SECONDS'] * 1000)
+    return app
+
+def __getattr__(name):
+    # `src.main:app` (gunicorn, the Flask CLI, src/asgi.py) builds the app on
+    # first access; `from src.main import create_app` does not
+    if name == 'app':
+        app = globals()['app'] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == '__main__':
+    app = create_app({'INIT_DB_ON_STARTUP': True})
+    app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,6 +1,7 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from src.utils.passwords import hash_password, verify_password, needs_rehash
 
 db = SQLAlchemy()
 
@@ -14,17 +15,22 @@ class User(db.Model):
     last_name = db.Column(db.String(50), nullable=False)
     assigned_client = db.Column(db.String(100), nullable=True)
     is_active = db.Column(db.Boolean, default=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     last_login = db.Column(db.DateTime, nullable=True)
+    # Bumped to revoke every session issued before the change
+    session_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def __repr__(self):
         return f'<User {self.username}>'
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     def to_dict(self):
         return {
@@ -41,9 +47,13 @@ class User(db.Model):
         }
 
 class TimeLog(db.Model):
+    __table_args__ = (
+        db.Index('ix_time_log_user_id_date', 'user_id', 'date', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    date = db.Column(db.Date, nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
     clock_in = db.Column(db.DateTime, nullable=True)
     clock_out = db.Column(db.DateTime, nullable=True)
     total_hours = db.Column(db.Float, nullable=True)
@@ -62,10 +72,78 @@ class TimeLog(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
-class EODReport(db.Model):
+class TimeInterval(db.Model):
+    """One clock-in/clock-out pair; a day's TimeLog sums its intervals.
+
+    Times are UTC. `date` is the work date the interval started on, so a
+    shift running past midnight counts towards the day it began.
+    """
+    __table_args__ = (
+        # At most one open interval per user
+        db.Index(
+            'ix_time_interval_open_user_id', 'user_id', unique=True,
+            sqlite_where=db.text('ended_at IS NULL'),
+            postgresql_where=db.text('ended_at IS NULL')
+        ),
+        db.Index('ix_time_interval_user_id_date', 'user_id', 'date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    time_log_id = db.Column(db.Integer, db.ForeignKey('time_log.id'), nullable=False, index=True)
     date = db.Column(db.Date, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False)
+    ended_at = db.Column(db.DateTime, nullable=True)
+    hours = db.Column(db.Float, nullable=True)
+
+    time_log = db.relationship('TimeLog', backref=db.backref('intervals', lazy=True, order_by='TimeInterval.started_at'))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'time_log_id': self.time_log_id,
+            'date': self.date.isoformat() if self.date else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'ended_at': self.ended_at.isoformat() if self.ended_at else None,
+            'hours': self.hours
+        }
+
+class TimeLogRollup(db.Model):
+    """Hours per user per day, with the ISO week and month precomputed for grouping"""
+    __table_args__ = (
+        db.Index('ix_time_log_rollup_user_id_date', 'user_id', 'date', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
+    week = db.Column(db.String(8), nullable=False, index=True)  # ISO week, e.g. '2025-W27'
+    month = db.Column(db.String(7), nullable=False, index=True)  # e.g. '2025-07'
+    total_hours = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = db.relationship('User', backref=db.backref('time_log_rollups', lazy=True))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'date': self.date.isoformat() if self.date else None,
+            'week': self.week,
+            'month': self.month,
+            'total_hours': self.total_hours,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class EODReport(db.Model):
+    __table_args__ = (
+        db.Index('ix_eod_report_user_id_date', 'user_id', 'date', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False, index=True)
     tasks_completed = db.Column(db.Text, nullable=False)
     blockers = db.Column(db.Text, nullable=True)
     issues = db.Column(db.Text, nullable=True)
@@ -86,20 +164,54 @@ class EODReport(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name
+        }
+
+training_tags = db.Table(
+    'training_tag',
+    db.Column('training_id', db.Integer, db.ForeignKey('training.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_training_tag_tag_id', 'tag_id', 'training_id')
+)
+
+sop_tags = db.Table(
+    'sop_tag',
+    db.Column('sop_id', db.Integer, db.ForeignKey('sop.id'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_sop_tag_tag_id', 'tag_id', 'sop_id')
+)
+
 class Training(db.Model):
+    __table_args__ = (
+        # The catalogue import matches trainings on URL when they have one
+        db.Index(
+            'ix_training_url', 'url', unique=True,
+            sqlite_where=db.text('url IS NOT NULL'),
+            postgresql_where=db.text('url IS NOT NULL')
+        ),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     url = db.Column(db.String(500), nullable=True)  # External URL for training
     file_url = db.Column(db.String(500), nullable=True)
     video_url = db.Column(db.String(500), nullable=True)
-    category = db.Column(db.String(100), nullable=True)
-    skill_level = db.Column(db.String(50), nullable=True)
-    tags = db.Column(db.String(500), nullable=True)  # JSON string of tags
+    category = db.Column(db.String(100), nullable=True, index=True)
+    skill_level = db.Column(db.String(50), nullable=True, index=True)
+    tags = db.Column(db.String(500), nullable=True)  # JSON list of tag names, mirrors tag_items
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     creator = db.relationship('User', backref=db.backref('created_trainings', lazy=True))
+    tag_items = db.relationship('Tag', secondary=training_tags, lazy=True)
 
     def to_dict(self):
         return {
@@ -117,6 +229,10 @@ class Training(db.Model):
         }
 
 class TrainingProgress(db.Model):
+    __table_args__ = (
+        db.Index('ix_training_progress_user_id_training_id', 'user_id', 'training_id', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     training_id = db.Column(db.Integer, db.ForeignKey('training.id'), nullable=False)
@@ -140,12 +256,13 @@ class SOP(db.Model):
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     file_url = db.Column(db.String(500), nullable=False)
-    category = db.Column(db.String(100), nullable=True)
-    tags = db.Column(db.String(500), nullable=True)  # JSON string of tags
+    category = db.Column(db.String(100), nullable=True, index=True)
+    tags = db.Column(db.String(500), nullable=True)  # JSON list of tag names, mirrors tag_items
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     creator = db.relationship('User', backref=db.backref('created_sops', lazy=True))
+    tag_items = db.relationship('Tag', secondary=sop_tags, lazy=True)
 
     def to_dict(self):
         return {
@@ -160,6 +277,10 @@ class SOP(db.Model):
         }
 
 class SOPRead(db.Model):
+    __table_args__ = (
+        db.Index('ix_sop_read_user_id_sop_id', 'user_id', 'sop_id', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     sop_id = db.Column(db.Integer, db.ForeignKey('sop.id'), nullable=False)
@@ -184,7 +305,7 @@ class LeaveRequest(db.Model):
     reason = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(20), default='pending')  # 'pending', 'approved', 'denied'
     admin_notes = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     reviewed_at = db.Column(db.DateTime, nullable=True)
     reviewed_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
 
@@ -209,9 +330,9 @@ class Announcement(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
-    is_pinned = db.Column(db.Boolean, default=False)
+    is_pinned = db.Column(db.Boolean, nullable=False, default=False)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     creator = db.relationship('User', backref=db.backref('announcements', lazy=True))
 
@@ -225,3 +346,101 @@ class Announcement(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class ContentVersion(db.Model):
+    """Change counter per content table, bumped in the same transaction as each write"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'version': self.version,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class EventLog(db.Model):
+    """Outbox read by every worker when the database event bus backend is enabled"""
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'payload': self.payload,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class IdempotencyKey(db.Model):
+    """Response stored for a write sent with an Idempotency-Key header, replayed on retries"""
+    __table_args__ = (
+        db.Index('ix_idempotency_key_user_id_key', 'user_id', 'key', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    status_code = db.Column(db.Integer, nullable=False)
+    response = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'key': self.key,
+            'endpoint': self.endpoint,
+            'status_code': self.status_code,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class Job(db.Model):
+    """Background job (export or import) run by the job dispatcher; see src/utils/jobs.py"""
+    __table_args__ = (
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    params = db.Column(db.Text, nullable=False)  # JSON
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    result = db.Column(db.Text, nullable=True)  # JSON
+    error = db.Column(db.Text, nullable=True)
+    artifact = db.Column(db.String(255), nullable=True)  # file name in JOB_DIR
+    artifact_name = db.Column(db.String(255), nullable=True)  # download name
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True)
+
+    creator = db.relationship('User', backref=db.backref('jobs', lazy=True))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'artifact_name': self.artifact_name if self.artifact else None,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
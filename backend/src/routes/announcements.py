@@ -1,32 +1,37 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import db, User, Announcement
 from src.routes.auth import login_required, admin_required
+from src.utils.queries import with_related, serialize_rows, CREATOR_FIELDS
+from src.utils.pagination import paginate, PaginationError
+from src.utils.cache import dashboard_cache
+from src.utils.search import index_item, remove_item
+from src.utils.conditional import conditional_get, bump_version
+from src.utils.events import publish_event
 from datetime import datetime
 
 announcements_bp = Blueprint('announcements', __name__)
 
 @announcements_bp.route('', methods=['GET'])
 @login_required
+@conditional_get('announcement', 'user')
 def get_announcements():
     try:
-        # Get all announcements, ordered by pinned first, then by creation date
-        announcements = Announcement.query.order_by(
-            Announcement.is_pinned.desc(),
-            Announcement.created_at.desc()
-        ).all()
+        # Page through announcements, ordered by pinned first, then by creation date
+        announcements, limit, next_cursor = paginate(
+            with_related(Announcement.query, Announcement.creator),
+            [Announcement.is_pinned, Announcement.created_at, Announcement.id]
+        )
         
-        result = []
-        for announcement in announcements:
-            announcement_dict = announcement.to_dict()
-            announcement_dict['creator'] = {
-                'id': announcement.creator.id,
-                'first_name': announcement.creator.first_name,
-                'last_name': announcement.creator.last_name
-            }
-            result.append(announcement_dict)
+        result = serialize_rows(announcements, {'creator': CREATOR_FIELDS})
         
-        return jsonify({'announcements': result}), 200
+        return jsonify({
+            'announcements': result,
+            'limit': limit,
+            'next_cursor': next_cursor
+        }), 200
 
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -49,7 +54,13 @@ def create_announcement():
         )
         
         db.session.add(announcement)
+        db.session.flush()
+        index_item('announcement', announcement)
+        bump_version('announcement')
         db.session.commit()
+        dashboard_cache.clear()
+        
+        publish_event('announcement_created', announcement.to_dict())
         
         return jsonify({
             'message': 'Announcement created successfully',
@@ -75,7 +86,10 @@ def update_announcement(announcement_id):
         if 'is_pinned' in data:
             announcement.is_pinned = data['is_pinned']
         
+        index_item('announcement', announcement)
+        bump_version('announcement')
         db.session.commit()
+        dashboard_cache.clear()
         
         return jsonify({
             'message': 'Announcement updated successfully',
@@ -93,7 +107,10 @@ def delete_announcement(announcement_id):
         announcement = Announcement.query.get_or_404(announcement_id)
         
         db.session.delete(announcement)
+        remove_item('announcement', announcement_id)
+        bump_version('announcement')
         db.session.commit()
+        dashboard_cache.clear()
         
         return jsonify({'message': 'Announcement deleted successfully'}), 200
 
@@ -103,23 +120,16 @@ def delete_announcement(announcement_id):
 
 @announcements_bp.route('/recent', methods=['GET'])
 @login_required
+@conditional_get('announcement', 'user')
 def get_recent_announcements():
     try:
         # Get the 3 most recent announcements for dashboard preview
-        announcements = Announcement.query.order_by(
+        announcements = with_related(Announcement.query, Announcement.creator).order_by(
             Announcement.is_pinned.desc(),
             Announcement.created_at.desc()
         ).limit(3).all()
         
-        result = []
-        for announcement in announcements:
-            announcement_dict = announcement.to_dict()
-            announcement_dict['creator'] = {
-                'id': announcement.creator.id,
-                'first_name': announcement.creator.first_name,
-                'last_name': announcement.creator.last_name
-            }
-            result.append(announcement_dict)
+        result = serialize_rows(announcements, {'creator': CREATOR_FIELDS})
         
         return jsonify({'announcements': result}), 200
 
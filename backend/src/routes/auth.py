@@ -1,15 +1,38 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, g
 from src.models.user import db, User
 from datetime import datetime
 from functools import wraps
+from src.utils.pagination import paginate, PaginationError
+from src.utils.conditional import bump_version
+from src.utils.passwords import PasswordHashBusy
+from src.utils.sessions import session_registry, start_session, session_is_valid, revoke_sessions
 
 auth_bp = Blueprint('auth', __name__)
 
+def invalidate_user_access(user_id):
+    """Pick up a user's new role, active flag or session version after the commit"""
+    session_registry.refresh(user_id)
+
+def current_user_role():
+    """Role of the signed-in user, or None if the session is no longer valid"""
+    if 'user_role' not in g:
+        g.user_role = session['user_role'] if session_is_valid() else None
+    return g.user_role
+
+def load_current_user():
+    """Full User row of the signed-in user, loaded at most once per request"""
+    if 'current_user' not in g:
+        g.current_user = db.session.get(User, session['user_id'])
+    return g.current_user
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return jsonify({'error': 'Authentication required'}), 401
+        if current_user_role() is None:
+            session.clear()
+            return jsonify({'error': 'Session expired'}), 401
         return f(*args, **kwargs)
     return decorated_function
 
@@ -18,9 +41,11 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return jsonify({'error': 'Authentication required'}), 401
+        if current_user_role() is None:
+            session.clear()
+            return jsonify({'error': 'Session expired'}), 401
         
-        user = User.query.get(session['user_id'])
-        if not user or user.role != 'admin':
+        if current_user_role() != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
     return decorated_function
@@ -38,12 +63,14 @@ def login():
         user = User.query.filter_by(username=username).first()
         
         if user and user.check_password(password) and user.is_active:
-            session['user_id'] = user.id
-            session['user_role'] = user.role
+            # Upgrade hashes made with an older algorithm or cost
+            if user.password_needs_rehash():
+                user.set_password(password)
             
             # Update last login
             user.last_login = datetime.utcnow()
             db.session.commit()
+            start_session(user)
             
             return jsonify({
                 'message': 'Login successful',
@@ -52,6 +79,9 @@ def login():
         else:
             return jsonify({'error': 'Invalid credentials'}), 401
 
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -65,7 +95,7 @@ def logout():
 @login_required
 def get_current_user():
     try:
-        user = User.query.get(session['user_id'])
+        user = load_current_user()
         if user:
             return jsonify({'user': user.to_dict()}), 200
         else:
@@ -110,6 +140,9 @@ def register_user():
             'user': user.to_dict()
         }), 201
 
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -118,10 +151,20 @@ def register_user():
 @admin_required
 def get_users():
     try:
-        users = User.query.all()
+        query = User.query
+        if request.args.get('role'):
+            query = query.filter_by(role=request.args.get('role'))
+        if request.args.get('is_active'):
+            query = query.filter_by(is_active=request.args.get('is_active') == 'true')
+
+        users, limit, next_cursor = paginate(query, [User.created_at, User.id], descending=False)
         return jsonify({
-            'users': [user.to_dict() for user in users]
+            'users': [user.to_dict() for user in users],
+            'limit': limit,
+            'next_cursor': next_cursor
         }), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -133,6 +176,7 @@ def update_user(user_id):
         data = request.get_json()
         
         # Update allowed fields
+        previous_access = (user.role, user.is_active)
         allowed_fields = ['first_name', 'last_name', 'email', 'role', 'assigned_client', 'is_active']
         for field in allowed_fields:
             if field in data:
@@ -142,13 +186,22 @@ def update_user(user_id):
         if data.get('password'):
             user.set_password(data['password'])
         
+        # Role, status and password changes end existing sessions
+        if data.get('password') or (user.role, user.is_active) != previous_access:
+            revoke_sessions(user)
+        
+        bump_version('user')
         db.session.commit()
+        invalidate_user_access(user_id)
         
         return jsonify({
             'message': 'User updated successfully',
             'user': user.to_dict()
         }), 200
 
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -163,8 +216,11 @@ def delete_user(user_id):
         if user.id == session['user_id']:
             return jsonify({'error': 'Cannot delete your own account'}), 400
         
+        revoke_sessions(user)
         db.session.delete(user)
+        bump_version('user')
         db.session.commit()
+        invalidate_user_access(user_id)
         
         return jsonify({'message': 'User deleted successfully'}), 200
 
@@ -203,7 +259,9 @@ def forgot_password():
         
         # Update user's password
         user.set_password(temp_password)
+        revoke_sessions(user)
         db.session.commit()
+        invalidate_user_access(user.id)
         
         return jsonify({
             'message': 'Temporary password generated successfully',
@@ -217,6 +275,9 @@ def forgot_password():
             'admin_message': f'New temporary password for {user.first_name} {user.last_name} ({user.username}): {temp_password}'
         }), 200
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -236,7 +297,9 @@ def reset_user_password(user_id):
         
         # Update user's password
         user.set_password(temp_password)
+        revoke_sessions(user)
         db.session.commit()
+        invalidate_user_access(user.id)
         
         return jsonify({
             'message': 'Password reset successfully',
@@ -249,6 +312,9 @@ def reset_user_password(user_id):
             'temp_password': temp_password
         }), 200
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,82 @@
+from flask import Blueprint, jsonify
+from src.models.user import db, User, TimeLog, TimeInterval, EODReport, LeaveRequest, Announcement
+from src.routes.auth import admin_required
+from src.utils.cache import dashboard_cache
+from src.utils.queries import with_related, serialize_rows, CREATOR_FIELDS
+from src.utils.work_time import work_date
+from sqlalchemy import select, func
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+def _dashboard_counts(today):
+    """All dashboard counters in one statement"""
+    time_log_stats = (
+        select(
+            func.coalesce(func.sum(TimeLog.total_hours), 0).label('total_hours_today'),
+            func.count(TimeLog.clock_in).label('active_users_today')
+        )
+        .where(TimeLog.date == today)
+        .subquery()
+    )
+
+    row = db.session.execute(
+        select(
+            time_log_stats,
+            # Open intervals from any day, as in /api/time-logs/summary
+            select(func.count(TimeInterval.id))
+            .where(TimeInterval.ended_at.is_(None))
+            .scalar_subquery().label('clocked_in_now'),
+            select(func.count(EODReport.id))
+            .where(EODReport.date == today)
+            .scalar_subquery().label('eod_reports_today'),
+            select(func.count(LeaveRequest.id))
+            .where(LeaveRequest.status == 'pending')
+            .scalar_subquery().label('pending_leave_requests'),
+            select(func.count(User.id))
+            .where(User.role == 'va', User.is_active.is_(True))
+            .scalar_subquery().label('active_vas')
+        )
+    ).one()
+    return row._asdict()
+
+@dashboard_bp.route('', methods=['GET'])
+@admin_required
+def get_dashboard():
+    """Everything the admin dashboard shows, in place of four separate calls"""
+    try:
+        today = work_date()
+        cache_key = today.isoformat()
+        payload = dashboard_cache.get(cache_key)
+        if payload is None:
+            counts = _dashboard_counts(today)
+
+            announcements = with_related(Announcement.query, Announcement.creator).order_by(
+                Announcement.is_pinned.desc(),
+                Announcement.created_at.desc()
+            ).limit(3).all()
+
+            pending = with_related(LeaveRequest.query, LeaveRequest.user).filter_by(
+                status='pending'
+            ).order_by(LeaveRequest.created_at.desc()).limit(5).all()
+
+            payload = {
+                'date': cache_key,
+                'time_logs': {
+                    'total_hours_today': round(counts['total_hours_today'], 2),
+                    'active_users_today': counts['active_users_today'],
+                    'clocked_in_now': counts['clocked_in_now']
+                },
+                'eod_reports': {'submitted_today': counts['eod_reports_today']},
+                'leave_requests': {
+                    'pending': counts['pending_leave_requests'],
+                    'recent_pending': serialize_rows(pending, {'user': CREATOR_FIELDS})
+                },
+                'users': {'active_vas': counts['active_vas']},
+                'recent_announcements': serialize_rows(announcements, {'creator': CREATOR_FIELDS})
+            }
+            dashboard_cache.set(cache_key, payload)
+
+        return jsonify(payload), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,9 +1,16 @@
-from flask import Blueprint, request, jsonify, session, Response
-from src.models.user import db, User, EODReport
-from src.routes.auth import login_required, admin_required
-from datetime import datetime, date
-import csv
-import io
+from flask import Blueprint, request, jsonify, session
+from src.models.user import db, EODReport
+from src.routes.auth import login_required, admin_required, current_user_role
+from src.utils.queries import with_related, serialize_rows, USER_FIELDS
+from src.utils.pagination import paginate, PaginationError
+from src.utils.csv_export import stream_csv
+from src.utils.cache import dashboard_cache
+from src.utils.search import index_item
+from src.utils.events import publish_event
+from src.utils.work_time import work_date
+from src.utils.exports import export_filters, eod_reports_export, export_rows
+from src.utils.jobs import get_job_queue, prefers_async, job_accepted
+from datetime import datetime
 
 eod_reports_bp = Blueprint('eod_reports', __name__)
 
@@ -19,7 +26,7 @@ def submit_eod_report():
             if not data.get(field):
                 return jsonify({'error': f'{field} is required'}), 400
         
-        today = date.today()
+        today = work_date()
         
         # Check if report already exists for today
         existing_report = EODReport.query.filter_by(
@@ -34,6 +41,7 @@ def submit_eod_report():
             existing_report.issues = data.get('issues', '')
             existing_report.support_needed = data.get('support_needed', '')
             existing_report.created_at = datetime.utcnow()
+            report = existing_report
         else:
             # Create new report
             report = EODReport(
@@ -45,8 +53,13 @@ def submit_eod_report():
                 support_needed=data.get('support_needed', '')
             )
             db.session.add(report)
+            db.session.flush()
         
+        index_item('eod_report', report)
         db.session.commit()
+        dashboard_cache.clear()
+        
+        publish_event('eod_report_submitted', {'user_id': user_id, 'report_id': report.id, 'date': today.isoformat()})
         
         return jsonify({
             'message': 'EOD report submitted successfully'
@@ -61,7 +74,7 @@ def submit_eod_report():
 def get_today_eod_report():
     try:
         user_id = session['user_id']
-        today = date.today()
+        today = work_date()
         
         report = EODReport.query.filter_by(
             user_id=user_id,
@@ -81,18 +94,20 @@ def get_today_eod_report():
 def get_eod_reports():
     try:
         user_id = session['user_id']
-        user = User.query.get(user_id)
+        role = current_user_role()
         
         # Build query
         query = EODReport.query
         
-        # If not admin, only show own reports
-        if user.role != 'admin':
+        # If not admin, only show own reports; admins get users loaded in the same query
+        if role != 'admin':
             query = query.filter_by(user_id=user_id)
+        else:
+            query = with_related(query, EODReport.user)
         
         # Apply filters
-        if request.args.get('user_id') and user.role == 'admin':
-            query = query.filter_by(user_id=request.args.get('user_id'))
+        if request.args.get('user_id', type=int) and role == 'admin':
+            query = query.filter_by(user_id=request.args.get('user_id', type=int))
         
         if request.args.get('start_date'):
             start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
@@ -102,24 +117,23 @@ def get_eod_reports():
             end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d').date()
             query = query.filter(EODReport.date <= end_date)
         
-        # Order by date descending
-        reports = query.order_by(EODReport.date.desc()).all()
+        # Newest first, one keyset page at a time
+        reports, limit, next_cursor = paginate(query, [EODReport.date, EODReport.id])
         
         # Include user information for admin view
-        result = []
-        for report in reports:
-            report_dict = report.to_dict()
-            if user.role == 'admin':
-                report_dict['user'] = {
-                    'id': report.user.id,
-                    'username': report.user.username,
-                    'first_name': report.user.first_name,
-                    'last_name': report.user.last_name
-                }
-            result.append(report_dict)
-        
-        return jsonify({'eod_reports': result}), 200
+        result = serialize_rows(
+            reports,
+            {'user': USER_FIELDS} if role == 'admin' else None
+        )
+        
+        return jsonify({
+            'eod_reports': result,
+            'limit': limit,
+            'next_cursor': next_cursor
+        }), 200
 
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -127,50 +141,17 @@ def get_eod_reports():
 @admin_required
 def export_eod_reports():
     try:
-        # Build query with same filters as get_eod_reports
-        query = EODReport.query
-        
-        # Apply filters
-        if request.args.get('user_id'):
-            query = query.filter_by(user_id=request.args.get('user_id'))
+        filters = export_filters(request.args)
         
-        if request.args.get('start_date'):
-            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
-            query = query.filter(EODReport.date >= start_date)
-        
-        if request.args.get('end_date'):
-            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d').date()
-            query = query.filter(EODReport.date <= end_date)
+        # Large exports can run as a job instead; see GET /api/jobs/<id>
+        if prefers_async():
+            return job_accepted(get_job_queue().submit('eod_reports_export', filters, session['user_id']))
         
-        # Order by date descending
-        reports = query.order_by(EODReport.date.desc()).all()
-        
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Date', 'Employee', 'Tasks Completed', 'Blockers', 'Issues', 'Support Needed'])
-        
-        # Write data
-        for report in reports:
-            writer.writerow([
-                report.date.strftime('%Y-%m-%d'),
-                f"{report.user.first_name} {report.user.last_name}",
-                report.tasks_completed,
-                report.blockers or '',
-                report.issues or '',
-                report.support_needed or ''
-            ])
-        
-        output.seek(0)
-        
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={'Content-Disposition': 'attachment; filename=eod_reports.csv'}
-        )
+        export = eod_reports_export(**filters)
+        return stream_csv(export.header, export_rows(export), export.filename)
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,42 @@
+from flask import Blueprint, Response, jsonify
+from src.models.user import db
+from src.routes.auth import login_required, current_user_role
+from src.utils.events import get_event_bus, visible_events, format_sse, HEARTBEAT_INTERVAL
+import queue
+
+events_bp = Blueprint('events', __name__)
+
+def _stream(bus, subscriber, allowed):
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = subscriber.get(timeout=HEARTBEAT_INTERVAL)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            if allowed is None or event['type'] in allowed:
+                yield format_sse(event)
+    finally:
+        bus.unsubscribe(subscriber)
+
+@events_bp.route('/stream', methods=['GET'])
+@login_required
+def stream_events():
+    """Server-sent events for clock-ins, clock-outs, EOD reports, leave requests and announcements"""
+    try:
+        allowed = visible_events(current_user_role())
+
+        # The stream holds no database state, so give the connection back now
+        db.session.remove()
+
+        bus = get_event_bus()
+        subscriber = bus.subscribe()
+        return Response(
+            _stream(bus, subscriber, allowed),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
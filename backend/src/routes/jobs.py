@@ -0,0 +1,76 @@
+import os
+from flask import Blueprint, request, jsonify, send_file
+from src.models.user import db, Job
+from src.routes.auth import admin_required
+from src.utils.pagination import paginate, PaginationError
+from src.utils.jobs import get_job_queue, JOB_KINDS
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# Jobs are queued by sending `Prefer: respond-async` to GET /api/time-logs/export,
+# GET /api/eod-reports/export or POST /api/trainings/bulk-import
+
+@jobs_bp.route('', methods=['GET'])
+@admin_required
+def get_jobs():
+    try:
+        get_job_queue().ensure_started()
+        query = Job.query
+
+        kind = request.args.get('kind')
+        if kind:
+            if kind not in JOB_KINDS:
+                return jsonify({'error': f'kind must be one of {", ".join(JOB_KINDS)}'}), 400
+            query = query.filter_by(kind=kind)
+        if request.args.get('status'):
+            query = query.filter_by(status=request.args.get('status'))
+
+        jobs, limit, next_cursor = paginate(query, [Job.created_at, Job.id])
+
+        return jsonify({
+            'jobs': [job.to_dict() for job in jobs],
+            'limit': limit,
+            'next_cursor': next_cursor
+        }), 200
+
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@admin_required
+def get_job(job_id):
+    """Status and progress; poll until status is 'succeeded' or 'failed'"""
+    try:
+        # Jobs left queued by a restarted worker are picked up once someone polls
+        get_job_queue().ensure_started()
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+
+        job_dict = job.to_dict()
+        if job.artifact:
+            job_dict['artifact_url'] = f'/api/jobs/{job.id}/artifact'
+        return jsonify({'job': job_dict}), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>/artifact', methods=['GET'])
+@admin_required
+def download_job_artifact(job_id):
+    try:
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        if job.status != 'succeeded':
+            return jsonify({'error': f'Job is {job.status}'}), 409
+
+        path = get_job_queue().artifact_file(job) if job.artifact else None
+        if path is None or not os.path.exists(path):
+            return jsonify({'error': 'Job has no file or it has expired'}), 410
+        return send_file(path, as_attachment=True, download_name=job.artifact_name)
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,6 +1,10 @@
 from flask import Blueprint, request, jsonify, session
-from src.models.user import db, User, LeaveRequest
-from src.routes.auth import login_required, admin_required
+from src.models.user import db, LeaveRequest
+from src.routes.auth import login_required, admin_required, current_user_role
+from src.utils.queries import with_related, serialize_rows, CREATOR_FIELDS
+from src.utils.pagination import paginate, PaginationError
+from src.utils.cache import dashboard_cache
+from src.utils.events import publish_event
 from datetime import datetime, date
 
 leave_requests_bp = Blueprint("leave_requests", __name__)
@@ -33,6 +37,9 @@ def submit_leave_request():
 
         db.session.add(leave_request)
         db.session.commit()
+        dashboard_cache.clear()
+
+        publish_event("leave_request_submitted", leave_request.to_dict())
 
         return jsonify(
             {
@@ -50,39 +57,33 @@ def submit_leave_request():
 def get_leave_requests():
     try:
         user_id = session["user_id"]
-        user = User.query.get(user_id)
+        role = current_user_role()
 
-        query = LeaveRequest.query
+        query = with_related(LeaveRequest.query, LeaveRequest.user, LeaveRequest.reviewer)
 
-        if user.role != "admin":
+        if role != "admin":
             query = query.filter_by(user_id=user_id)
 
         # Apply filters
         if request.args.get("status"):
             query = query.filter_by(status=request.args.get("status"))
-        if request.args.get("user_id") and user.role == "admin":
-            query = query.filter_by(user_id=request.args.get("user_id"))
-
-        leave_requests = query.order_by(LeaveRequest.created_at.desc()).all()
-
-        result = []
-        for req in leave_requests:
-            req_dict = req.to_dict()
-            req_dict["user"] = {
-                "id": req.user.id,
-                "first_name": req.user.first_name,
-                "last_name": req.user.last_name,
-            }
-            if req.reviewer:
-                req_dict["reviewer"] = {
-                    "id": req.reviewer.id,
-                    "first_name": req.reviewer.first_name,
-                    "last_name": req.reviewer.last_name,
-                }
-            result.append(req_dict)
+        if request.args.get("user_id", type=int) and role == "admin":
+            query = query.filter_by(user_id=request.args.get("user_id", type=int))
+
+        leave_requests, limit, next_cursor = paginate(
+            query, [LeaveRequest.created_at, LeaveRequest.id]
+        )
 
-        return jsonify({"leave_requests": result}), 200
+        result = serialize_rows(
+            leave_requests, {"user": CREATOR_FIELDS, "reviewer": CREATOR_FIELDS}
+        )
+
+        return jsonify(
+            {"leave_requests": result, "limit": limit, "next_cursor": next_cursor}
+        ), 200
 
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -101,6 +102,7 @@ def update_leave_request(request_id):
             leave_request.admin_notes = data["admin_notes"]
 
         db.session.commit()
+        dashboard_cache.clear()
 
         return jsonify(
             {
@@ -0,0 +1,76 @@
+import hmac
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
+from src.routes.auth import admin_required
+from src.utils.metrics import request_metrics
+from src.utils.profiler import get_request_profiler, PROFILE_HEADER
+
+metrics_bp = Blueprint('metrics', __name__)
+profiling_bp = Blueprint('profiling', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape target; set METRICS_TOKEN to require a bearer token"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f'Bearer {token}'):
+            return jsonify({'error': 'Authentication required'}), 401
+    return Response(
+        request_metrics.render_prometheus(),
+        mimetype='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+@profiling_bp.route('', methods=['GET'])
+@admin_required
+def get_profiling_summary():
+    """Per-endpoint latency, error and SQL figures for this worker, plus recent slow queries"""
+    try:
+        return jsonify(request_metrics.summary()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@profiling_bp.route('/sampling', methods=['GET'])
+@admin_required
+def get_sampling():
+    """Current request-profiling switch, shared by every worker on this host"""
+    try:
+        return jsonify({**get_request_profiler().settings(), 'header': PROFILE_HEADER}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@profiling_bp.route('/sampling', methods=['PUT'])
+@admin_required
+def update_sampling():
+    """Turn profiling on or off, set the sample rate and limit it to some endpoints"""
+    try:
+        data = request.get_json() or {}
+        endpoints = data.get('endpoints')
+        if endpoints is not None and not isinstance(endpoints, list):
+            return jsonify({'error': 'endpoints must be a list'}), 400
+        try:
+            settings = get_request_profiler().update_settings(
+                enabled=data.get('enabled'),
+                sample_rate=data.get('sample_rate'),
+                endpoints=endpoints
+            )
+        except (TypeError, ValueError):
+            return jsonify({'error': 'sample_rate must be a number between 0 and 1'}), 400
+        return jsonify({**settings, 'header': PROFILE_HEADER}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@profiling_bp.route('/profiles', methods=['GET'])
+@admin_required
+def list_profiles():
+    try:
+        return jsonify({'profiles': get_request_profiler().list_profiles()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@profiling_bp.route('/profiles/<name>', methods=['GET'])
+@admin_required
+def download_profile(name):
+    path = get_request_profiler().profile_path(name)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, as_attachment=True, download_name=name)
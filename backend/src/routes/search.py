@@ -0,0 +1,33 @@
+from flask import Blueprint, request, jsonify, session
+from src.routes.auth import login_required, current_user_role
+from src.utils.search import search, SEARCH_KINDS
+
+search_bp = Blueprint('search', __name__)
+
+@search_bp.route('', methods=['GET'])
+@login_required
+def search_content():
+    """Ranked, snippeted search over trainings, SOPs, announcements and EOD reports"""
+    try:
+        q = (request.args.get('q') or '').strip()
+        if not q:
+            return jsonify({'error': 'q is required'}), 400
+        
+        kinds = list(SEARCH_KINDS)
+        if request.args.get('types'):
+            kinds = [kind for kind in request.args.get('types').split(',') if kind in SEARCH_KINDS]
+            if not kinds:
+                return jsonify({'error': f"types must be any of {', '.join(SEARCH_KINDS)}"}), 400
+        
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        
+        # VAs only see their own EOD reports
+        owner_id = None if current_user_role() == 'admin' else session['user_id']
+        
+        return jsonify({
+            'q': q,
+            'results': search(q, kinds, limit, owner_id=owner_id)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,26 +1,34 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import db, User, SOP, SOPRead
 from src.routes.auth import login_required, admin_required
+from src.utils.queries import with_related, serialize_rows, CREATOR_FIELDS
+from src.utils.pagination import paginate, PaginationError
+from src.utils.search import index_item, remove_item
+from src.utils.tags import set_tags, filter_by_tag
+from src.utils.conditional import conditional_get, bump_version
 from datetime import datetime
 
 sops_bp = Blueprint("sops", __name__)
 
 @sops_bp.route("", methods=["GET"])
 @login_required
+@conditional_get("sop", "user")
 def get_sops():
     try:
-        sops = SOP.query.order_by(SOP.created_at.desc()).all()
-        result = []
-        for sop in sops:
-            sop_dict = sop.to_dict()
-            sop_dict["creator"] = {
-                "id": sop.creator.id,
-                "first_name": sop.creator.first_name,
-                "last_name": sop.creator.last_name,
-            }
-            result.append(sop_dict)
-        return jsonify({"sops": result}), 200
+        query = with_related(SOP.query, SOP.creator)
 
+        # Apply filters
+        if request.args.get("tag"):
+            query = filter_by_tag(query, "sop", request.args.get("tag"))
+        if request.args.get("category"):
+            query = query.filter(SOP.category == request.args.get("category"))
+
+        sops, limit, next_cursor = paginate(query, [SOP.created_at, SOP.id])
+        result = serialize_rows(sops, {"creator": CREATOR_FIELDS})
+        return jsonify({"sops": result, "limit": limit, "next_cursor": next_cursor}), 200
+
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -40,11 +48,14 @@ def create_sop():
             description=data.get("description"),
             file_url=data["file_url"],
             category=data.get("category"),
-            tags=data.get("tags"),
             created_by=session["user_id"],
         )
+        set_tags(sop, data.get("tags"))
 
         db.session.add(sop)
+        db.session.flush()
+        index_item("sop", sop)
+        bump_version("sop")
         db.session.commit()
 
         return jsonify({"message": "SOP created successfully", "sop": sop.to_dict()}), 201
@@ -69,8 +80,10 @@ def update_sop(sop_id):
         if "category" in data:
             sop.category = data["category"]
         if "tags" in data:
-            sop.tags = data["tags"]
+            set_tags(sop, data["tags"])
 
+        index_item("sop", sop)
+        bump_version("sop")
         db.session.commit()
 
         return jsonify({"message": "SOP updated successfully", "sop": sop.to_dict()}), 200
@@ -86,6 +99,8 @@ def delete_sop(sop_id):
         sop = SOP.query.get_or_404(sop_id)
 
         db.session.delete(sop)
+        remove_item("sop", sop_id)
+        bump_version("sop")
         db.session.commit()
 
         return jsonify({"message": "SOP deleted successfully"}), 200
@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify
+from src.routes.auth import login_required
+from src.utils.tags import tag_cloud
+
+tags_bp = Blueprint('tags', __name__)
+
+@tags_bp.route('', methods=['GET'])
+@login_required
+def get_tag_cloud():
+    """Tags in use across trainings and SOPs with their counts"""
+    try:
+        return jsonify({'tags': tag_cloud()}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
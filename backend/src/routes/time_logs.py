@@ -1,92 +1,108 @@
-from flask import Blueprint, request, jsonify, session, Response
-from src.models.user import db, User, TimeLog
-from src.routes.auth import login_required, admin_required
-from datetime import datetime, date
+from flask import Blueprint, request, jsonify, session
+from src.models.user import db, TimeLog, TimeInterval
+from src.routes.auth import login_required, admin_required, current_user_role
+from src.utils.queries import with_related, serialize_rows, USER_FIELDS
+from src.utils.pagination import paginate, PaginationError
+from src.utils.csv_export import stream_csv
+from src.utils.rollups import period_totals
+from src.utils.cache import dashboard_cache
+from src.utils.sqlite import is_database_locked
+from src.utils.events import publish_event
+from src.utils.work_time import work_date, open_interval, start_interval, end_interval, interval_dict
+from src.utils.idempotency import idempotent, save_idempotent_response
+from src.utils.exports import export_filters, time_logs_export, export_rows
+from src.utils.jobs import get_job_queue, prefers_async, job_accepted
+from datetime import datetime
 from sqlalchemy import func
-import csv
-import io
+from sqlalchemy.exc import IntegrityError
 
 time_logs_bp = Blueprint('time_logs', __name__)
 
 @time_logs_bp.route('/clock-in', methods=['POST'])
 @login_required
+@idempotent
 def clock_in():
     try:
         user_id = session['user_id']
-        today = date.today()
-        
-        # Check if user already clocked in today
-        existing_log = TimeLog.query.filter_by(
-            user_id=user_id,
-            date=today
-        ).first()
-        
-        if existing_log and existing_log.clock_in:
-            return jsonify({'error': 'Already clocked in today'}), 400
-        
-        if existing_log:
-            # Update existing log
-            existing_log.clock_in = datetime.utcnow()
-            existing_log.clock_out = None
-            existing_log.total_hours = None
-        else:
-            # Create new log
-            time_log = TimeLog(
-                user_id=user_id,
-                date=today,
-                clock_in=datetime.utcnow()
-            )
-            db.session.add(time_log)
+        clock_in_time = datetime.utcnow()
         
-        db.session.commit()
+        # One running interval at a time, even across midnight; checked by the insert itself
+        interval = start_interval(user_id, clock_in_time)
+        if interval is None:
+            return jsonify({'error': 'Already clocked in'}), 400
         
-        return jsonify({
+        payload = {
             'message': 'Clocked in successfully',
-            'clock_in': datetime.utcnow().isoformat()
-        }), 200
+            'clock_in': clock_in_time.isoformat(),
+            'interval': interval_dict(interval)
+        }
+        save_idempotent_response(payload, 200)
+        db.session.commit()
+        dashboard_cache.clear()
+        
+        publish_event('clock_in', {
+            'user_id': user_id,
+            'date': interval.date.isoformat(),
+            'clock_in': clock_in_time.isoformat(),
+            'interval_id': interval.id
+        })
+        
+        return jsonify(payload), 200
 
+    except IntegrityError:
+        # A concurrent clock-in opened the interval, or stored the same Idempotency-Key, first
+        db.session.rollback()
+        return jsonify({'error': 'Already clocked in'}), 400
     except Exception as e:
         db.session.rollback()
+        if is_database_locked(e):
+            return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
         return jsonify({'error': str(e)}), 500
 
 @time_logs_bp.route('/clock-out', methods=['POST'])
 @login_required
+@idempotent
 def clock_out():
     try:
         user_id = session['user_id']
-        today = date.today()
-        
-        # Find today's time log
-        time_log = TimeLog.query.filter_by(
-            user_id=user_id,
-            date=today
-        ).first()
-        
-        if not time_log or not time_log.clock_in:
-            return jsonify({'error': 'Must clock in first'}), 400
-        
-        if time_log.clock_out:
-            return jsonify({'error': 'Already clocked out today'}), 400
-        
-        # Update clock out time
         clock_out_time = datetime.utcnow()
-        time_log.clock_out = clock_out_time
         
-        # Calculate total hours
-        time_diff = clock_out_time - time_log.clock_in
-        total_hours = time_diff.total_seconds() / 3600
-        time_log.total_hours = round(total_hours, 2)
+        # Closes the running interval and adds its hours to the day's total and
+        # the rollup in the same transaction; None if nothing was running
+        closed = end_interval(user_id, clock_out_time)
+        if closed is None:
+            return jsonify({'error': 'Must clock in first'}), 400
+        interval, total_hours = closed
         
+        payload = {
+            'message': 'Clocked out successfully',
+            'clock_out': clock_out_time.isoformat(),
+            'hours': interval.hours,
+            'total_hours': total_hours,
+            'interval': interval_dict(interval)
+        }
+        save_idempotent_response(payload, 200)
         db.session.commit()
+        dashboard_cache.clear()
         
-        return jsonify({
-            'message': 'Clocked out successfully',
+        publish_event('clock_out', {
+            'user_id': user_id,
+            'date': interval.date.isoformat(),
             'clock_out': clock_out_time.isoformat(),
-            'total_hours': time_log.total_hours
-        }), 200
+            'hours': interval.hours,
+            'total_hours': total_hours
+        })
+        
+        return jsonify(payload), 200
 
+    except IntegrityError:
+        # A concurrent request stored the same Idempotency-Key first
+        db.session.rollback()
+        return jsonify({'error': 'Must clock in first'}), 400
     except Exception as e:
         db.session.rollback()
+        if is_database_locked(e):
+            return jsonify({'error': 'Server busy, please retry'}), 503, {'Retry-After': '1'}
         return jsonify({'error': str(e)}), 500
 
 @time_logs_bp.route('/today', methods=['GET'])
@@ -94,17 +110,25 @@ def clock_out():
 def get_today_time_log():
     try:
         user_id = session['user_id']
-        today = date.today()
         
-        time_log = TimeLog.query.filter_by(
-            user_id=user_id,
-            date=today
-        ).first()
+        # A shift that started before midnight is still "today" until it ends
+        running = open_interval(user_id)
+        if running:
+            time_log = running.time_log
+        else:
+            time_log = TimeLog.query.filter_by(
+                user_id=user_id,
+                date=work_date()
+            ).first()
         
         if time_log:
-            return jsonify({'time_log': time_log.to_dict()}), 200
+            return jsonify({
+                'time_log': time_log.to_dict(),
+                'intervals': [interval.to_dict() for interval in time_log.intervals],
+                'clocked_in': running is not None
+            }), 200
         else:
-            return jsonify({'time_log': None}), 200
+            return jsonify({'time_log': None, 'intervals': [], 'clocked_in': False}), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -114,18 +138,20 @@ def get_today_time_log():
 def get_time_logs():
     try:
         user_id = session['user_id']
-        user = User.query.get(user_id)
+        role = current_user_role()
         
         # Build query
         query = TimeLog.query
         
-        # If not admin, only show own logs
-        if user.role != 'admin':
+        # If not admin, only show own logs; admins get users loaded in the same query
+        if role != 'admin':
             query = query.filter_by(user_id=user_id)
+        else:
+            query = with_related(query, TimeLog.user)
         
         # Apply filters
-        if request.args.get('user_id') and user.role == 'admin':
-            query = query.filter_by(user_id=request.args.get('user_id'))
+        if request.args.get('user_id', type=int) and role == 'admin':
+            query = query.filter_by(user_id=request.args.get('user_id', type=int))
         
         if request.args.get('start_date'):
             start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
@@ -135,24 +161,23 @@ def get_time_logs():
             end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d').date()
             query = query.filter(TimeLog.date <= end_date)
         
-        # Order by date descending
-        time_logs = query.order_by(TimeLog.date.desc()).all()
+        # Newest first, one keyset page at a time
+        time_logs, limit, next_cursor = paginate(query, [TimeLog.date, TimeLog.id])
         
         # Include user information for admin view
-        result = []
-        for log in time_logs:
-            log_dict = log.to_dict()
-            if user.role == 'admin':
-                log_dict['user'] = {
-                    'id': log.user.id,
-                    'username': log.user.username,
-                    'first_name': log.user.first_name,
-                    'last_name': log.user.last_name
-                }
-            result.append(log_dict)
-        
-        return jsonify({'time_logs': result}), 200
+        result = serialize_rows(
+            time_logs,
+            {'user': USER_FIELDS} if role == 'admin' else None
+        )
+        
+        return jsonify({
+            'time_logs': result,
+            'limit': limit,
+            'next_cursor': next_cursor
+        }), 200
 
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -160,49 +185,17 @@ def get_time_logs():
 @admin_required
 def export_time_logs():
     try:
-        # Build query with same filters as get_time_logs
-        query = TimeLog.query
+        filters = export_filters(request.args)
         
-        # Apply filters
-        if request.args.get('user_id'):
-            query = query.filter_by(user_id=request.args.get('user_id'))
+        # Large exports can run as a job instead; see GET /api/jobs/<id>
+        if prefers_async():
+            return job_accepted(get_job_queue().submit('time_logs_export', filters, session['user_id']))
         
-        if request.args.get('start_date'):
-            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
-            query = query.filter(TimeLog.date >= start_date)
-        
-        if request.args.get('end_date'):
-            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d').date()
-            query = query.filter(TimeLog.date <= end_date)
-        
-        # Order by date descending
-        time_logs = query.order_by(TimeLog.date.desc()).all()
-        
-        # Create CSV
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow(['Date', 'Employee', 'Clock In', 'Clock Out', 'Total Hours'])
-        
-        # Write data
-        for log in time_logs:
-            writer.writerow([
-                log.date.strftime('%Y-%m-%d'),
-                f"{log.user.first_name} {log.user.last_name}",
-                log.clock_in.strftime('%H:%M:%S') if log.clock_in else '',
-                log.clock_out.strftime('%H:%M:%S') if log.clock_out else '',
-                log.total_hours or ''
-            ])
-        
-        output.seek(0)
-        
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={'Content-Disposition': 'attachment; filename=time_logs.csv'}
-        )
+        export = time_logs_export(**filters)
+        return stream_csv(export.header, export_rows(export), export.filename)
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -211,19 +204,20 @@ def export_time_logs():
 def get_time_logs_summary():
     try:
         # Get summary statistics
+        today = work_date()
         total_hours_today = db.session.query(func.sum(TimeLog.total_hours)).filter(
-            TimeLog.date == date.today()
+            TimeLog.date == today
         ).scalar() or 0
         
         active_users_today = db.session.query(func.count(TimeLog.id)).filter(
-            TimeLog.date == date.today(),
+            TimeLog.date == today,
             TimeLog.clock_in.isnot(None)
         ).scalar() or 0
         
-        clocked_in_now = db.session.query(func.count(TimeLog.id)).filter(
-            TimeLog.date == date.today(),
-            TimeLog.clock_in.isnot(None),
-            TimeLog.clock_out.is_(None)
+        # Open intervals, whatever day they started: a shift running past
+        # midnight is still clocked in on the next work date
+        clocked_in_now = db.session.query(func.count(TimeInterval.id)).filter(
+            TimeInterval.ended_at.is_(None)
         ).scalar() or 0
         
         return jsonify({
@@ -235,3 +229,36 @@ def get_time_logs_summary():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@time_logs_bp.route('/rollups', methods=['GET'])
+@admin_required
+def get_time_log_rollups():
+    """Per-user hour totals for a payroll period, read from the rollup table"""
+    try:
+        group_by = request.args.get('group_by')
+        if group_by not in (None, 'date', 'week', 'month'):
+            return jsonify({'error': 'group_by must be one of date, week, month'}), 400
+        
+        start_date = None
+        if request.args.get('start_date'):
+            start_date = datetime.strptime(request.args.get('start_date'), '%Y-%m-%d').date()
+        
+        end_date = None
+        if request.args.get('end_date'):
+            end_date = datetime.strptime(request.args.get('end_date'), '%Y-%m-%d').date()
+        
+        totals = period_totals(
+            start_date=start_date,
+            end_date=end_date,
+            group_by=group_by,
+            user_id=request.args.get('user_id', type=int)
+        )
+        
+        return jsonify({
+            'start_date': start_date.isoformat() if start_date else None,
+            'end_date': end_date.isoformat() if end_date else None,
+            'group_by': group_by,
+            'rollups': totals
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
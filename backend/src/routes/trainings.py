@@ -1,26 +1,41 @@
 from flask import Blueprint, request, jsonify, session
+from sqlalchemy.exc import IntegrityError
 from src.models.user import db, User, Training, TrainingProgress
 from src.routes.auth import login_required, admin_required
+from src.utils.queries import with_related, serialize_rows, CREATOR_FIELDS
+from src.utils.pagination import paginate, PaginationError
+from src.utils.training_import import import_trainings, validate_trainings, ImportValidationError
+from src.utils.jobs import get_job_queue, prefers_async, job_accepted
+from src.utils.search import index_item, remove_item
+from src.utils.tags import set_tags, filter_by_tag
+from src.utils.conditional import conditional_get, bump_version
 from datetime import datetime
 
 trainings_bp = Blueprint("trainings", __name__)
 
 @trainings_bp.route("", methods=["GET"])
 @login_required
+@conditional_get("training", "user")
 def get_trainings():
     try:
-        trainings = Training.query.order_by(Training.created_at.desc()).all()
-        result = []
-        for training in trainings:
-            training_dict = training.to_dict()
-            training_dict["creator"] = {
-                "id": training.creator.id,
-                "first_name": training.creator.first_name,
-                "last_name": training.creator.last_name,
-            }
-            result.append(training_dict)
-        return jsonify({"trainings": result}), 200
+        query = with_related(Training.query, Training.creator)
+
+        # Apply filters
+        if request.args.get("tag"):
+            query = filter_by_tag(query, "training", request.args.get("tag"))
+        if request.args.get("category"):
+            query = query.filter(Training.category == request.args.get("category"))
+        if request.args.get("skill_level"):
+            query = query.filter(Training.skill_level == request.args.get("skill_level"))
+
+        trainings, limit, next_cursor = paginate(query, [Training.created_at, Training.id])
+        result = serialize_rows(trainings, {"creator": CREATOR_FIELDS})
+        return jsonify(
+            {"trainings": result, "limit": limit, "next_cursor": next_cursor}
+        ), 200
 
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -38,22 +53,28 @@ def create_training():
         training = Training(
             title=data["title"],
             description=data.get("description"),
-            url=data.get("url"),
+            url=data.get("url") or None,
             file_url=data.get("file_url"),
             video_url=data.get("video_url"),
             category=data.get("category"),
             skill_level=data.get("skill_level"),
-            tags=data.get("tags"),
             created_by=session["user_id"],
         )
+        set_tags(training, data.get("tags"))
 
         db.session.add(training)
+        db.session.flush()
+        index_item("training", training)
+        bump_version("training")
         db.session.commit()
 
         return jsonify(
             {"message": "Training created successfully", "training": training.to_dict()}
         ), 201
 
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "A training with this URL already exists"}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -70,7 +91,7 @@ def update_training(training_id):
         if "description" in data:
             training.description = data["description"]
         if "url" in data:
-            training.url = data["url"]
+            training.url = data["url"] or None
         if "file_url" in data:
             training.file_url = data["file_url"]
         if "video_url" in data:
@@ -80,14 +101,19 @@ def update_training(training_id):
         if "skill_level" in data:
             training.skill_level = data["skill_level"]
         if "tags" in data:
-            training.tags = data["tags"]
+            set_tags(training, data["tags"])
 
+        index_item("training", training)
+        bump_version("training")
         db.session.commit()
 
         return jsonify(
             {"message": "Training updated successfully", "training": training.to_dict()}
         ), 200
 
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "A training with this URL already exists"}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -99,6 +125,8 @@ def delete_training(training_id):
         training = Training.query.get_or_404(training_id)
 
         db.session.delete(training)
+        remove_item("training", training_id)
+        bump_version("training")
         db.session.commit()
 
         return jsonify({"message": "Training deleted successfully"}), 200
@@ -178,33 +206,24 @@ def bulk_import_trainings():
         if not trainings_data:
             return jsonify({"error": "No training data provided"}), 400
         
-        created_count = 0
-        for training_data in trainings_data:
-            # Convert tags list to JSON string
-            tags_str = None
-            if training_data.get("tags"):
-                import json
-                tags_str = json.dumps(training_data["tags"])
-            
-            training = Training(
-                title=training_data["title"],
-                description=training_data.get("description"),
-                url=training_data.get("url"),
-                category=training_data.get("category"),
-                skill_level=training_data.get("skillLevel"),  # Note: camelCase from JSON
-                tags=tags_str,
-                created_by=session["user_id"],
-            )
-            
-            db.session.add(training)
-            created_count += 1
+        # Big catalogues can be imported as a job; rows are still checked here first
+        if prefers_async():
+            validate_trainings(trainings_data)
+            return job_accepted(get_job_queue().submit(
+                "training_import",
+                {"trainings": trainings_data, "created_by": session["user_id"]},
+                session["user_id"]
+            ))
         
-        db.session.commit()
+        counts = import_trainings(trainings_data, session["user_id"])
         
         return jsonify({
-            "message": f"Successfully imported {created_count} trainings"
+            "message": f"Successfully imported {counts['created'] + counts['updated']} trainings",
+            **counts
         }), 201
         
+    except ImportValidationError as e:
+        return jsonify({"error": str(e), "errors": e.errors}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
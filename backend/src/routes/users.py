@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import db, User
-from src.routes.auth import admin_required
+from src.routes.auth import admin_required, invalidate_user_access
+from src.utils.pagination import paginate, PaginationError
+from src.utils.conditional import bump_version
+from src.utils.cache import dashboard_cache
+from src.utils.passwords import PasswordHashBusy
+from src.utils.user_import import provision_users, read_csv, ProvisioningError
+from src.utils.sessions import revoke_sessions
 from datetime import datetime
 import secrets
 import string
@@ -12,10 +18,24 @@ users_bp = Blueprint('users', __name__)
 def get_users():
     """Get all users for admin management"""
     try:
-        users = User.query.all()
+        query = User.query
+        
+        # Apply filters
+        if request.args.get('role'):
+            query = query.filter_by(role=request.args.get('role'))
+        if request.args.get('is_active'):
+            query = query.filter_by(is_active=request.args.get('is_active') == 'true')
+        if request.args.get('assigned_client'):
+            query = query.filter_by(assigned_client=request.args.get('assigned_client'))
+        
+        users, limit, next_cursor = paginate(query, [User.created_at, User.id], descending=False)
         return jsonify({
-            'users': [user.to_dict() for user in users]
+            'users': [user.to_dict() for user in users],
+            'limit': limit,
+            'next_cursor': next_cursor
         }), 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -69,6 +89,49 @@ def create_user():
             'username': username
         }), 201
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@users_bp.route('/users/bulk', methods=['POST'])
+@admin_required
+def bulk_create_users():
+    """Provision many users at once from JSON ({"users": [...]}) or CSV"""
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            items = read_csv(upload.read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            items = read_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json(silent=True) or {}
+            items = data.get('users', data) if isinstance(data, dict) else data
+
+        if not items:
+            return jsonify({'error': 'No users provided'}), 400
+
+        results = provision_users(items)
+        created = sum(1 for result in results if result['status'] == 'created')
+        if created:
+            dashboard_cache.clear()
+
+        return jsonify({
+            'message': f'Created {created} of {len(results)} users',
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }), 201 if created else 400
+
+    except ProvisioningError as e:
+        return jsonify({'error': str(e)}), 400
+    except UnicodeDecodeError:
+        return jsonify({'error': 'CSV must be UTF-8 encoded'}), 400
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -82,12 +145,19 @@ def update_user(user_id):
         data = request.get_json()
         
         # Update allowed fields
+        previous_access = (user.role, user.is_active)
         allowed_fields = ['first_name', 'last_name', 'email', 'role', 'assigned_client', 'is_active']
         for field in allowed_fields:
             if field in data:
                 setattr(user, field, data[field])
         
+        # Role and status changes end existing sessions
+        if (user.role, user.is_active) != previous_access:
+            revoke_sessions(user)
+        
+        bump_version('user')
         db.session.commit()
+        invalidate_user_access(user_id)
         
         return jsonify({
             'message': 'User updated successfully',
@@ -105,7 +175,10 @@ def delete_user(user_id):
     try:
         user = User.query.get_or_404(user_id)
         user.is_active = False
+        revoke_sessions(user)
+        bump_version('user')
         db.session.commit()
+        invalidate_user_access(user_id)
         
         return jsonify({'message': 'User deactivated successfully'}), 200
         
@@ -123,14 +196,19 @@ def reset_user_password(user_id):
         # Generate new temporary password
         temp_password = ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(12))
         user.set_password(temp_password)
+        revoke_sessions(user)
         
         db.session.commit()
+        invalidate_user_access(user_id)
         
         return jsonify({
             'message': 'Password reset successfully',
             'temp_password': temp_password
         }), 200
         
+    except PasswordHashBusy as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -0,0 +1,56 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import request, make_response
+from src.models.user import db, ContentVersion
+from src.utils.upsert import upsert
+
+def bump_version(name):
+    """Mark content `name` as changed; call before the write's commit.
+
+    A single INSERT ... ON CONFLICT, so two first bumps of a name cannot
+    both try to insert its row.
+    """
+    now = datetime.utcnow()
+    stmt = upsert(ContentVersion).values(name=name, version=1, updated_at=now)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['name'],
+        set_={'version': ContentVersion.version + 1, 'updated_at': now}
+    ))
+
+def _validators(names):
+    rows = {row.name: row for row in ContentVersion.query.filter(ContentVersion.name.in_(names))}
+    parts = [f'{name}.{rows[name].version if name in rows else 0}' for name in names]
+    # Different query strings (pages, filters) are different representations
+    parts.append(hashlib.sha1(request.query_string).hexdigest()[:12])
+    timestamps = [row.updated_at for row in rows.values() if row.updated_at]
+    return '-'.join(parts), max(timestamps).replace(microsecond=0) if timestamps else None
+
+def conditional_get(*names):
+    """Serve weak ETag / Last-Modified from the version rows of `names`.
+
+    A matching If-None-Match (or, without one, an If-Modified-Since not older
+    than the last change) returns 304 before the view runs, so nothing is
+    queried or serialized beyond the single version lookup.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            etag, last_modified = _validators(names)
+
+            not_modified = False
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified:
+                not_modified = last_modified <= request.if_modified_since.replace(tzinfo=None)
+
+            response = make_response('', 304) if not_modified else make_response(f(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)
+                if last_modified:
+                    response.last_modified = last_modified
+                # Per-user content: browsers may keep it but must revalidate
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
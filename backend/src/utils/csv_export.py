@@ -0,0 +1,69 @@
+import csv
+import zlib
+from flask import Response, request, stream_with_context
+
+# Rows are written out in chunks of this many lines
+CHUNK_ROWS = 500
+
+class _LineBuffer:
+    """File-like object that hands back whatever csv.writer writes"""
+    def write(self, value):
+        return value
+
+def _csv_chunks(header, rows):
+    writer = csv.writer(_LineBuffer())
+    chunk = [writer.writerow(header)]
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= CHUNK_ROWS:
+            yield ''.join(chunk).encode('utf-8')
+            chunk = []
+    if chunk:
+        yield ''.join(chunk).encode('utf-8')
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_csv(header, rows, filename):
+    """Stream `rows` (an iterable of lists) as a CSV attachment.
+
+    Nothing is buffered beyond one chunk, so `rows` should itself be lazy
+    (e.g. a query using `yield_per`). The body is gzip-encoded when the client
+    accepts it, unless `?gzip=0` is passed.
+    """
+    chunks = _csv_chunks(header, rows)
+    headers = {
+        'Content-Disposition': f'attachment; filename={filename}',
+        'Vary': 'Accept-Encoding'
+    }
+
+    if request.args.get('gzip') != '0' and request.accept_encodings['gzip']:
+        chunks = _gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(stream_with_context(chunks), mimetype='text/csv', headers=headers)
+
+def write_csv(path, header, rows, on_progress=None):
+    """Write `rows` to the file at `path`; returns the number of rows written.
+
+    `on_progress(rows_written)` is called after each chunk of CHUNK_ROWS rows.
+    """
+    written = 0
+
+    def counted(rows):
+        nonlocal written
+        for row in rows:
+            written += 1
+            yield row
+
+    with open(path, 'wb') as output:
+        for chunk in _csv_chunks(header, counted(rows)):
+            output.write(chunk)
+            if on_progress:
+                on_progress(written)
+    return written
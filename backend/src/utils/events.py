@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from src.models.user import db, EventLog
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+# Event types VAs receive; admins receive everything
+PUBLIC_EVENTS = {'announcement_created'}
+
+def visible_events(role):
+    """Event types a user with `role` may see, or None for all of them"""
+    return None if role == 'admin' else PUBLIC_EVENTS
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+class LoopSubscriber:
+    """Subscriber queue owned by an asyncio event loop, fed from any thread"""
+
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+
+    def put_nowait(self, event):
+        self.loop.call_soon_threadsafe(self._offer, event)
+
+    def _offer(self, event):
+        if not self.queue.full():
+            self.queue.put_nowait(event)
+
+class EventBus:
+    """In-process pub/sub: every subscriber gets its own bounded queue.
+
+    A subscriber that stops reading loses events rather than blocking the
+    publisher; the SSE stream is a live view, not a delivery guarantee.
+    """
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, subscriber=None):
+        """Register a queue (a new queue.Queue by default) and return it"""
+        if subscriber is None:
+            subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def subscribe_async(self):
+        """Subscribe from a coroutine; read events from the returned `.queue`"""
+        return self.subscribe(LoopSubscriber(asyncio.get_running_loop(), self.queue_size))
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                pass
+            except Exception:
+                # e.g. a LoopSubscriber whose event loop has closed; it will
+                # never read again, so stop offering it events
+                self.unsubscribe(subscriber)
+
+    def publish(self, event_type, data):
+        self.dispatch({'id': next(self._ids), 'type': event_type, 'data': data})
+
+class DatabaseEventBus(EventBus):
+    """Fans events out across workers through the event_log table.
+
+    Publishing writes a row; each worker runs one polling thread, only while it
+    has subscribers, and dispatches new rows to its local queues.
+    """
+
+    def __init__(self, app, poll_interval=1.0, retention=timedelta(minutes=10), queue_size=100):
+        super().__init__(queue_size)
+        self.app = app
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._poller = None
+
+    def subscribe(self, subscriber=None):
+        subscriber = super().subscribe(subscriber)
+        with self._lock:
+            # A poller that died on an error is still set but not alive
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=self._poll, name='event-bus-poller', daemon=True)
+                self._poller.start()
+        return subscriber
+
+    def publish(self, event_type, data):
+        # Called after the write has committed, so this is its own transaction
+        db.session.add(EventLog(type=event_type, payload=json.dumps(data)))
+        db.session.commit()
+
+    def _keep_polling(self):
+        # Decided under the lock subscribe() starts pollers under: once this
+        # returns False the poller is cleared, so a subscriber arriving while
+        # the thread is still winding down starts a new one
+        with self._lock:
+            if self._subscribers:
+                return True
+            self._poller = None
+            return False
+
+    def _poll(self):
+        with self.app.app_context():
+            last_id = db.session.query(db.func.max(EventLog.id)).scalar() or 0
+            last_prune = time.monotonic()
+            while self._keep_polling():
+                time.sleep(self.poll_interval)
+                rows = (
+                    EventLog.query.filter(EventLog.id > last_id)
+                    .order_by(EventLog.id)
+                    .limit(500)
+                    .all()
+                )
+                for row in rows:
+                    self.dispatch({'id': row.id, 'type': row.type, 'data': json.loads(row.payload)})
+                    last_id = row.id
+
+                if time.monotonic() - last_prune > 60:
+                    EventLog.query.filter(
+                        EventLog.created_at < datetime.utcnow() - self.retention
+                    ).delete(synchronize_session=False)
+                    db.session.commit()
+                    last_prune = time.monotonic()
+
+                # Don't hold a pooled connection between polls
+                db.session.remove()
+
+event_bus = EventBus()
+
+def init_event_bus(app):
+    """Pick the backend from EVENT_BUS_BACKEND: 'memory' (default) or 'database'"""
+    global event_bus
+    if app.config.get('EVENT_BUS_BACKEND', 'memory') == 'database':
+        event_bus = DatabaseEventBus(app, poll_interval=app.config.get('EVENT_BUS_POLL_INTERVAL', 1.0))
+    else:
+        event_bus = EventBus()
+    return event_bus
+
+def publish_event(event_type, data):
+    """Publish to live subscribers; never let a bus failure fail the request"""
+    try:
+        event_bus.publish(event_type, data)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Failed to publish %s event', event_type)
+
+def get_event_bus():
+    return event_bus
@@ -0,0 +1,106 @@
+from collections import namedtuple
+from datetime import datetime
+from src.models.user import db, User, TimeLog, EODReport
+from src.utils.csv_export import write_csv
+
+# A CSV export: column titles, the query, a function turning a result row
+# into a CSV row and the attachment's file name
+CsvExport = namedtuple('CsvExport', 'header query to_row filename')
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def export_filters(args):
+    """user_id/start_date/end_date from query args or job params, as JSON-safe values.
+
+    Raises ValueError for a malformed user_id or date.
+    """
+    user_id = args.get('user_id')
+    filters = {
+        'user_id': int(user_id) if user_id else None,
+        'start_date': args.get('start_date') or None,
+        'end_date': args.get('end_date') or None,
+    }
+    _parse_date(filters['start_date'])
+    _parse_date(filters['end_date'])
+    return filters
+
+def _apply_filters(query, model, user_id=None, start_date=None, end_date=None):
+    if user_id:
+        query = query.filter(model.user_id == user_id)
+    if start_date:
+        query = query.filter(model.date >= _parse_date(start_date))
+    if end_date:
+        query = query.filter(model.date <= _parse_date(end_date))
+    return query
+
+def time_logs_export(**filters):
+    """Time logs with the user joined in, newest first, selecting only the exported columns"""
+    query = db.session.query(
+        TimeLog.date,
+        TimeLog.clock_in,
+        TimeLog.clock_out,
+        TimeLog.total_hours,
+        User.first_name,
+        User.last_name
+    ).join(User, TimeLog.user_id == User.id)
+    query = _apply_filters(query, TimeLog, **filters).order_by(TimeLog.date.desc(), TimeLog.id.desc())
+
+    def to_row(log):
+        return [
+            log.date.strftime('%Y-%m-%d'),
+            f"{log.first_name} {log.last_name}",
+            log.clock_in.strftime('%H:%M:%S') if log.clock_in else '',
+            log.clock_out.strftime('%H:%M:%S') if log.clock_out else '',
+            log.total_hours or ''
+        ]
+
+    return CsvExport(['Date', 'Employee', 'Clock In', 'Clock Out', 'Total Hours'], query, to_row, 'time_logs.csv')
+
+def eod_reports_export(**filters):
+    """EOD reports with the user joined in, newest first, selecting only the exported columns"""
+    query = db.session.query(
+        EODReport.date,
+        EODReport.tasks_completed,
+        EODReport.blockers,
+        EODReport.issues,
+        EODReport.support_needed,
+        User.first_name,
+        User.last_name
+    ).join(User, EODReport.user_id == User.id)
+    query = _apply_filters(query, EODReport, **filters).order_by(EODReport.date.desc(), EODReport.id.desc())
+
+    def to_row(report):
+        return [
+            report.date.strftime('%Y-%m-%d'),
+            f"{report.first_name} {report.last_name}",
+            report.tasks_completed,
+            report.blockers or '',
+            report.issues or '',
+            report.support_needed or ''
+        ]
+
+    return CsvExport(
+        ['Date', 'Employee', 'Tasks Completed', 'Blockers', 'Issues', 'Support Needed'],
+        query, to_row, 'eod_reports.csv'
+    )
+
+def export_rows(export):
+    """CSV rows of `export`, fetched in batches while they are written"""
+    return (export.to_row(row) for row in export.query.yield_per(1000))
+
+def _write_export(job, export):
+    total = export.query.order_by(None).count()
+    job.progress(0, total, force=True)
+    path = job.artifact_path(export.filename)
+    written = write_csv(path, export.header, export_rows(export), on_progress=job.progress)
+    job.progress(written, total, force=True)
+    return {'rows': written}
+
+def run_time_logs_export(job, params):
+    """Job handler: write the time log export for `params` (see export_filters) to a file"""
+    return _write_export(job, time_logs_export(**export_filters(params)))
+
+def run_eod_reports_export(job, params):
+    """Job handler: write the EOD report export for `params` (see export_filters) to a file"""
+    return _write_export(job, eod_reports_export(**export_filters(params)))
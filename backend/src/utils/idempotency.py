@@ -0,0 +1,74 @@
+import json
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import g, jsonify, make_response, request, session
+from src.models.user import db, IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# How long a key is remembered; a retry after this runs the request again
+IDEMPOTENCY_TTL = timedelta(hours=24)
+
+def _stored_response(key):
+    stored = IdempotencyKey.query.filter(
+        IdempotencyKey.user_id == session['user_id'],
+        IdempotencyKey.key == key,
+        IdempotencyKey.created_at >= datetime.utcnow() - IDEMPOTENCY_TTL
+    ).first()
+    if stored is None:
+        return None
+    if stored.endpoint != request.endpoint:
+        return jsonify({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'}), 422
+    response = make_response(stored.response, stored.status_code)
+    response.mimetype = 'application/json'
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(f):
+    """Replay the stored response when a request repeats its Idempotency-Key.
+
+    Requests without the header run as usual. The view stores its response
+    with save_idempotent_response() before committing, so the key and the
+    write land in the same transaction. A request that loses a race for the
+    same key fails on the write (or on the key's unique index) and gets the
+    winner's response instead of its own error.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({'error': f'{IDEMPOTENCY_HEADER} must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters'}), 400
+
+        stored = _stored_response(key)
+        if stored is not None:
+            return stored
+
+        g.idempotency_key = key
+        response = make_response(f(*args, **kwargs))
+        if response.status_code >= 400:
+            stored = _stored_response(key)
+            if stored is not None:
+                return stored
+        return response
+    return decorated_function
+
+def save_idempotent_response(payload, status_code):
+    """Store the view's response for its Idempotency-Key, if any; call before the write's commit"""
+    key = g.get('idempotency_key')
+    if key is None:
+        return
+    user_id = session['user_id']
+    # An expired key may be reused; drop it along with the user's other expired keys
+    IdempotencyKey.query.filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.created_at < datetime.utcnow() - IDEMPOTENCY_TTL
+    ).delete(synchronize_session=False)
+    db.session.add(IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        endpoint=request.endpoint,
+        status_code=status_code,
+        response=json.dumps(payload)
+    ))
@@ -0,0 +1,438 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from importlib import import_module
+from flask import jsonify, request
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.orm import aliased
+from werkzeug.utils import secure_filename
+from src.models.user import db, Job
+from src.utils.events import publish_event
+
+# Defaults; override with the same keys in app.config
+JOB_DEFAULTS = {
+    'JOB_WORKERS': max(1, (os.cpu_count() or 2) // 2),  # job processes per dispatcher; 0 runs jobs on its thread
+    'JOB_CONCURRENCY': 4,  # jobs running at once across all dispatchers
+    'JOB_DISPATCHER': True,  # False leaves running jobs to `flask run-jobs`
+    'JOB_POLL_INTERVAL': 1.0,
+    'JOB_MAX_ATTEMPTS': 3,
+    'JOB_RETRY_DELAY': 30,  # seconds before the second attempt, doubled for each later one
+    'JOB_STALE_SECONDS': 300,  # a running job without a heartbeat for this long is retried
+    'JOB_ARTIFACT_TTL': 24 * 3600,  # seconds a finished job's file can be downloaded
+    'JOB_RETENTION': 7 * 24 * 3600,  # seconds finished job rows are kept
+}
+
+# kind -> (handler as 'module:function', jobs of that kind running at once)
+JOB_KINDS = {
+    'time_logs_export': ('src.utils.exports:run_time_logs_export', 2),
+    'eod_reports_export': ('src.utils.exports:run_eod_reports_export', 2),
+    # Imports upsert the same catalogue rows, so they run one at a time
+    'training_import': ('src.utils.training_import:run_import_job', 1),
+}
+
+# app.config keys a job process needs from the application that started it
+WORKER_CONFIG_KEYS = ('SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_ENGINE_OPTIONS', 'WORK_TIMEZONE')
+
+# Seconds between the dispatcher's housekeeping passes. Each starts with a
+# SELECT and only writes when it finds something, so an idle dispatcher
+# does not compete with requests for SQLite's write lock.
+CLEANUP_INTERVAL = 60
+STALE_SWEEP_INTERVAL = 30
+HEARTBEAT_INTERVAL = 30
+PROGRESS_INTERVAL = 0.5
+
+class JobFailed(Exception):
+    """Raised by a handler when a retry cannot help; `result` is stored with the job"""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+class JobContext:
+    """Handed to a job handler to report progress and name its artifact file"""
+
+    def __init__(self, job_id, job_dir):
+        self.job_id = job_id
+        self.job_dir = job_dir
+        self.artifact = None
+        self.artifact_name = None
+        self._reported = 0
+
+    def progress(self, done, total=None, force=False):
+        """Record `done` of `total` items; also the job's heartbeat. Throttled unless `force`"""
+        now = time.monotonic()
+        if not force and now - self._reported < PROGRESS_INTERVAL:
+            return
+        self._reported = now
+        values = {'progress': done, 'heartbeat_at': datetime.utcnow()}
+        if total is not None:
+            values['total'] = total
+        # Own connection and transaction: the handler's session may be mid-query
+        with db.engine.begin() as connection:
+            connection.execute(update(Job).where(Job.id == self.job_id).values(**values))
+
+    def artifact_path(self, name):
+        """Path to write the job's downloadable file to; it is served as `name`"""
+        os.makedirs(self.job_dir, exist_ok=True)
+        self.artifact = f'{self.job_id}-{secure_filename(name)}'
+        self.artifact_name = name
+        return os.path.join(self.job_dir, self.artifact)
+
+    def discard_artifact(self):
+        if self.artifact:
+            try:
+                os.remove(os.path.join(self.job_dir, self.artifact))
+            except FileNotFoundError:
+                pass
+            self.artifact = self.artifact_name = None
+
+# Application of a job process, created once by the pool initializer
+_worker_app = None
+
+def _init_worker(config):
+    global _worker_app
+    from src.main import create_app
+
+    _worker_app = create_app(config)
+
+def _handler(kind):
+    module_name, function_name = JOB_KINDS[kind][0].split(':')
+    return getattr(import_module(module_name), function_name)
+
+def run_job(job_id, kind, params, job_dir, app=None):
+    """Run one attempt of a job and describe the outcome in a dict.
+
+    Errors are returned rather than raised so the outcome always pickles
+    back from the job process.
+    """
+    with (app or _worker_app).app_context():
+        context = JobContext(job_id, job_dir)
+        try:
+            result = _handler(kind)(context, params)
+            return {'result': result, 'artifact': context.artifact, 'artifact_name': context.artifact_name}
+        except JobFailed as e:
+            db.session.rollback()
+            context.discard_artifact()
+            return {'error': str(e), 'result': e.result, 'retry': False}
+        except Exception as e:
+            db.session.rollback()
+            context.discard_artifact()
+            return {'error': f'{type(e).__name__}: {e}', 'retry': True}
+
+def requeue_stale_jobs(stale_seconds):
+    """Retry (or fail, when out of attempts) running jobs whose process stopped heartbeating"""
+    now = datetime.utcnow()
+    stale = (Job.status == 'running', Job.heartbeat_at < now - timedelta(seconds=stale_seconds))
+    if db.session.execute(select(Job.id).where(*stale).limit(1)).first() is None:
+        return 0
+    retried = db.session.execute(
+        update(Job)
+        .where(*stale, Job.attempts < Job.max_attempts)
+        .values(status='queued', run_after=now, error='Job stopped responding')
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    failed = db.session.execute(
+        update(Job)
+        .where(*stale, Job.attempts >= Job.max_attempts)
+        .values(status='failed', error='Job stopped responding', finished_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return retried + failed
+
+def cleanup_jobs(job_dir, artifact_ttl, retention):
+    """Delete expired artifacts, finished job rows past `retention` and orphaned files.
+
+    Returns the number of files removed.
+    """
+    now = datetime.utcnow()
+    old = Job.status.in_(('succeeded', 'failed')) & (Job.finished_at < now - timedelta(seconds=retention))
+    expired = db.session.execute(
+        select(Job.id, Job.artifact).where(Job.artifact.isnot(None), (Job.expires_at < now) | old)
+    ).all()
+
+    has_old = db.session.execute(select(Job.id).where(old).limit(1)).first() is not None
+
+    removed = 0
+    for _, artifact in expired:
+        try:
+            os.remove(os.path.join(job_dir, artifact))
+            removed += 1
+        except FileNotFoundError:
+            pass
+    if expired:
+        db.session.execute(
+            update(Job)
+            .where(Job.id.in_([job_id for job_id, _ in expired]))
+            .values(artifact=None)
+            .execution_options(synchronize_session=False)
+        )
+    if has_old:
+        db.session.execute(delete(Job).where(old).execution_options(synchronize_session=False))
+    if expired or has_old:
+        db.session.commit()
+
+    # Files of attempts whose process died before they were recorded
+    if os.path.isdir(job_dir):
+        referenced = set(db.session.scalars(select(Job.artifact).where(Job.artifact.isnot(None))))
+        cutoff = time.time() - artifact_ttl
+        for name in os.listdir(job_dir):
+            path = os.path.join(job_dir, name)
+            if name not in referenced and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+    return removed
+
+class JobQueue:
+    """Queue of background jobs stored in the job table, run in a process pool.
+
+    Each process that submits jobs starts one dispatcher thread on demand
+    (unless JOB_DISPATCHER is off, in which case `flask run-jobs` runs one in
+    the foreground). Dispatchers claim jobs with one conditional UPDATE that
+    also checks the per-kind limit in JOB_KINDS and JOB_CONCURRENCY, so any
+    number of them can share the table; SQLite serializes the claims, so the
+    limits hold exactly there. A dispatcher heartbeats the jobs it runs:
+    jobs whose heartbeat stops are retried elsewhere, as are jobs whose
+    handler raised, after an exponential backoff and up to max_attempts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.job_dir = app.config.get('JOB_DIR') or os.path.join(app.root_path, 'database', 'jobs')
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._executor = None
+        self._running = {}  # future -> claimed job row
+        self._last_cleanup = 0
+        self._last_sweep = 0
+        self._last_heartbeat = 0
+
+    def setting(self, key):
+        return self.app.config.get(key, JOB_DEFAULTS[key])
+
+    def submit(self, kind, params, created_by):
+        """Queue a job of `kind` and wake the dispatcher; returns the Job row"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f'Unknown job kind: {kind}')
+        job = Job(
+            kind=kind,
+            params=json.dumps(params),
+            created_by=created_by,
+            max_attempts=self.setting('JOB_MAX_ATTEMPTS')
+        )
+        db.session.add(job)
+        db.session.commit()
+        self.ensure_started()
+        self._wake.set()
+        return job
+
+    def ensure_started(self):
+        """Start this process's dispatcher thread if JOB_DISPATCHER is on and it isn't running"""
+        if not self.setting('JOB_DISPATCHER'):
+            return
+        # Threads and pools don't survive a fork, so each worker starts its own
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._executor = None
+            self._running = {}
+            self._thread = threading.Thread(target=self.run_forever, name='job-dispatcher', daemon=True)
+            self._thread.start()
+
+    def run_forever(self):
+        with self.app.app_context():
+            while True:
+                try:
+                    self.tick()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Job dispatcher tick failed')
+                finally:
+                    db.session.remove()
+                self._wake.wait(self.setting('JOB_POLL_INTERVAL'))
+                self._wake.clear()
+
+    def tick(self):
+        """Collect finished jobs, heartbeat running ones, clean up, then start what fits"""
+        self._collect()
+        now = time.monotonic()
+        if now - self._last_heartbeat >= min(HEARTBEAT_INTERVAL, self.setting('JOB_STALE_SECONDS') / 3):
+            self._heartbeat()
+            self._last_heartbeat = now
+        if now - self._last_sweep >= STALE_SWEEP_INTERVAL:
+            requeue_stale_jobs(self.setting('JOB_STALE_SECONDS'))
+            self._last_sweep = now
+        if now - self._last_cleanup >= CLEANUP_INTERVAL:
+            cleanup_jobs(self.job_dir, self.setting('JOB_ARTIFACT_TTL'), self.setting('JOB_RETENTION'))
+            self._last_cleanup = now
+
+        while len(self._running) < max(1, self.setting('JOB_WORKERS')):
+            job = self._claim()
+            if job is None:
+                break
+            self._start(job)
+
+    def _claim(self):
+        now = datetime.utcnow()
+        # Read-only check first: the claiming UPDATE takes the write lock even when it matches nothing
+        ready = select(Job.id).where(Job.status == 'queued', Job.run_after <= now).limit(1)
+        if db.session.execute(ready).first() is None:
+            db.session.rollback()
+            return None
+        queued = aliased(Job)
+        running = aliased(Job)
+        running_kind = (
+            select(func.count(running.id))
+            .where(running.status == 'running', running.kind == queued.kind)
+            .scalar_subquery()
+        )
+        running_total = select(func.count(running.id)).where(running.status == 'running').scalar_subquery()
+        kind_limit = case({kind: limit for kind, (_, limit) in JOB_KINDS.items()}, value=queued.kind, else_=0)
+        candidate = (
+            select(queued.id)
+            .where(
+                queued.status == 'queued',
+                queued.run_after <= now,
+                running_kind < kind_limit,
+                running_total < self.setting('JOB_CONCURRENCY')
+            )
+            .order_by(queued.run_after, queued.id)
+            .limit(1)
+            .scalar_subquery()
+        )
+        job = db.session.execute(
+            update(Job)
+            .where(Job.id == candidate, Job.status == 'queued')
+            .values(status='running', attempts=Job.attempts + 1, started_at=now, heartbeat_at=now, progress=0)
+            .returning(Job.id, Job.kind, Job.params, Job.attempts, Job.max_attempts)
+            .execution_options(synchronize_session=False)
+        ).first()
+        db.session.commit()
+        return job
+
+    def _get_executor(self):
+        workers = self.setting('JOB_WORKERS')
+        if not workers:
+            return None
+        if self._executor is None:
+            config = {key: self.app.config[key] for key in WORKER_CONFIG_KEYS if key in self.app.config}
+            config.update(JOB_DIR=self.job_dir, JOB_DISPATCHER=False, INIT_DB_ON_STARTUP=False)
+            # Spawned, not forked: the dispatcher forks from a threaded process
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(config,)
+            )
+        return self._executor
+
+    def _start(self, job):
+        params = json.loads(job.params)
+        executor = self._get_executor()
+        if executor is None:
+            self._finish(job, run_job(job.id, job.kind, params, self.job_dir, app=self.app))
+            return
+        try:
+            future = executor.submit(run_job, job.id, job.kind, params, self.job_dir)
+        except Exception as e:
+            # The pool is broken or shut down; give the attempt back
+            self._executor = None
+            self._finish(job, {'error': f'{type(e).__name__}: {e}', 'retry': True})
+            return
+        future.add_done_callback(lambda _: self._wake.set())
+        self._running[future] = job
+
+    def _collect(self):
+        for future in [future for future in self._running if future.done()]:
+            job = self._running.pop(future)
+            try:
+                outcome = future.result()
+            except BrokenProcessPool:
+                # A job process died; the next job gets a fresh pool
+                self._executor = None
+                outcome = {'error': 'Job process exited unexpectedly', 'retry': True}
+            except Exception as e:
+                outcome = {'error': f'{type(e).__name__}: {e}', 'retry': True}
+            self._finish(job, outcome)
+
+    def _heartbeat(self):
+        if not self._running:
+            return
+        db.session.execute(
+            update(Job)
+            .where(Job.id.in_([job.id for job in self._running.values()]), Job.status == 'running')
+            .values(heartbeat_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def _finish(self, job, outcome):
+        now = datetime.utcnow()
+        if 'error' not in outcome:
+            values = {
+                'status': 'succeeded',
+                'progress': func.coalesce(Job.total, Job.progress),
+                'result': json.dumps(outcome['result']),
+                'error': None,
+                'artifact': outcome['artifact'],
+                'artifact_name': outcome['artifact_name'],
+                'finished_at': now,
+                'expires_at': now + timedelta(seconds=self.setting('JOB_ARTIFACT_TTL'))
+            }
+        elif outcome['retry'] and job.attempts < job.max_attempts:
+            delay = self.setting('JOB_RETRY_DELAY') * 2 ** (job.attempts - 1)
+            values = {'status': 'queued', 'error': outcome['error'], 'run_after': now + timedelta(seconds=delay)}
+        else:
+            values = {
+                'status': 'failed',
+                'error': outcome['error'],
+                'result': json.dumps(outcome['result']) if outcome.get('result') is not None else None,
+                'finished_at': now
+            }
+        # Unless the job was given up on as stale and claimed again meanwhile
+        updated = db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.status == 'running', Job.attempts == job.attempts)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+
+        # Published from the dispatcher's process: a job process has no subscribers
+        if updated and values['status'] != 'queued':
+            publish_event('job_finished', {'id': job.id, 'kind': job.kind, 'status': values['status']})
+
+    def artifact_file(self, job):
+        return os.path.join(self.job_dir, job.artifact)
+
+job_queue = None
+
+def init_job_queue(app):
+    """Create the queue; its dispatcher thread starts with the first job submitted or polled"""
+    global job_queue
+    job_queue = JobQueue(app)
+    return job_queue
+
+def get_job_queue():
+    return job_queue
+
+def prefers_async():
+    """True if the client sent `Prefer: respond-async` and should get a job instead of the result"""
+    return 'respond-async' in request.headers.get('Prefer', '')
+
+def job_accepted(job):
+    """202 response pointing at the queued job"""
+    return jsonify({'message': 'Job queued', 'job': job.to_dict()}), 202, {
+        'Location': f'/api/jobs/{job.id}',
+        'Preference-Applied': 'respond-async'
+    }
@@ -0,0 +1,201 @@
+import bisect
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+# Upper bounds, in seconds for timings and in statements for SQL counts
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+# Slow queries kept for the admin profiling view
+SLOW_QUERY_HISTORY = 100
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense, one per label set"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class RequestMetrics:
+    """Per-endpoint request latency, status and SQL counters for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.sql_count = {}
+        self.sql_time = {}
+        self.responses = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_HISTORY)
+        self.started_at = datetime.utcnow()
+
+    def record_request(self, blueprint, endpoint, method, status, duration, sql_count, sql_time):
+        key = (blueprint, endpoint, method)
+        with self._lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.sql_count[key] = Histogram(SQL_COUNT_BUCKETS)
+                self.sql_time[key] = Histogram(LATENCY_BUCKETS)
+            self.latency[key].observe(duration)
+            self.sql_count[key].observe(sql_count)
+            self.sql_time[key].observe(sql_time)
+            status_key = key + (str(status),)
+            self.responses[status_key] = self.responses.get(status_key, 0) + 1
+
+    def record_slow_query(self, endpoint, duration, statement):
+        with self._lock:
+            self.slow_queries.append({
+                'endpoint': endpoint,
+                'duration_ms': round(duration * 1000, 1),
+                'statement': statement,
+                'at': datetime.utcnow().isoformat(),
+            })
+
+    def summary(self):
+        """Per-endpoint rows for the admin profiling view, slowest p95 first"""
+        with self._lock:
+            rows = []
+            for key, latency in self.latency.items():
+                blueprint, endpoint, method = key
+                statuses = {
+                    status: count for (*rest, status), count in self.responses.items()
+                    if tuple(rest) == key
+                }
+                errors = sum(count for status, count in statuses.items() if status.startswith('5'))
+                rows.append({
+                    'blueprint': blueprint,
+                    'endpoint': endpoint,
+                    'method': method,
+                    'requests': latency.count,
+                    'errors': errors,
+                    'statuses': statuses,
+                    'avg_ms': round(latency.sum / latency.count * 1000, 1),
+                    'p50_ms': _ms(latency.quantile(0.5)),
+                    'p95_ms': _ms(latency.quantile(0.95)),
+                    'avg_sql_statements': round(self.sql_count[key].sum / latency.count, 1),
+                    'avg_sql_ms': round(self.sql_time[key].sum / latency.count * 1000, 1),
+                })
+            slow_queries = list(self.slow_queries)
+        rows.sort(key=lambda row: (row['p95_ms'] or 0, row['avg_ms']), reverse=True)
+        return {
+            'since': self.started_at.isoformat(),
+            'endpoints': rows,
+            'slow_queries': slow_queries[::-1],
+        }
+
+    def render_prometheus(self):
+        """All series in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP http_requests_total Requests handled, by endpoint and status.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (blueprint, endpoint, method, status), count in sorted(self.responses.items()):
+                labels = _labels(blueprint=blueprint, endpoint=endpoint, method=method, status=status)
+                lines.append(f'http_requests_total{{{labels}}} {count}')
+
+            for name, help_text, series in (
+                ('http_request_duration_seconds', 'Request latency.', self.latency),
+                ('http_request_sql_statements', 'SQL statements executed per request.', self.sql_count),
+                ('http_request_sql_duration_seconds', 'Time spent in SQL per request.', self.sql_time),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for (blueprint, endpoint, method), histogram in sorted(series.items()):
+                    labels = _labels(blueprint=blueprint, endpoint=endpoint, method=method)
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{labels}}} {histogram.sum}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+def _ms(seconds):
+    if seconds is None:
+        return None
+    return seconds * 1000 if seconds != float('inf') else None
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+request_metrics = RequestMetrics()
+
+def _endpoint_name():
+    # Unmatched URLs share one series so 404 probes can't grow the label set
+    return request.endpoint or 'unmatched'
+
+def init_request_metrics(app):
+    """Time every request and record its status and SQL usage"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is not None:
+            request_metrics.record_request(
+                request.blueprint or '',
+                _endpoint_name(),
+                request.method,
+                response.status_code,
+                time.perf_counter() - started,
+                g.get('sql_count', 0),
+                g.get('sql_time', 0.0),
+            )
+        return response
+
+def instrument_engine(app, engine):
+    """Count and time SQL per request, and log statements slower than SLOW_QUERY_MS"""
+    slow_query_seconds = app.config.get('SLOW_QUERY_MS', 200) / 1000
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_started'].pop()
+        in_request = has_request_context()
+        if in_request and 'sql_count' in g:
+            g.sql_count += 1
+            g.sql_time += duration
+        if duration >= slow_query_seconds:
+            endpoint = _endpoint_name() if in_request else '-'
+            app.logger.warning('Slow query (%.0f ms) in %s: %s', duration * 1000, endpoint, statement)
+            request_metrics.record_slow_query(endpoint, duration, statement)
+
+    @event.listens_for(engine, 'handle_error')
+    def discard_query_timer(context):
+        # Failed statements never reach after_cursor_execute
+        started = context.connection.info.get('query_started') if context.connection else None
+        if started:
+            started.pop()
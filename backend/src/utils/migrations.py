@@ -0,0 +1,230 @@
+import json
+from datetime import datetime
+from sqlalchemy import delete, func, insert, inspect, literal, select, text
+from src.models.user import (
+    db, User, TimeLog, EODReport, Training, TrainingProgress, SOP, SOPRead, LeaveRequest, Announcement,
+    training_tags
+)
+from src.utils.conditional import bump_version
+from src.utils.search import SEARCH_KINDS, reindex
+from src.utils.tags import backfill_tag_links, parse_tags
+from src.utils.work_time import backfill_intervals
+
+def _merge_time_logs(keep, duplicates):
+    # Treat duplicates as extra sessions on the same day
+    rows = [keep] + duplicates
+    clock_ins = [row.clock_in for row in rows if row.clock_in]
+    clock_outs = [row.clock_out for row in rows if row.clock_out]
+    hours = [row.total_hours for row in rows if row.total_hours is not None]
+    keep.clock_in = min(clock_ins) if clock_ins else None
+    keep.clock_out = max(clock_outs) if clock_outs else None
+    keep.total_hours = round(sum(hours), 2) if hours else None
+
+def _merge_eod_reports(keep, duplicates):
+    # Resubmitting overwrites today's report, so the latest submission wins
+    latest = max([keep] + duplicates, key=lambda row: (row.created_at is not None, row.created_at, row.id))
+    for field in ('tasks_completed', 'blockers', 'issues', 'support_needed', 'created_at'):
+        setattr(keep, field, getattr(latest, field))
+
+def _merge_training_progress(keep, duplicates):
+    completed = [row for row in [keep] + duplicates if row.completed]
+    keep.completed = bool(completed)
+    completed_at = [row.completed_at for row in completed if row.completed_at]
+    keep.completed_at = min(completed_at) if completed_at else None
+
+def _merge_sop_reads(keep, duplicates):
+    read_at = [row.read_at for row in [keep] + duplicates if row.read_at]
+    keep.read_at = min(read_at) if read_at else None
+
+# (model, unique index name, key columns, merge function)
+UNIQUE_KEYS = [
+    (TimeLog, 'ix_time_log_user_id_date', ('user_id', 'date'), _merge_time_logs),
+    (EODReport, 'ix_eod_report_user_id_date', ('user_id', 'date'), _merge_eod_reports),
+    (TrainingProgress, 'ix_training_progress_user_id_training_id', ('user_id', 'training_id'), _merge_training_progress),
+    (SOPRead, 'ix_sop_read_user_id_sop_id', ('user_id', 'sop_id'), _merge_sop_reads),
+]
+
+def merge_duplicates(model, key_names, merge):
+    """Collapse rows sharing a key into the lowest id; returns rows removed"""
+    key_columns = [getattr(model, name) for name in key_names]
+    duplicate_keys = (
+        db.session.query(*key_columns)
+        .group_by(*key_columns)
+        .having(func.count(model.id) > 1)
+        .all()
+    )
+
+    removed = 0
+    for key in duplicate_keys:
+        rows = model.query.filter(
+            *[column == value for column, value in zip(key_columns, key)]
+        ).order_by(model.id).all()
+        keep, duplicates = rows[0], rows[1:]
+        merge(keep, duplicates)
+        for row in duplicates:
+            db.session.delete(row)
+        removed += len(duplicates)
+
+    db.session.flush()
+    return removed
+
+def add_missing_columns(inspector):
+    """Add columns that are in the models but not yet in existing tables.
+
+    New columns must be nullable or carry a server default.
+    """
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            with db.engine.begin() as connection:
+                connection.execute(text(ddl))
+
+def _merge_trainings(keep, duplicates):
+    # The oldest row keeps its own fields, filling gaps from the copies
+    for field in ('description', 'file_url', 'video_url', 'category', 'skill_level'):
+        if getattr(keep, field) is None:
+            values = [getattr(row, field) for row in duplicates if getattr(row, field) is not None]
+            setattr(keep, field, values[0] if values else None)
+
+    names = parse_tags(keep.tags)
+    for row in duplicates:
+        for name in parse_tags(row.tags):
+            # The JSON column holds at most 500 characters
+            if name not in names and len(json.dumps(names + [name])) <= 500:
+                names.append(name)
+    keep.tags = json.dumps(names) if names else None
+
+    # One progress row per user, on the kept training
+    duplicate_ids = [row.id for row in duplicates]
+    progress = TrainingProgress.query.filter(
+        TrainingProgress.training_id.in_([keep.id] + duplicate_ids)
+    ).order_by(TrainingProgress.id).all()
+    by_user = {}
+    for row in progress:
+        by_user.setdefault(row.user_id, []).append(row)
+    for rows in by_user.values():
+        kept = next((row for row in rows if row.training_id == keep.id), rows[0])
+        others = [row for row in rows if row is not kept]
+        if others:
+            _merge_training_progress(kept, others)
+        for row in others:
+            db.session.delete(row)
+        kept.training_id = keep.id
+    db.session.flush()
+
+    linked = select(training_tags.c.tag_id).where(training_tags.c.training_id == keep.id)
+    db.session.execute(insert(training_tags).from_select(
+        ['training_id', 'tag_id'],
+        select(literal(keep.id), training_tags.c.tag_id).distinct().where(
+            training_tags.c.training_id.in_(duplicate_ids),
+            training_tags.c.tag_id.not_in(linked)
+        )
+    ))
+    db.session.execute(delete(training_tags).where(training_tags.c.training_id.in_(duplicate_ids)))
+    # Bulk delete: the ORM would try to unlink the moved progress rows
+    Training.query.filter(Training.id.in_(duplicate_ids)).delete(synchronize_session=False)
+
+def merge_duplicate_training_urls(inspector):
+    """Fold trainings sharing a URL into the oldest one; returns rows removed.
+
+    Progress, tags and tag links move to the kept row before the copies are
+    deleted, so nothing is lost and the catalogue import matches the one
+    remaining row on its URL.
+    """
+    Training.query.filter(Training.url == '').update({Training.url: None}, synchronize_session=False)
+    duplicate_urls = (
+        db.session.query(Training.url)
+        .filter(Training.url.isnot(None))
+        .group_by(Training.url)
+        .having(func.count(Training.id) > 1)
+        .all()
+    )
+
+    changed_ids = []
+    for (url,) in duplicate_urls:
+        rows = Training.query.filter(Training.url == url).order_by(Training.id).all()
+        keep, duplicates = rows[0], rows[1:]
+        _merge_trainings(keep, duplicates)
+        changed_ids.extend(row.id for row in rows)
+    db.session.flush()
+
+    if changed_ids:
+        bump_version('training')
+        if inspector.has_table(SEARCH_KINDS['training'][1]):
+            # Drops the deleted copies and refreshes the kept rows; commits
+            reindex('training', changed_ids)
+    return len(changed_ids) - len(duplicate_urls)
+
+def backfill_sort_keys():
+    """Fill NULLs in columns that list endpoints sort on.
+
+    These columns are NOT NULL in new databases; existing SQLite tables keep
+    their nullable definition, so old NULLs are replaced here.
+    """
+    now = datetime.utcnow()
+    filled = 0
+    for column, value in (
+        (User.created_at, now),
+        (Training.created_at, now),
+        (SOP.created_at, now),
+        (LeaveRequest.created_at, now),
+        (Announcement.created_at, now),
+        (Announcement.is_pinned, False),
+    ):
+        filled += column.class_.query.filter(column.is_(None)).update(
+            {column: value}, synchronize_session=False
+        )
+    db.session.commit()
+    return filled
+
+def upgrade_schema():
+    """Bring an existing database up to the current columns and indexes.
+
+    `db.create_all()` only creates missing tables, so columns and indexes
+    added to existing tables are created here. Duplicate rows that would
+    violate a new unique index are merged first, NULL sort keys are filled,
+    legacy tag strings are parsed into the tag tables, and single-pair time
+    logs get an interval.
+    Safe to run on every start.
+    """
+    inspector = inspect(db.engine)
+    add_missing_columns(inspector)
+    for model, index_name, key_names, merge in UNIQUE_KEYS:
+        existing = {index['name'] for index in inspector.get_indexes(model.__tablename__)}
+        if index_name in existing:
+            continue
+        removed = merge_duplicates(model, key_names, merge)
+        if removed:
+            print(f"Merged {removed} duplicate {model.__tablename__} rows")
+    if 'ix_training_url' not in {index['name'] for index in inspector.get_indexes('training')}:
+        removed = merge_duplicate_training_urls(inspector)
+        if removed:
+            print(f"Merged {removed} duplicate training rows by URL")
+    db.session.commit()
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+    # Keyset pagination needs a non-NULL sort key on every row
+    filled = backfill_sort_keys()
+    if filled:
+        print(f"Filled {filled} missing created_at/is_pinned values")
+
+    # Tags used to live only in a JSON string column
+    backfill_tag_links()
+
+    # Time logs used to hold a single clock-in/clock-out pair
+    backfilled = backfill_intervals()
+    if backfilled:
+        print(f"Created {backfilled} time intervals from existing time logs")
@@ -0,0 +1,122 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from flask import request
+from sqlalchemy import and_, or_, literal, type_coerce, Date, DateTime, String
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+class PaginationError(ValueError):
+    """Raised for a malformed `limit` or `cursor` query parameter"""
+
+def _encode_cursor(anchor_id, key):
+    raw = json.dumps({'id': anchor_id, 'key': key})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor, keys):
+    """(anchor id, anchor sort values) from a cursor made for `keys`"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        anchor_id = raw['id']
+        values = raw['key']
+        if not isinstance(anchor_id, int) or not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError
+        return anchor_id, [_from_json(key, value) for key, value in zip(keys, values)]
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise PaginationError('Invalid cursor')
+
+def _to_json(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+def _from_json(key, value):
+    python_type = key.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is bool:
+        # SQLite hands booleans back as 0/1
+        if value not in (0, 1):
+            raise ValueError
+        return bool(value)
+    if not isinstance(value, python_type):
+        raise ValueError
+    return value
+
+def _parse_limit():
+    limit = request.args.get('limit')
+    if limit is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, MAX_LIMIT)
+
+def _sort_keys(query, columns):
+    """Expressions to seek on, one per non-primary-key sort column.
+
+    SQLite stores datetimes as text, and existing rows hold created_at both
+    with and without microseconds. It orders them as text, so the cursor
+    carries the stored text and the seek compares text with text; a
+    re-rendered datetime would skip or repeat rows.
+    """
+    sqlite = query.session.get_bind().dialect.name == 'sqlite'
+    return [
+        type_coerce(column, String) if sqlite and isinstance(column.type, (Date, DateTime)) else column
+        for column in columns[:-1]
+    ]
+
+def _seek(columns, keys, anchor_id, anchor_values, descending):
+    # (a, b, id) < (x, y, z) expanded so it works without row-value support
+    keys = keys + [columns[-1]]
+    # Bound explicitly: SQLAlchemy refuses `<` against a bare True/False
+    anchor = [literal(value, key.type) for key, value in zip(keys, anchor_values + [anchor_id])]
+    clauses = []
+    for i, key in enumerate(keys):
+        compare = key < anchor[i] if descending else key > anchor[i]
+        prefix = [k == v for k, v in zip(keys[:i], anchor[:i])]
+        clauses.append(and_(*prefix, compare))
+    return or_(*clauses)
+
+def paginate(query, columns, descending=True):
+    """Order `query` by `columns` and return one keyset page.
+
+    The last column must be the primary key so the sort is total, and every
+    column must be NOT NULL. Reads `limit` and `cursor` from the request args
+    and returns `(rows, limit, next_cursor)`; `next_cursor` is None on the
+    last page. The cursor holds the last row's sort values, so it stays valid
+    after that row is deleted.
+
+    A request with neither `limit` nor `cursor` gets every row, with `limit`
+    and `next_cursor` both None: the list pages of the built frontend ask
+    for whole lists and never follow a cursor.
+    """
+    nullable = [column.key for column in columns if column.nullable]
+    if nullable:
+        raise ValueError(f'Cannot paginate on nullable columns: {", ".join(nullable)}')
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns])
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return query.all(), None, None
+
+    limit = _parse_limit()
+    keys = _sort_keys(query, columns)
+    cursor = request.args.get('cursor')
+    if cursor:
+        anchor_id, anchor_values = _decode_cursor(cursor, keys)
+        query = query.filter(_seek(columns, keys, anchor_id, anchor_values, descending))
+
+    # Fetch one extra row to know whether another page exists. The sort keys
+    # are selected alongside each row so the cursor holds them as stored.
+    results = query.add_columns(*keys).limit(limit + 1).all()
+    rows = [result[0] for result in results[:limit]]
+    next_cursor = None
+    if len(results) > limit:
+        anchor = results[limit - 1]
+        anchor_id = getattr(anchor[0], columns[-1].key)
+        next_cursor = _encode_cursor(anchor_id, [_to_json(value) for value in anchor[1:]])
+    return rows, limit, next_cursor
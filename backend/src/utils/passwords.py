@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Defaults; override with the same keys in app.config
+PASSWORD_DEFAULTS = {
+    'PASSWORD_HASH_METHOD': 'scrypt',  # any werkzeug method, e.g. 'pbkdf2:sha256:600000'
+    'PASSWORD_HASH_WORKERS': max(1, (os.cpu_count() or 2) // 2),  # 0 hashes on the calling thread
+    'PASSWORD_HASH_CONCURRENCY': 8,  # hash jobs in flight or queued per process
+    'PASSWORD_HASH_TIMEOUT': 10,  # seconds to wait for a slot before giving up
+    # Generated temporary passwords carry ~71 bits of entropy, so a cheap hash
+    # is enough; the first login upgrades it to PASSWORD_HASH_METHOD
+    'PASSWORD_TEMP_HASH_METHOD': 'pbkdf2:sha256:10000',
+}
+
+class PasswordHashBusy(Exception):
+    """Raised when no hashing slot frees up within PASSWORD_HASH_TIMEOUT"""
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+_method_prefixes = {}
+
+def _setting(key):
+    if has_app_context():
+        return current_app.config.get(key, PASSWORD_DEFAULTS[key])
+    return PASSWORD_DEFAULTS[key]
+
+def _get_slots():
+    global _slots
+    with _lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(_setting('PASSWORD_HASH_CONCURRENCY'))
+        return _slots
+
+def _get_executor():
+    global _executor
+    workers = _setting('PASSWORD_HASH_WORKERS')
+    if not workers:
+        return None
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+def _reset_executor():
+    global _executor
+    with _lock:
+        _executor = None
+
+def _run(fn, *args):
+    """Run a hashing call in the process pool, bounded by the slot semaphore"""
+    slots = _get_slots()
+    if not slots.acquire(timeout=_setting('PASSWORD_HASH_TIMEOUT')):
+        raise PasswordHashBusy('Too many password operations in progress')
+    try:
+        executor = _get_executor()
+        if executor is None:
+            return fn(*args)
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool next time and finish this one inline
+            _reset_executor()
+            return fn(*args)
+    finally:
+        slots.release()
+
+def hash_password(password):
+    return _run(generate_password_hash, password, _setting('PASSWORD_HASH_METHOD'))
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+def hash_passwords(passwords, temporary=False):
+    """Hash many passwords across the whole pool while holding a single slot"""
+    passwords = list(passwords)
+    method = _setting('PASSWORD_TEMP_HASH_METHOD' if temporary else 'PASSWORD_HASH_METHOD')
+    slots = _get_slots()
+    if not slots.acquire(timeout=_setting('PASSWORD_HASH_TIMEOUT')):
+        raise PasswordHashBusy('Too many password operations in progress')
+    try:
+        executor = _get_executor()
+        if executor is None:
+            return [generate_password_hash(password, method) for password in passwords]
+        try:
+            return list(executor.map(generate_password_hash, passwords, [method] * len(passwords)))
+        except BrokenProcessPool:
+            _reset_executor()
+            return [generate_password_hash(password, method) for password in passwords]
+    finally:
+        slots.release()
+
+def _method_prefix(method):
+    # Werkzeug fills in default parameters ('scrypt' -> 'scrypt:32768:8:1'),
+    # so hash once per configured method to learn the stored prefix
+    if method not in _method_prefixes:
+        _method_prefixes[method] = generate_password_hash('', method).split('$', 1)[0]
+    return _method_prefixes[method]
+
+def needs_rehash(password_hash):
+    """True if a stored hash was made with a different method or cost than configured"""
+    return password_hash.split('$', 1)[0] != _method_prefix(_setting('PASSWORD_HASH_METHOD'))
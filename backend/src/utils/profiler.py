@@ -0,0 +1,238 @@
+import cProfile
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from flask import g, request
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:  # optional; falls back to cProfile
+    SamplingProfiler = None
+
+# Requests carrying this header are profiled while sampling is enabled
+PROFILE_HEADER = 'X-Profile-Request'
+
+DEFAULT_SETTINGS = {'enabled': False, 'sample_rate': 0.0, 'endpoints': []}
+
+# Seconds between checks of the shared settings file
+SETTINGS_RECHECK = 1.0
+
+# Named when the request starts, so the header can be sent before a streamed
+# body; the file's mtime is set to start + duration when it is saved. Older
+# profiles carry the duration in the name instead.
+STAMP_FORMAT = '%Y%m%dT%H%M%S%f'
+PROFILE_NAME = re.compile(
+    r'^(?P<stamp>[0-9]{8}T[0-9]{6}(?:[0-9]{6})?)-(?P<endpoint>[A-Za-z0-9_.]+)(?:-(?P<duration>[0-9]+)ms)?'
+    r'-[0-9a-f]{8}\.(?P<extension>pstats|speedscope\.json)$'
+)
+
+class RequestProfiler:
+    """Samples requests into a bounded directory of profile files.
+
+    Settings live in a JSON file in the profile directory so every worker on
+    the host follows the same admin switch. Each worker re-reads it at most
+    once a second; with sampling off, a request costs one flag check.
+    """
+
+    def __init__(self, directory, max_profiles=50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._settings = dict(DEFAULT_SETTINGS)
+        self._settings_mtime = None
+        self._checked_at = 0.0
+        # cProfile and pyinstrument allow one active profiler per interpreter
+        self._active = threading.Lock()
+
+    @property
+    def settings_path(self):
+        return os.path.join(self.directory, 'settings.json')
+
+    def settings(self):
+        now = time.monotonic()
+        if now - self._checked_at >= SETTINGS_RECHECK:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.settings_path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._settings_mtime:
+                self._settings = self._read_settings()
+                self._settings_mtime = mtime
+        return self._settings
+
+    def _read_settings(self):
+        try:
+            with open(self.settings_path) as f:
+                return {**DEFAULT_SETTINGS, **json.load(f)}
+        except (OSError, ValueError):
+            return dict(DEFAULT_SETTINGS)
+
+    def update_settings(self, enabled=None, sample_rate=None, endpoints=None):
+        settings = self._read_settings()
+        if enabled is not None:
+            settings['enabled'] = bool(enabled)
+        if sample_rate is not None:
+            settings['sample_rate'] = min(max(float(sample_rate), 0.0), 1.0)
+        if endpoints is not None:
+            settings['endpoints'] = [str(endpoint) for endpoint in endpoints]
+        os.makedirs(self.directory, exist_ok=True)
+        temp_path = f'{self.settings_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(settings, f)
+        os.replace(temp_path, self.settings_path)
+        self._checked_at = 0.0
+        return self.settings()
+
+    def should_profile(self):
+        settings = self.settings()
+        if not settings['enabled']:
+            return False
+        if settings['endpoints'] and request.endpoint not in settings['endpoints']:
+            return False
+        if request.headers.get(PROFILE_HEADER):
+            return True
+        return random.random() < settings['sample_rate']
+
+    def start(self):
+        if not self._active.acquire(blocking=False):
+            return None
+        try:
+            if SamplingProfiler is not None:
+                profiler = SamplingProfiler(async_mode='disabled')
+                profiler.start()
+            else:
+                profiler = cProfile.Profile()
+                profiler.enable()
+        except Exception:
+            self._active.release()
+            raise
+        return profiler
+
+    def stop(self, profiler):
+        try:
+            if SamplingProfiler is not None:
+                profiler.stop()
+            else:
+                profiler.disable()
+        finally:
+            self._active.release()
+
+    def profile_name(self, endpoint, started_at):
+        """File name for a profile of `endpoint` started at `started_at` (a time.time())"""
+        stamp = datetime.utcfromtimestamp(started_at).strftime(STAMP_FORMAT)
+        safe_endpoint = re.sub(r'[^A-Za-z0-9_.]', '_', endpoint)
+        # speedscope.app opens speedscope files directly as flame graphs;
+        # flameprof, snakeviz and gprof2dot all read pstats dumps
+        extension = 'speedscope.json' if SamplingProfiler is not None else 'pstats'
+        return f'{stamp}-{safe_endpoint}-{uuid.uuid4().hex[:8]}.{extension}'
+
+    def save(self, profiler, name, started_at, duration):
+        """Write a stopped profiler to the ring buffer under `name`"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name)
+        if SamplingProfiler is not None:
+            with open(path, 'w') as f:
+                f.write(profiler.output(SpeedscopeRenderer()))
+        else:
+            profiler.dump_stats(path)
+        os.utime(path, (time.time(), started_at + duration))
+        self._prune()
+        return name
+
+    def _prune(self):
+        profiles = self.list_profiles()
+        for profile in profiles[self.max_profiles:]:
+            try:
+                os.remove(os.path.join(self.directory, profile['name']))
+            except OSError:
+                pass
+
+    def list_profiles(self):
+        """Stored profiles, newest first"""
+        try:
+            names = [name for name in os.listdir(self.directory) if PROFILE_NAME.match(name)]
+        except OSError:
+            return []
+        profiles = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            match = PROFILE_NAME.match(name)
+            if match.group('duration'):
+                duration_ms = int(match.group('duration'))
+            else:
+                started = datetime.strptime(match.group('stamp'), STAMP_FORMAT).replace(tzinfo=timezone.utc)
+                duration_ms = max(int((stat.st_mtime - started.timestamp()) * 1000), 0)
+            profiles.append({
+                'name': name,
+                'endpoint': match.group('endpoint'),
+                'duration_ms': duration_ms,
+                'format': match.group('extension').split('.')[0],
+                'size': stat.st_size,
+                'created_at': datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+            })
+        profiles.sort(key=lambda profile: profile['name'], reverse=True)
+        return profiles
+
+    def profile_path(self, name):
+        """Absolute path of a stored profile, or None for unknown names"""
+        if not PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+request_profiler = None
+
+def init_request_profiler(app):
+    """Profile sampled requests into PROFILE_DIR, keeping the newest PROFILE_MAX_FILES"""
+    global request_profiler
+    request_profiler = RequestProfiler(
+        app.config.get('PROFILE_DIR') or os.path.join(app.root_path, 'database', 'profiles'),
+        app.config.get('PROFILE_MAX_FILES', 50),
+    )
+
+    @app.before_request
+    def start_request_profile():
+        if request_profiler.should_profile():
+            g.request_profile = (request_profiler.start(), time.time(), time.perf_counter())
+
+    @app.after_request
+    def save_request_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile and profile[0] is not None:
+            profiler, started_at, started = profile
+            name = request_profiler.profile_name(request.endpoint or 'unmatched', started_at)
+            response.headers['X-Profile-Name'] = name
+
+            def finish_request_profile():
+                duration = time.perf_counter() - started
+                request_profiler.stop(profiler)
+                request_profiler.save(profiler, name, started_at, duration)
+
+            if response.is_streamed:
+                # The body (CSV exports) is produced after this hook, so the
+                # profile runs until the server closes the response
+                response.call_on_close(finish_request_profile)
+            else:
+                finish_request_profile()
+        return response
+
+    @app.teardown_request
+    def discard_request_profile(error):
+        # Only reached with a live profiler if the response was never finalized
+        profile = g.pop('request_profile', None)
+        if profile and profile[0] is not None:
+            request_profiler.stop(profile[0])
+
+    return request_profiler
+
+def get_request_profiler():
+    return request_profiler
@@ -0,0 +1,39 @@
+from sqlalchemy.orm import joinedload
+
+# Fields embedded when a list view includes a related user
+USER_FIELDS = ('id', 'username', 'first_name', 'last_name')
+CREATOR_FIELDS = ('id', 'first_name', 'last_name')
+
+# Values per IN (...) list, under SQLite's bound-parameter limit
+LOOKUP_CHUNK = 500
+# Rows per executemany INSERT/UPDATE in bulk writes
+WRITE_BATCH = 1000
+
+def chunks(items, size):
+    """Consecutive slices of the list `items`, each at most `size` long"""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def with_related(query, *relationships):
+    """Eager-load many-to-one relationships in the same SELECT as the rows"""
+    return query.options(*[joinedload(relationship) for relationship in relationships])
+
+def user_ref(user, fields=CREATOR_FIELDS):
+    return {field: getattr(user, field) for field in fields}
+
+def serialize_rows(rows, related=None):
+    """Build response dicts in one pass, embedding already-loaded related users.
+
+    `related` maps an attribute name (e.g. 'user', 'creator') to the fields to
+    include; relationships that are None are left out of the dict.
+    """
+    related = related or {}
+    result = []
+    for row in rows:
+        row_dict = row.to_dict()
+        for name, fields in related.items():
+            target = getattr(row, name)
+            if target is not None:
+                row_dict[name] = user_ref(target, fields)
+        result.append(row_dict)
+    return result
@@ -0,0 +1,103 @@
+from datetime import datetime
+from sqlalchemy import func, insert
+from src.models.user import db, User, TimeLog, TimeLogRollup
+from src.utils.upsert import upsert
+
+def week_key(day):
+    iso_year, iso_week, _ = day.isocalendar()
+    return f'{iso_year}-W{iso_week:02d}'
+
+def month_key(day):
+    return day.strftime('%Y-%m')
+
+def add_hours(user_id, day, hours):
+    """Add `hours` to a user's rollup row for `day` within the current transaction.
+
+    One INSERT ... ON CONFLICT statement, so two transactions adding to a
+    day that has no row yet cannot both insert one.
+    """
+    now = datetime.utcnow()
+    stmt = upsert(TimeLogRollup).values(
+        user_id=user_id,
+        date=day,
+        week=week_key(day),
+        month=month_key(day),
+        total_hours=hours,
+        updated_at=now
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id', 'date'],
+        set_={'total_hours': TimeLogRollup.total_hours + stmt.excluded.total_hours, 'updated_at': now}
+    ))
+
+def rebuild_rollups(batch_size=1000):
+    """Recompute every rollup row from the raw time logs; returns rows written"""
+    db.session.query(TimeLogRollup).delete()
+
+    daily_totals = (
+        db.session.query(TimeLog.user_id, TimeLog.date, func.sum(TimeLog.total_hours))
+        .filter(TimeLog.total_hours.isnot(None))
+        .group_by(TimeLog.user_id, TimeLog.date)
+        .yield_per(batch_size)
+    )
+
+    now = datetime.utcnow()
+    written = 0
+    batch = []
+    for user_id, day, hours in daily_totals:
+        batch.append({
+            'user_id': user_id,
+            'date': day,
+            'week': week_key(day),
+            'month': month_key(day),
+            'total_hours': round(hours, 2),
+            'updated_at': now
+        })
+        if len(batch) >= batch_size:
+            db.session.execute(insert(TimeLogRollup), batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(TimeLogRollup), batch)
+        written += len(batch)
+
+    db.session.commit()
+    return written
+
+def period_totals(start_date=None, end_date=None, group_by=None, user_id=None):
+    """Sum rollup hours per user, optionally split by 'date', 'week' or 'month'"""
+    group_column = getattr(TimeLogRollup, group_by) if group_by else None
+    columns = [User.id, User.username, User.first_name, User.last_name]
+    if group_column is not None:
+        columns.append(group_column)
+
+    query = (
+        db.session.query(*columns, func.sum(TimeLogRollup.total_hours))
+        .join(User, TimeLogRollup.user_id == User.id)
+    )
+    if start_date:
+        query = query.filter(TimeLogRollup.date >= start_date)
+    if end_date:
+        query = query.filter(TimeLogRollup.date <= end_date)
+    if user_id:
+        query = query.filter(TimeLogRollup.user_id == user_id)
+
+    query = query.group_by(*columns).order_by(User.last_name, User.first_name, User.id)
+    if group_column is not None:
+        query = query.order_by(group_column)
+
+    result = []
+    for row in query:
+        entry = {
+            'user': {
+                'id': row[0],
+                'username': row[1],
+                'first_name': row[2],
+                'last_name': row[3]
+            },
+            'total_hours': round(row[-1] or 0, 2)
+        }
+        if group_column is not None:
+            entry[group_by] = row[4].isoformat() if group_by == 'date' else row[4]
+        result.append(entry)
+    return result
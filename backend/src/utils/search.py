@@ -0,0 +1,201 @@
+import re
+from sqlalchemy import text, or_
+from src.models.user import db, Training, SOP, Announcement, EODReport
+from src.utils.tags import parse_tags
+
+# kind -> (model, FTS5 table). Each table holds (title, body, owner_id) with the
+# source row's id as rowid; owner_id is indexed so the EOD filter is an FTS5
+# column filter, and queries are limited to title and body.
+SEARCH_KINDS = {
+    'training': (Training, 'search_training'),
+    'sop': (SOP, 'search_sop'),
+    'announcement': (Announcement, 'search_announcement'),
+    'eod_report': (EODReport, 'search_eod_report'),
+}
+
+REINDEX_BATCH = 1000
+SNIPPET_TOKENS = 12
+# EOD report matches ranked per query, newest first; see _fts_search()
+EOD_SEARCH_CANDIDATES = 1000
+
+def _create_table_sql(table):
+    return f"CREATE VIRTUAL TABLE {table} USING fts5(title, body, owner_id, tokenize = 'porter unicode61')"
+
+def _join(*parts):
+    return '\n'.join(part for part in parts if part)
+
+def _tag_words(tags):
+    # The column holds a JSON list; index the names, not the brackets and quotes
+    return ' '.join(parse_tags(tags))
+
+def _document(kind, item):
+    """(title, body, owner_id) for a row"""
+    if kind == 'training':
+        return (
+            item.title,
+            _join(item.description, item.category, item.skill_level, _tag_words(item.tags)),
+            item.created_by
+        )
+    if kind == 'sop':
+        return item.title, _join(item.description, item.category, _tag_words(item.tags)), item.created_by
+    if kind == 'announcement':
+        return item.title, item.content, item.created_by
+    return (
+        item.date.isoformat() if item.date else '',
+        _join(item.tasks_completed, item.blockers, item.issues, item.support_needed),
+        item.user_id
+    )
+
+def search_enabled():
+    """FTS5 indexes are only kept on SQLite; other backends fall back to LIKE"""
+    return db.engine.dialect.name == 'sqlite'
+
+def ensure_search_index():
+    """Create missing FTS5 tables, rebuild outdated ones, and fill both"""
+    if not search_enabled():
+        return
+    existing = dict(db.session.execute(
+        text("SELECT name, sql FROM sqlite_master WHERE type = 'table'")
+    ).all())
+    created = []
+    for kind, (model, table) in SEARCH_KINDS.items():
+        if existing.get(table) != _create_table_sql(table):
+            # Tables from before owner_id was indexed are rebuilt
+            if table in existing:
+                db.session.execute(text(f"DROP TABLE {table}"))
+            db.session.execute(text(_create_table_sql(table)))
+            created.append(kind)
+    db.session.commit()
+    for kind in created:
+        reindex(kind)
+
+def index_item(kind, item):
+    """Add or refresh one row's entry; call after flush so the row has an id"""
+    if not search_enabled():
+        return
+    table = SEARCH_KINDS[kind][1]
+    title, body, owner_id = _document(kind, item)
+    db.session.execute(text(f"DELETE FROM {table} WHERE rowid = :id"), {'id': item.id})
+    db.session.execute(
+        text(f"INSERT INTO {table} (rowid, title, body, owner_id) VALUES (:id, :title, :body, :owner_id)"),
+        {'id': item.id, 'title': title, 'body': body, 'owner_id': owner_id}
+    )
+
+def remove_item(kind, item_id):
+    if not search_enabled():
+        return
+    db.session.execute(text(f"DELETE FROM {SEARCH_KINDS[kind][1]} WHERE rowid = :id"), {'id': item_id})
+
+def reindex(kind, ids=None):
+    """Rebuild entries for `ids`, or the whole table when ids is None; commits"""
+    if not search_enabled():
+        return 0
+    model, table = SEARCH_KINDS[kind]
+    if ids is None:
+        db.session.execute(text(f"DELETE FROM {table}"))
+        query = model.query
+    else:
+        ids = list(ids)
+        if not ids:
+            return 0
+        delete = text(f"DELETE FROM {table} WHERE rowid = :id")
+        db.session.execute(delete, [{'id': item_id} for item_id in ids])
+        query = model.query.filter(model.id.in_(ids))
+
+    insert = text(f"INSERT INTO {table} (rowid, title, body, owner_id) VALUES (:id, :title, :body, :owner_id)")
+    written = 0
+    batch = []
+    for item in query.order_by(model.id).yield_per(REINDEX_BATCH):
+        title, body, owner_id = _document(kind, item)
+        batch.append({'id': item.id, 'title': title, 'body': body, 'owner_id': owner_id})
+        if len(batch) >= REINDEX_BATCH:
+            db.session.execute(insert, batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert, batch)
+        written += len(batch)
+    db.session.commit()
+    return written
+
+def build_match_query(q):
+    """Turn free text into an FTS5 query: every word must match, as a prefix"""
+    words = re.findall(r'\w+', q or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+def _fts_search(match, kinds, limit, owner_id):
+    # bm25() and snippet() run for every row the ranking query reads, which
+    # for a word in most of a million EOD reports takes seconds. EOD reports,
+    # the one table that grows without bound, therefore rank only their
+    # newest EOD_SEARCH_CANDIDATES matches: the rowid of the last one, found
+    # by walking the index newest first, is passed on as a floor. Trainings,
+    # SOPs and announcements always rank every match.
+    #
+    # bm25 scores depend on each table's own statistics, so they are not
+    # comparable across tables. Each kind's scores are divided by its best
+    # one, giving a rank in (0, 1] where 1 is the best match of that kind.
+    params = {'limit': limit}
+    selects = []
+    for kind in kinds:
+        table = SEARCH_KINDS[kind][1]
+        kind_match = f'{{title body}} : ({match})'
+        if kind == 'eod_report' and owner_id is not None:
+            kind_match = f'owner_id : "{int(owner_id)}" AND {kind_match}'
+        params[f'match_{kind}'] = kind_match
+        floor = ''
+        if kind == 'eod_report':
+            params['floor_eod_report'] = db.session.execute(
+                text(f"SELECT rowid FROM {table} WHERE {table} MATCH :match "
+                     "ORDER BY rowid DESC LIMIT 1 OFFSET :offset"),
+                {'match': kind_match, 'offset': EOD_SEARCH_CANDIDATES - 1}
+            ).scalar() or 0
+            floor = ' AND rowid >= :floor_eod_report'
+        selects.append(
+            f"SELECT * FROM (SELECT '{kind}' AS kind, rowid AS id, title, "
+            f"snippet({table}, 1, '**', '**', '…', {SNIPPET_TOKENS}) AS snippet, "
+            f"bm25({table}, 5.0, 1.0, 0.0) AS score "
+            f"FROM {table} WHERE {table} MATCH :match_{kind}{floor} "
+            "ORDER BY score LIMIT :limit)"
+        )
+    sql = (
+        "SELECT kind, id, title, snippet, "
+        "COALESCE(score / NULLIF(MIN(score) OVER (PARTITION BY kind), 0), 1.0) AS rank "
+        f"FROM ({' UNION ALL '.join(selects)}) ORDER BY rank DESC LIMIT :limit"
+    )
+    rows = db.session.execute(text(sql), params)
+    return [
+        {'kind': row.kind, 'id': row.id, 'title': row.title, 'snippet': row.snippet, 'rank': row.rank}
+        for row in rows
+    ]
+
+def _like_search(q, kinds, limit, owner_id):
+    # Unranked fallback for databases without FTS5
+    results = []
+    pattern = f'%{q}%'
+    for kind in kinds:
+        model = SEARCH_KINDS[kind][0]
+        if kind == 'eod_report':
+            fields = [model.tasks_completed, model.blockers, model.issues, model.support_needed]
+        elif kind == 'announcement':
+            fields = [model.title, model.content]
+        else:
+            fields = [model.title, model.description]
+        query = model.query.filter(or_(*[field.ilike(pattern) for field in fields]))
+        if kind == 'eod_report' and owner_id is not None:
+            query = query.filter(model.user_id == owner_id)
+        for item in query.order_by(model.id.desc()).limit(limit):
+            title, body, _ = _document(kind, item)
+            results.append({'kind': kind, 'id': item.id, 'title': title, 'snippet': (body or '')[:200], 'rank': None})
+    return results[:limit]
+
+def search(q, kinds, limit, owner_id=None):
+    """Ranked matches across `kinds`; EOD reports are limited to `owner_id` if given.
+
+    With FTS5, `rank` is relative to the best match of the same kind (1.0)
+    and EOD reports are ranked among their newest EOD_SEARCH_CANDIDATES
+    matches only; the LIKE fallback returns unranked results.
+    """
+    if search_enabled():
+        match = build_match_query(q)
+        return _fts_search(match, kinds, limit, owner_id) if match else []
+    return _like_search(q, kinds, limit, owner_id)
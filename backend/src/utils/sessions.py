@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, session
+from src.models.user import db, User, ContentVersion
+from src.utils.conditional import bump_version
+
+# Content version bumped whenever some user's sessions are revoked
+SESSION_VERSION_NAME = 'session'
+
+SessionAccess = namedtuple('SessionAccess', 'version role is_active')
+
+class SessionRegistry:
+    """Per-process map of user_id -> SessionAccess, consulted on every request.
+
+    Writes made by this worker update the map directly. A sync thread watches
+    the 'session' content version and reloads the map when another worker
+    revokes sessions, so authorization itself never touches the database.
+    Users not seen yet are loaded on first use.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._lock = threading.Lock()
+        self._version = None
+        self._thread = None
+        self._pid = None
+
+    def _ensure_sync(self):
+        # Threads don't survive a fork, so restart the sync in each worker
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            app = current_app._get_current_object()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._sync, args=(app,), name='session-sync', daemon=True)
+            self._thread.start()
+
+    def get(self, user_id):
+        self._ensure_sync()
+        with self._lock:
+            access = self._users.get(user_id)
+        if access is None:
+            access = self.refresh(user_id)
+        return access
+
+    def remember(self, user):
+        with self._lock:
+            self._users[user.id] = SessionAccess(user.session_version, user.role, user.is_active)
+
+    def refresh(self, user_id):
+        """Reload one user after it changed; returns its access or None if gone"""
+        row = (
+            db.session.query(User.session_version, User.role, User.is_active)
+            .filter_by(id=user_id)
+            .first()
+        )
+        with self._lock:
+            if row is None:
+                self._users.pop(user_id, None)
+                return None
+            access = self._users[user_id] = SessionAccess(*row)
+        return access
+
+    def _current_version(self):
+        # No row until the first revocation; that is version 0, not "unknown"
+        return (
+            db.session.query(ContentVersion.version)
+            .filter_by(name=SESSION_VERSION_NAME)
+            .scalar()
+        ) or 0
+
+    def reload(self):
+        version = self._current_version()
+        rows = db.session.query(User.id, User.session_version, User.role, User.is_active).all()
+        users = {row.id: SessionAccess(*row[1:]) for row in rows}
+        with self._lock:
+            self._users = users
+            self._version = version
+
+    def _sync(self, app):
+        with app.app_context():
+            interval = app.config.get('SESSION_SYNC_INTERVAL', 1.0)
+            while True:
+                try:
+                    # self._version is None only until the first reload
+                    if self._version is None or self._current_version() != self._version:
+                        self.reload()
+                except Exception:
+                    app.logger.exception('Session registry sync failed')
+                finally:
+                    # Don't hold a pooled connection between polls
+                    db.session.remove()
+                time.sleep(interval)
+
+session_registry = SessionRegistry()
+
+def start_session(user):
+    """Issue a fresh signed session for `user`"""
+    session.clear()
+    session['user_id'] = user.id
+    session['user_role'] = user.role
+    session['session_version'] = user.session_version
+    session_registry.remember(user)
+
+def session_is_valid():
+    """True if the session's role and version still match the user's current state"""
+    user_id = session.get('user_id')
+    if user_id is None:
+        return False
+    access = session_registry.get(user_id)
+    return (
+        access is not None
+        and access.is_active
+        and access.version == session.get('session_version')
+        and access.role == session.get('user_role')
+    )
+
+def revoke_sessions(user):
+    """End every outstanding session of `user`; call before the write's commit"""
+    user.session_version = (user.session_version or 0) + 1
+    bump_version(SESSION_VERSION_NAME)
@@ -0,0 +1,39 @@
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+# Defaults applied to every new SQLite connection; override via app.config
+SQLITE_PRAGMA_DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_MMAP_SIZE': 256 * 1024 * 1024,
+    'SQLITE_CACHE_SIZE': -64 * 1024,  # negative values are KiB, i.e. 64 MiB
+}
+
+def configure_sqlite_engine(app, engine):
+    """Apply journal, sync, busy-timeout and cache pragmas on each connection"""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    settings = {key: app.config.get(key, default) for key, default in SQLITE_PRAGMA_DEFAULTS.items()}
+    pragmas = [
+        f"PRAGMA journal_mode={settings['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={settings['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(settings['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size={int(settings['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(settings['SQLITE_CACHE_SIZE'])}",
+    ]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    # Connections opened before the listener existed need the pragmas too
+    engine.dispose()
+
+def is_database_locked(error):
+    """True if `error` is SQLite giving up on a lock after the busy timeout"""
+    return isinstance(error, OperationalError) and 'database is locked' in str(error)
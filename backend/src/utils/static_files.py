@@ -0,0 +1,163 @@
+import gzip
+import mimetypes
+import os
+import re
+from flask import request, send_file
+
+try:
+    import brotli
+except ImportError:  # optional; .br files are then only served, never written
+    brotli = None
+
+# Encodings in order of preference, with the suffix of their precompressed file
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+# Vite puts content-hashed bundles here, so their URLs never change meaning
+IMMUTABLE_PREFIX = 'assets/'
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+DEFAULT_MAX_AGE = 3600
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 1024
+
+ASSET_REFERENCE = re.compile(r'''(?:src|href)=["']/(assets/[^"']+)["']''')
+
+class StaticEntry:
+    __slots__ = ('path', 'mtime', 'mimetype', 'etag', 'variants')
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.mtime = stat.st_mtime
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.etag = f'{int(stat.st_mtime)}-{stat.st_size:x}'
+        self.variants = {}
+
+class StaticIndex:
+    """In-memory map of the static folder: URL path -> file, type, ETag, compressed variants.
+
+    Built once at startup so serving a request does no filesystem lookups
+    beyond opening the chosen file.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._entries = {}
+        self.scan()
+
+    def scan(self):
+        entries = {}
+        compressed = []
+        if self.root and os.path.isdir(self.root):
+            for directory, _, files in os.walk(self.root):
+                for filename in files:
+                    path = os.path.join(directory, filename)
+                    url_path = os.path.relpath(path, self.root).replace(os.sep, '/')
+                    if any(url_path.endswith(suffix) for _, suffix in ENCODINGS):
+                        compressed.append(url_path)
+                        continue
+                    entries[url_path] = StaticEntry(path, os.stat(path))
+        for url_path in compressed:
+            for encoding, suffix in ENCODINGS:
+                if not url_path.endswith(suffix):
+                    continue
+                original = entries.get(url_path[:-len(suffix)])
+                path = os.path.join(self.root, url_path)
+                # A variant older than its source is left over from a previous build
+                if original is not None and os.stat(path).st_mtime >= original.mtime:
+                    original.variants[encoding] = path
+        self._entries = entries
+        return len(entries)
+
+    def get(self, url_path, reload_on_miss=False):
+        entry = self._entries.get(url_path)
+        if entry is None and reload_on_miss:
+            self.scan()
+            entry = self._entries.get(url_path)
+        return entry
+
+def _accepted_encoding(entry):
+    accepted = request.accept_encodings
+    for encoding, _ in ENCODINGS:
+        if encoding in entry.variants and accepted[encoding]:
+            return encoding
+    return None
+
+def send_static(index, url_path, reload_on_miss=False):
+    """Serve `url_path` from the index, or index.html for client-side routes.
+
+    With `reload_on_miss` (debug mode), an unknown path rescans the folder
+    first so freshly built files show up.
+    """
+    entry = index.get(url_path, reload_on_miss) if url_path else None
+    if entry is None:
+        url_path = 'index.html'
+        entry = index.get(url_path)
+        if entry is None:
+            return "index.html not found", 404
+
+    encoding = _accepted_encoding(entry)
+    path = entry.variants[encoding] if encoding else entry.path
+    response = send_file(
+        path,
+        mimetype=entry.mimetype,
+        etag=f'{entry.etag}-{encoding}' if encoding else entry.etag,
+        conditional=True,
+        max_age=None if url_path == 'index.html' else DEFAULT_MAX_AGE,
+    )
+    if entry.variants:
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    if url_path.startswith(IMMUTABLE_PREFIX):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    elif url_path == 'index.html':
+        # Always revalidate so a deploy is picked up; unchanged copies get a 304
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def referenced_assets(root):
+    """assets/ files that index.html links to"""
+    try:
+        with open(os.path.join(root, 'index.html')) as f:
+            return set(ASSET_REFERENCE.findall(f.read()))
+    except OSError:
+        return set()
+
+def compress_static(root, prune_stale=False):
+    """Write .gz (and .br when brotli is installed) next to compressible files.
+
+    With `prune_stale`, hashed bundles under assets/ that index.html no longer
+    references are deleted first. Returns (compressed, pruned) counts.
+    """
+    pruned = 0
+    if prune_stale:
+        keep = referenced_assets(root)
+        assets_dir = os.path.join(root, 'assets')
+        if keep and os.path.isdir(assets_dir):
+            for filename in os.listdir(assets_dir):
+                base = f'assets/{filename}'
+                for _, suffix in ENCODINGS:
+                    if base.endswith(suffix):
+                        base = base[:-len(suffix)]
+                if base.endswith(('.js', '.css')) and base not in keep:
+                    os.remove(os.path.join(assets_dir, filename))
+                    pruned += 1
+
+    compressed = 0
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            mimetype = mimetypes.guess_type(path)[0] or ''
+            if filename.endswith(('.gz', '.br')) or not mimetype.startswith(COMPRESSIBLE_TYPES):
+                continue
+            if os.path.getsize(path) < MIN_COMPRESS_SIZE:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            with open(path + '.gz', 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(path + '.br', 'wb') as f:
+                    f.write(brotli.compress(data, quality=11))
+            compressed += 1
+    return compressed, pruned
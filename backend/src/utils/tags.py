@@ -0,0 +1,171 @@
+import json
+from sqlalchemy import delete, func, insert, select, update
+from src.models.user import db, Tag, Training, SOP, ContentVersion, training_tags, sop_tags
+from src.utils.cache import tag_cloud_cache
+from src.utils.conditional import bump_version
+from src.utils.upsert import upsert
+
+# kind -> (model, association table, association column pointing at the model)
+TAGGED_KINDS = {
+    'training': (Training, training_tags, training_tags.c.training_id),
+    'sop': (SOP, sop_tags, sop_tags.c.sop_id),
+}
+
+BATCH_SIZE = 1000
+
+def parse_tags(value):
+    """Normalize a tag list, JSON list string or comma-separated string to names"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            parsed = value.split(',')
+        value = parsed if isinstance(parsed, list) else [str(parsed)]
+
+    names = []
+    for tag in value:
+        name = str(tag).strip().lower()[:100]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def _insert_missing_tags(names):
+    # ON CONFLICT DO NOTHING: a concurrent request may create the same name
+    for start in range(0, len(names), BATCH_SIZE):
+        chunk = names[start:start + BATCH_SIZE]
+        db.session.execute(
+            upsert(Tag).values([{'name': name} for name in chunk]).on_conflict_do_nothing(index_elements=['name'])
+        )
+
+def get_or_create_tags(names):
+    """Tag rows for `names` in the given order, adding any that are missing"""
+    if not names:
+        return []
+    existing = {tag.name: tag for tag in Tag.query.filter(Tag.name.in_(names))}
+    missing = [name for name in names if name not in existing]
+    if missing:
+        _insert_missing_tags(missing)
+        existing.update((tag.name, tag) for tag in Tag.query.filter(Tag.name.in_(missing)))
+    return [existing[name] for name in names]
+
+def set_tags(item, value):
+    """Replace an item's tags, keeping the JSON column and the link table in step"""
+    names = parse_tags(value)
+    item.tags = json.dumps(names) if names else None
+    item.tag_items = get_or_create_tags(names)
+
+def filter_by_tag(query, kind, name):
+    """Restrict a Training/SOP query to items carrying tag `name` via the link index"""
+    model, table, item_column = TAGGED_KINDS[kind]
+    return (
+        query.join(table, item_column == model.id)
+        .join(Tag, Tag.id == table.c.tag_id)
+        .filter(Tag.name == name.strip().lower())
+    )
+
+def rebuild_tag_links(kind, ids=None):
+    """Recreate link rows from the JSON tag column for `ids` (all rows if None); commits"""
+    model, table, item_column = TAGGED_KINDS[kind]
+    query = db.session.query(model.id, model.tags).filter(model.tags.isnot(None))
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return 0
+        query = query.filter(model.id.in_(ids))
+
+    parsed = [(item_id, tags, parse_tags(tags)) for item_id, tags in query.yield_per(BATCH_SIZE)]
+
+    names = sorted({name for _, _, item_names in parsed for name in item_names})
+    tag_ids = {}
+    for start in range(0, len(names), BATCH_SIZE):
+        chunk = names[start:start + BATCH_SIZE]
+        tag_ids.update(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(chunk)))
+    missing = [name for name in names if name not in tag_ids]
+    if missing:
+        _insert_missing_tags(missing)
+        for start in range(0, len(missing), BATCH_SIZE):
+            chunk = missing[start:start + BATCH_SIZE]
+            tag_ids.update(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(chunk)))
+
+    if ids is None:
+        db.session.execute(delete(table))
+    else:
+        for start in range(0, len(ids), BATCH_SIZE):
+            db.session.execute(delete(table).where(item_column.in_(ids[start:start + BATCH_SIZE])))
+
+    links = [
+        {item_column.key: item_id, 'tag_id': tag_ids[name]}
+        for item_id, _, item_names in parsed
+        for name in item_names
+    ]
+    for start in range(0, len(links), BATCH_SIZE):
+        db.session.execute(insert(table), links[start:start + BATCH_SIZE])
+
+    # Store the canonical form so the JSON column matches the links
+    rewrites = []
+    for item_id, tags, item_names in parsed:
+        canonical = json.dumps(item_names) if item_names else None
+        if canonical != tags:
+            rewrites.append({'id': item_id, 'tags': canonical})
+    for start in range(0, len(rewrites), BATCH_SIZE):
+        db.session.execute(update(model), rewrites[start:start + BATCH_SIZE])
+
+    # The tag cloud is cached per content version; see tag_cloud()
+    bump_version(kind)
+    db.session.commit()
+    return len(links)
+
+def backfill_tag_links():
+    """Parse legacy tag strings into the link tables the first time they exist"""
+    if db.session.query(Tag.id).first() is not None:
+        return
+    for kind, (model, _, _) in TAGGED_KINDS.items():
+        if db.session.query(model.id).filter(model.tags.isnot(None)).first() is not None:
+            written = rebuild_tag_links(kind)
+            print(f"Linked {written} {kind} tags")
+
+def tag_cloud():
+    """Every tag in use with its training and SOP counts, most used first.
+
+    Cached together with the training and SOP content versions it was built
+    from; every tag change bumps them in its own transaction, so a write from
+    any process (including background imports) shows up on the next request.
+    """
+    versions = dict(
+        db.session.query(ContentVersion.name, ContentVersion.version)
+        .filter(ContentVersion.name.in_(TAGGED_KINDS))
+    )
+    current = tuple(versions.get(kind, 0) for kind in TAGGED_KINDS)
+    # One entry, replaced when the versions move on, so the cache cannot grow
+    cached = tag_cloud_cache.get('tag_cloud')
+    if cached is not None and cached[0] == current:
+        return cached[1]
+
+    training_counts = (
+        select(training_tags.c.tag_id, func.count().label('count'))
+        .group_by(training_tags.c.tag_id)
+        .subquery()
+    )
+    sop_counts = (
+        select(sop_tags.c.tag_id, func.count().label('count'))
+        .group_by(sop_tags.c.tag_id)
+        .subquery()
+    )
+    trainings = func.coalesce(training_counts.c.count, 0)
+    sops = func.coalesce(sop_counts.c.count, 0)
+    rows = (
+        db.session.query(Tag.name, trainings, sops)
+        .outerjoin(training_counts, training_counts.c.tag_id == Tag.id)
+        .outerjoin(sop_counts, sop_counts.c.tag_id == Tag.id)
+        .filter(trainings + sops > 0)
+        .order_by((trainings + sops).desc(), Tag.name)
+        .all()
+    )
+    result = [
+        {'name': name, 'trainings': training_count, 'sops': sop_count, 'total': training_count + sop_count}
+        for name, training_count, sop_count in rows
+    ]
+    tag_cloud_cache.set('tag_cloud', (current, result))
+    return result
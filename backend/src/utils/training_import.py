@@ -0,0 +1,181 @@
+import json
+from datetime import datetime
+from sqlalchemy import insert, update
+from src.models.user import db, Training
+from src.utils.search import reindex
+from src.utils.tags import parse_tags, rebuild_tag_links
+from src.utils.conditional import bump_version
+from src.utils.queries import chunks, LOOKUP_CHUNK, WRITE_BATCH
+from src.utils.upsert import upsert
+from src.utils.jobs import JobFailed
+
+# Columns an import row can set, keyed by column name
+IMPORT_FIELDS = ("title", "description", "url", "category", "skill_level", "tags")
+
+class ImportValidationError(ValueError):
+    """Raised with every invalid row before anything is written"""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid training rows")
+        self.errors = errors
+
+def _optional_string(item, key, errors, index, max_length):
+    value = item.get(key)
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        errors.append({"index": index, "error": f"{key} must be a string"})
+        return None
+    if len(value) > max_length:
+        errors.append({"index": index, "error": f"{key} is longer than {max_length} characters"})
+    return value.strip()
+
+def validate_trainings(items):
+    """Normalize an import payload into column dicts, or raise ImportValidationError"""
+    if not isinstance(items, list):
+        raise ImportValidationError([{"index": None, "error": "trainings must be a list"}])
+
+    rows = []
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "error": "row must be an object"})
+            continue
+
+        title = item.get("title")
+        if not isinstance(title, str) or not title.strip():
+            errors.append({"index": index, "error": "title is required"})
+            continue
+
+        tags = item.get("tags")
+        if isinstance(tags, list) and not all(isinstance(tag, str) for tag in tags):
+            errors.append({"index": index, "error": "tags must be strings"})
+        elif tags is not None and not isinstance(tags, (list, str)):
+            errors.append({"index": index, "error": "tags must be a list or string"})
+        else:
+            names = parse_tags(tags)
+            tags = json.dumps(names) if names else None
+            if tags is not None and len(tags) > 500:
+                errors.append({"index": index, "error": "tags are longer than 500 characters"})
+
+        row = {
+            "title": title.strip(),
+            "description": _optional_string(item, "description", errors, index, 100000),
+            "url": _optional_string(item, "url", errors, index, 500),
+            "category": _optional_string(item, "category", errors, index, 100),
+            # The catalogue JSON uses camelCase
+            "skill_level": _optional_string(
+                item, "skillLevel" if "skillLevel" in item else "skill_level", errors, index, 50
+            ),
+            "tags": tags or None,
+        }
+        if len(row["title"]) > 200:
+            errors.append({"index": index, "error": "title is longer than 200 characters"})
+        rows.append(row)
+
+    if errors:
+        raise ImportValidationError(errors)
+    return rows
+
+def natural_key(row):
+    """Trainings are matched on URL when they have one, otherwise on title"""
+    return ("url", row["url"]) if row["url"] else ("title", row["title"])
+
+def _existing_by_key(rows):
+    urls = sorted({row["url"] for row in rows if row["url"]})
+    titles = sorted({row["title"] for row in rows if not row["url"]})
+    columns = [Training.id] + [getattr(Training, field) for field in IMPORT_FIELDS]
+
+    existing = {}
+    for column, values, key_name in ((Training.url, urls, "url"), (Training.title, titles, "title")):
+        for chunk in chunks(values, LOOKUP_CHUNK):
+            query = db.session.query(*columns).filter(column.in_(chunk))
+            if key_name == "title":
+                query = query.filter(Training.url.is_(None))
+            for match in query.order_by(Training.id):
+                existing.setdefault((key_name, getattr(match, key_name)), match._asdict())
+    return existing
+
+def _upsert_by_url():
+    """INSERT ... ON CONFLICT on the unique URL index, returning the row ids"""
+    statement = upsert(Training)
+    return statement.on_conflict_do_update(
+        index_elements=[Training.url],
+        index_where=Training.url.isnot(None),
+        set_={field: statement.excluded[field] for field in IMPORT_FIELDS},
+    ).returning(Training.id)
+
+def import_trainings(items, created_by):
+    """Upsert a catalogue payload in batches; returns created/updated/skipped counts.
+
+    Rows are validated up front, so an invalid payload writes nothing.
+    Repeated keys within the payload keep the first occurrence.
+    """
+    rows = validate_trainings(items)
+    existing = _existing_by_key(rows)
+
+    inserts = []
+    updates = []
+    upserts = []
+    created = updated = skipped = 0
+    seen = set()
+    now = datetime.utcnow()
+    for row in rows:
+        key = natural_key(row)
+        if key in seen:
+            skipped += 1
+            continue
+        seen.add(key)
+
+        current = existing.get(key)
+        if current is not None and all(current[field] == row[field] for field in IMPORT_FIELDS):
+            skipped += 1
+            continue
+        if current is None:
+            created += 1
+        else:
+            updated += 1
+
+        if row["url"]:
+            # New and changed URL rows share one upsert, which also absorbs
+            # a row another import added since the lookup
+            upserts.append({**row, "created_by": created_by, "created_at": now})
+        elif current is None:
+            inserts.append({**row, "created_by": created_by, "created_at": now})
+        else:
+            updates.append({**row, "id": current["id"]})
+
+    changed_ids = [row["id"] for row in updates]
+    for batch in chunks(upserts, WRITE_BATCH):
+        changed_ids.extend(db.session.scalars(_upsert_by_url(), batch))
+    for batch in chunks(inserts, WRITE_BATCH):
+        changed_ids.extend(db.session.scalars(insert(Training).returning(Training.id), batch))
+    for batch in chunks(updates, WRITE_BATCH):
+        db.session.execute(update(Training), batch)
+    if changed_ids:
+        bump_version("training")
+    db.session.commit()
+
+    # Bulk statements bypass the per-row hooks, so refresh tag links and
+    # search in one pass each
+    rebuild_tag_links("training", changed_ids)
+    reindex("training", changed_ids)
+
+    return {"created": created, "updated": updated, "skipped": skipped}
+
+def run_import_job(job, params):
+    """Job handler: import_trainings() for a payload queued by the bulk-import endpoint.
+
+    Runs in a job process, so nothing here can clear the web processes'
+    caches; the "training" content version bumped by the import (and by
+    rebuild_tag_links) is what invalidates the tag cloud and ETags there.
+    """
+    items = params["trainings"]
+    job.progress(0, len(items), force=True)
+    try:
+        counts = import_trainings(items, params["created_by"])
+    except ImportValidationError as e:
+        # Invalid rows stay invalid; report them instead of retrying
+        raise JobFailed(str(e), {"errors": e.errors})
+    job.progress(len(items), force=True)
+    return counts
@@ -0,0 +1,11 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.user import db
+
+def upsert(model):
+    """INSERT for `model` that supports on_conflict_do_update/on_conflict_do_nothing.
+
+    SQLite and PostgreSQL spell ON CONFLICT the same way; both are supported
+    database backends (see src/config.py).
+    """
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    return dialect.insert(model)
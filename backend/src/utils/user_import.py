@@ -0,0 +1,159 @@
+import csv
+import io
+import secrets
+import string
+from datetime import datetime
+from sqlalchemy import func, insert
+from src.models.user import db, User
+from src.utils.passwords import hash_passwords
+from src.utils.conditional import bump_version
+from src.utils.queries import chunks, LOOKUP_CHUNK, WRITE_BATCH
+
+PROVISION_FIELDS = ("first_name", "last_name", "email", "role", "assigned_client")
+ROLES = ("admin", "va")
+MAX_ROWS = 5000
+USERNAME_LENGTH = User.__table__.c.username.type.length
+# Longest suffix whose cut-short base _taken_usernames looks up in advance
+SUFFIX_DIGITS = 6
+
+class ProvisioningError(ValueError):
+    """Raised when the payload as a whole cannot be read"""
+
+def read_csv(text):
+    """Turn an uploaded CSV (header row required) into row dicts"""
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or "email" not in reader.fieldnames:
+        raise ProvisioningError("CSV must have a header row with at least an email column")
+    return [dict(row) for row in reader]
+
+def _validate(item):
+    if not isinstance(item, dict):
+        return None, "row must be an object"
+    row = {}
+    for field in PROVISION_FIELDS:
+        value = item.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is not None and not isinstance(value, str):
+            return None, f"{field} must be a string"
+        row[field] = value or None
+    for field in ("first_name", "last_name", "email", "role"):
+        if not row[field]:
+            return None, f"{field} is required"
+    if "@" not in row["email"] or len(row["email"]) > 120:
+        return None, "email is not valid"
+    if row["role"] not in ROLES:
+        return None, f"role must be one of {', '.join(ROLES)}"
+    if len(row["first_name"]) > 50 or len(row["last_name"]) > 50:
+        return None, "names are limited to 50 characters"
+    if row["assigned_client"] and len(row["assigned_client"]) > 100:
+        return None, "assigned_client is longer than 100 characters"
+    return row, None
+
+def _existing_emails(emails):
+    existing = set()
+    for chunk in chunks(emails, LOOKUP_CHUNK):
+        existing.update(
+            email.lower() for email in db.session.scalars(
+                db.select(User.email).where(func.lower(User.email).in_(chunk))
+            )
+        )
+    return existing
+
+def _taken_usernames(bases):
+    # Every candidate is a base plus an optional numeric suffix, so stripping
+    # trailing digits from both sides finds all possible clashes in one pass.
+    # A base cut short to make room for its suffix has a stem of its own.
+    stems = sorted({
+        base[:length].rstrip(string.digits)
+        for base in bases
+        for length in range(min(len(base), USERNAME_LENGTH - SUFFIX_DIGITS), len(base) + 1)
+    })
+    taken = set()
+    for chunk in chunks(stems, LOOKUP_CHUNK):
+        taken.update(db.session.scalars(
+            db.select(User.username).where(func.rtrim(User.username, string.digits).in_(chunk))
+        ))
+    return taken
+
+def _pick_username(base, taken):
+    # Same scheme as POST /api/users: the email local part, then base1, base2, ...
+    # with the base cut short so the suffix still fits in the column
+    username = base
+    counter = 1
+    while username in taken:
+        suffix = str(counter)
+        username = f"{base[:USERNAME_LENGTH - len(suffix)]}{suffix}"
+        counter += 1
+    taken.add(username)
+    return username
+
+def provision_users(items):
+    """Create users in one transaction; returns per-row results in payload order.
+
+    Invalid rows and emails that already exist are reported and skipped,
+    the rest are created with a temporary password each.
+    """
+    if not isinstance(items, list):
+        raise ProvisioningError("users must be a list")
+    if len(items) > MAX_ROWS:
+        raise ProvisioningError(f"at most {MAX_ROWS} users per request")
+
+    results = [None] * len(items)
+    rows = []
+    for index, item in enumerate(items):
+        row, error = _validate(item)
+        if error:
+            results[index] = {"index": index, "status": "error", "error": error}
+        else:
+            rows.append((index, row))
+
+    # Emails are compared case-insensitively, within the payload too
+    existing = _existing_emails(sorted({row["email"].lower() for _, row in rows}))
+    pending = []
+    for index, row in rows:
+        if row["email"].lower() in existing:
+            results[index] = {"index": index, "status": "error", "error": "Email already exists"}
+            continue
+        existing.add(row["email"].lower())
+        pending.append((index, row))
+
+    bases = [row["email"].split("@")[0][:USERNAME_LENGTH] for _, row in pending]
+    taken = _taken_usernames(bases)
+    passwords = [
+        "".join(secrets.choice(string.ascii_letters + string.digits) for _ in range(12))
+        for _ in pending
+    ]
+    hashes = hash_passwords(passwords, temporary=True)
+
+    now = datetime.utcnow()
+    inserts = [
+        {
+            **row,
+            "username": _pick_username(base, taken),
+            "password_hash": password_hash,
+            "is_active": True,
+            "created_at": now,
+        }
+        for (_, row), base, password_hash in zip(pending, bases, hashes)
+    ]
+
+    ids = []
+    for batch in chunks(inserts, WRITE_BATCH):
+        ids.extend(db.session.scalars(
+            insert(User).returning(User.id, sort_by_parameter_order=True), batch
+        ))
+    if inserts:
+        bump_version("user")
+    db.session.commit()
+
+    for (index, _), row, user_id, password in zip(pending, inserts, ids, passwords):
+        results[index] = {
+            "index": index,
+            "status": "created",
+            "id": user_id,
+            "username": row["username"],
+            "email": row["email"],
+            "temp_password": password,
+        }
+    return results
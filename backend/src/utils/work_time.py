@@ -0,0 +1,196 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from flask import current_app, has_app_context
+from sqlalchemy import and_, exists, func, insert, literal, null, select, update
+from sqlalchemy.orm import aliased
+from src.models.user import db, TimeLog, TimeInterval
+from src.utils.rollups import add_hours
+from src.utils.upsert import upsert
+
+def work_timezone():
+    """Zone that decides which day an instant belongs to: WORK_TIMEZONE, else the server's own"""
+    name = current_app.config.get('WORK_TIMEZONE') if has_app_context() else None
+    return ZoneInfo(name) if name else None
+
+def work_date(moment=None):
+    """Work date of a naive UTC `moment` (default: now) in the work timezone"""
+    moment = moment or datetime.utcnow()
+    return moment.replace(tzinfo=timezone.utc).astimezone(work_timezone()).date()
+
+# Returned by the clock-in/clock-out statements instead of loading the row again
+INTERVAL_COLUMNS = (
+    TimeInterval.id,
+    TimeInterval.user_id,
+    TimeInterval.time_log_id,
+    TimeInterval.date,
+    TimeInterval.started_at,
+    TimeInterval.ended_at,
+    TimeInterval.hours
+)
+
+def interval_hours(started_at, ended_at):
+    return round((ended_at - started_at).total_seconds() / 3600, 2)
+
+def open_interval(user_id):
+    """The user's running interval, whatever day it started on"""
+    return TimeInterval.query.filter_by(user_id=user_id, ended_at=None).first()
+
+def start_interval(user_id, now):
+    """Open an interval on the work date's time log; returns its row, or None if one is running.
+
+    The log is upserted by a single INSERT ... SELECT ... WHERE NOT EXISTS
+    (running interval) ON CONFLICT (user_id, date) statement, so there is no
+    read-then-write window: a second clock-in waits for the first one's write
+    lock and then finds the interval it opened. The partial unique index on
+    open intervals backs this up on databases that do not serialize writers.
+    """
+    day = work_date(now)
+    running = exists().where(TimeInterval.user_id == user_id, TimeInterval.ended_at.is_(None))
+    stmt = upsert(TimeLog).from_select(
+        ['user_id', 'date', 'clock_in', 'created_at'],
+        select(
+            literal(user_id),
+            literal(day, TimeLog.date.type),
+            literal(now, TimeLog.clock_in.type),
+            literal(now, TimeLog.created_at.type)
+        ).where(~running)
+    )
+    time_log_id = db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['user_id', 'date'],
+            # clock_in stays the day's first start; an open log has no clock_out
+            set_={'clock_in': func.coalesce(TimeLog.clock_in, stmt.excluded.clock_in), 'clock_out': None}
+        ).returning(TimeLog.id)
+    ).scalar()
+    if time_log_id is None:
+        return None
+
+    return db.session.execute(
+        insert(TimeInterval)
+        .values(user_id=user_id, time_log_id=time_log_id, date=day, started_at=now)
+        .returning(*INTERVAL_COLUMNS)
+    ).one()
+
+def end_interval(user_id, now):
+    """Close the user's running interval; returns (interval row, day total), or None if there is none.
+
+    The UPDATE ... WHERE ended_at IS NULL claims the interval atomically, so
+    only one of two concurrent clock-outs adds hours to the day's log and
+    rollup; the other finds nothing to close.
+    """
+    claimed = db.session.execute(
+        update(TimeInterval)
+        .where(TimeInterval.user_id == user_id, TimeInterval.ended_at.is_(None))
+        .values(ended_at=now)
+        .returning(TimeInterval.id, TimeInterval.started_at)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if claimed is None:
+        return None
+
+    interval = db.session.execute(
+        update(TimeInterval)
+        .where(TimeInterval.id == claimed.id)
+        .values(hours=interval_hours(claimed.started_at, now))
+        .returning(*INTERVAL_COLUMNS)
+        .execution_options(synchronize_session=False)
+    ).one()
+    total_hours = db.session.execute(
+        update(TimeLog)
+        .where(TimeLog.id == interval.time_log_id)
+        .values(total_hours=func.coalesce(TimeLog.total_hours, 0) + interval.hours, clock_out=now)
+        .returning(TimeLog.total_hours)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    add_hours(user_id, interval.date, interval.hours)
+    return interval, round(total_hours, 2)
+
+def interval_dict(row):
+    """Response dict for a row of INTERVAL_COLUMNS, shaped like TimeInterval.to_dict()"""
+    return {
+        'id': row.id,
+        'user_id': row.user_id,
+        'time_log_id': row.time_log_id,
+        'date': row.date.isoformat(),
+        'started_at': row.started_at.isoformat(),
+        'ended_at': row.ended_at.isoformat() if row.ended_at else None,
+        'hours': row.hours
+    }
+
+def rebuild_daily_totals():
+    """Recompute every time log's first start, last end and total from its intervals"""
+    totals = (
+        select(
+            TimeInterval.time_log_id,
+            func.min(TimeInterval.started_at).label('clock_in'),
+            func.max(TimeInterval.ended_at).label('clock_out'),
+            func.count(TimeInterval.id).label('intervals'),
+            func.count(TimeInterval.ended_at).label('closed'),
+            func.sum(TimeInterval.hours).label('total_hours')
+        )
+        .group_by(TimeInterval.time_log_id)
+    )
+    updates = [
+        {
+            'id': row.time_log_id,
+            'clock_in': row.clock_in,
+            # A log with a running interval has no clock_out yet
+            'clock_out': row.clock_out if row.closed == row.intervals else None,
+            'total_hours': round(row.total_hours, 2) if row.total_hours is not None else None
+        }
+        for row in db.session.execute(totals)
+    ]
+    for start in range(0, len(updates), 1000):
+        db.session.execute(update(TimeLog), updates[start:start + 1000])
+    db.session.commit()
+    return len(updates)
+
+def backfill_intervals():
+    """Give time logs from before intervals existed an interval each.
+
+    Closed logs become closed intervals. Of a user's logs without a
+    clock_out, only the latest becomes the running interval; older ones
+    were never clocked out and are left as they are.
+    """
+    has_interval = exists().where(TimeInterval.time_log_id == TimeLog.id)
+    # SQLAlchemy closes the cursor of a statement that returns no rows, after
+    # which psycopg reports a rowcount of -1; keep the INSERT's count first
+    keep_rowcount = {'preserve_rowcount': True}
+    columns = ['user_id', 'time_log_id', 'date', 'started_at', 'ended_at', 'hours']
+
+    closed = db.session.execute(
+        insert(TimeInterval).from_select(
+            columns,
+            select(TimeLog.user_id, TimeLog.id, TimeLog.date, TimeLog.clock_in, TimeLog.clock_out, TimeLog.total_hours)
+            .where(TimeLog.clock_in.isnot(None), TimeLog.clock_out.isnot(None), ~has_interval)
+        ),
+        execution_options=keep_rowcount
+    )
+
+    later = aliased(TimeLog)
+    newer_open_log = exists().where(and_(
+        later.user_id == TimeLog.user_id,
+        later.clock_in.isnot(None),
+        later.clock_out.is_(None),
+        later.id > TimeLog.id
+    ))
+    user_has_open_interval = exists().where(and_(
+        TimeInterval.user_id == TimeLog.user_id,
+        TimeInterval.ended_at.is_(None)
+    ))
+    running = db.session.execute(
+        insert(TimeInterval).from_select(
+            columns,
+            select(TimeLog.user_id, TimeLog.id, TimeLog.date, TimeLog.clock_in, null(), null())
+            .where(
+                TimeLog.clock_in.isnot(None),
+                TimeLog.clock_out.is_(None),
+                ~has_interval,
+                ~newer_open_log,
+                ~user_has_open_interval
+            )
+        ),
+        execution_options=keep_rowcount
+    )
+    db.session.commit()
+    return closed.rowcount + running.rowcount